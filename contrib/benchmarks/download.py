@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Measure download and hashing throughput: downloading archives from a local
+HTTP server standing in for an index (so that the network isn't the limit)
+with _download_url, and checking the hash of a downloaded file with
+_get_hash_from_file.
+
+    $ python contrib/benchmarks/download.py [size in MB ...]
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(here)))
+
+from pip.download import _download_url, _get_hash_from_file, urlopen
+from pip.index import Link
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    archives = {}
+
+    def do_GET(self):
+        body = self.archives[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = HTTPServer(('127.0.0.1', 0), ArchiveHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def best_of(func, repeat=3):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100]
+    server = start_server()
+    temp_dir = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            body = os.urandom(1000 * 1000) * size
+            path = '/bigproject-%s.tar.gz' % size
+            ArchiveHandler.archives[path] = body
+            link = Link('http://127.0.0.1:%s%s#md5=%s'
+                        % (server.server_port, path,
+                           hashlib.md5(body).hexdigest()))
+            target = os.path.join(temp_dir, 'bigproject.tar.gz')
+
+            def download():
+                _download_url(urlopen(link.url.split('#')[0]), link, target)
+
+            def check_hash():
+                _get_hash_from_file(target, link)
+
+            download_time = best_of(download)
+            hash_time = best_of(check_hash)
+            sys.stdout.write('%4d MB: download %.3fs (%d MB/s), '
+                             'hash %.3fs (%d MB/s)\n'
+                             % (size, download_time, size / download_time,
+                                hash_time, size / hash_time))
+            del ArchiveHandler.archives[path]
+    finally:
+        # Kept-alive connections would keep the server busy
+        urlopen.pool.clear()
+        server.shutdown()
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Compare extracting links from large index pages with the single pass
+LinkExtractor against building the full html5lib tree.
+
+    $ python contrib/benchmarks/html_page.py [number of links ...]
+"""
+
+import os
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(here)))
+
+from pip.backwardcompat import urlparse
+from pip.index import HTMLPage, Link
+
+
+def make_page(count):
+    lines = ['<html><head><title>Links for bigproject</title>',
+             '<meta name="api-version" value="2" /></head><body>']
+    for i in range(count):
+        lines.append(
+            '<a href="../../packages/source/b/bigproject/'
+            'bigproject-%d.%d.tar.gz#md5=%032x" rel="internal">'
+            'bigproject-%d.%d.tar.gz</a><br/>' % (i // 100, i % 100, i,
+                                                  i // 100, i % 100))
+    lines.append('<a href="http://bigproject.example.com/" rel="homepage">'
+                 'home</a></body></html>')
+    return '\n'.join(lines)
+
+
+def html5lib_links(page):
+    # What HTMLPage did before: one tree, walked again by every accessor
+    page.parsed.findall(".//meta")
+    page.parsed.find(".//base")
+    links = []
+    for anchor in page.parsed.findall(".//a"):
+        if anchor.get("href"):
+            url = page.clean_link(urlparse.urljoin(page.url,
+                                                   anchor.get("href")))
+            links.append(Link(url, page, internal="internal" in
+                              (anchor.get("rel") or "").split()))
+    for anchor in page.parsed.findall(".//a"):
+        anchor.get("rel")
+    return [link.url for link in links]
+
+
+def extractor_links(page):
+    page.links
+    list(page.explicit_rel_links())
+    return [link.url for link in page.links]
+
+
+def bench(func, content, repeat=3):
+    best = None
+    for i in range(repeat):
+        page = HTMLPage(content, 'https://pypi.example.com/simple/bigproject/')
+        start = time.time()
+        func(page)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [5000, 20000, 50000]
+    for count in counts:
+        content = make_page(count)
+        size = len(content) / 1000.0 / 1000
+        old = bench(html5lib_links, content)
+        new = bench(extractor_links, content)
+        sys.stdout.write('%6d links (%.1fMB): html5lib %.3fs, '
+                         'extractor %.3fs (%.1fx)\n'
+                         % (count, size, old, new, old / new))
+
+
+if __name__ == '__main__':
+    main()
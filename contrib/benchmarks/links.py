@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Measure how fast PackageFinder classifies the links of a large project page:
+building the Link objects, filtering them with _package_versions and sorting
+the candidates like find_requirement does.
+
+    $ python contrib/benchmarks/links.py [number of links ...]
+"""
+
+import os
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(here)))
+
+from pip.index import Link, PackageFinder
+
+
+def make_urls(count):
+    urls = []
+    for i in range(count):
+        version = '%d.%d.%d' % (i // 1000, i // 10 % 100, i % 10)
+        kind = i % 4
+        if kind == 0:
+            filename = 'bigproject-%s.tar.gz' % version
+        elif kind == 1:
+            filename = 'bigproject-%s-py2.py3-none-any.whl' % version
+        elif kind == 2:
+            filename = 'bigproject-%s-cp27-none-win32.whl' % version
+        else:
+            filename = 'otherproject-%s.zip' % version
+        urls.append('https://pypi.example.com/packages/source/b/bigproject/'
+                    '%s#md5=%032x' % (filename, i))
+    return urls
+
+
+def classify(finder, urls):
+    links = [Link(url, trusted=True) for url in urls]
+    versions = list(finder._package_versions(links, 'bigproject'))
+    finder._sort_versions(versions)
+    return versions
+
+
+def bench(urls, repeat=3):
+    finder = PackageFinder([], [], use_wheel=True)
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        classify(finder, urls)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    for count in counts:
+        urls = make_urls(count)
+        elapsed = bench(urls)
+        sys.stdout.write('%6d links: %.3fs (%d links/s)\n'
+                         % (count, elapsed, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Measure how fast PackageFinder ranks wheel links: checking that each wheel
+is supported and sorting the candidates by tag preference like
+find_requirement does, for wheels built for many platforms.
+
+    $ python contrib/benchmarks/wheel_tags.py [number of links ...]
+"""
+
+import os
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(here)))
+
+from pip import pep425tags
+from pip.index import Link, PackageFinder
+
+PLATFORMS = ['win32', 'win_amd64', 'macosx_10_6_intel', 'macosx_10_9_x86_64',
+             'linux_i686', 'linux_x86_64', 'linux_armv7l', 'any']
+
+
+def make_links(count):
+    impl = pep425tags.get_abbr_impl() + pep425tags.get_impl_ver()
+    platform = pep425tags.get_platform()
+    links = []
+    for i in range(count):
+        version = '%d.%d' % (i // 100, i % 100)
+        kind = i % 4
+        if kind == 0:
+            # a multi-platform wheel with many tags, one of them ours
+            tags = '%s-none-%s' % (impl, '.'.join(PLATFORMS + [platform]))
+        elif kind == 1:
+            tags = 'py2.py3-none-any'
+        elif kind == 2:
+            tags = '%s-%s-%s' % (impl, 'none', platform)
+        else:
+            tags = 'py2.py3.%s-none-%s' % (impl, '.'.join(PLATFORMS))
+        filename = 'bigproject-%s-%s.whl' % (version, tags)
+        links.append(Link('https://pypi.example.com/packages/%s' % filename))
+    return links
+
+
+def rank(finder, links):
+    versions = []
+    for link in links:
+        if link.wheel.supported():
+            versions.append((link.wheel.version, link, link.wheel.version))
+    return finder._sort_versions(versions)
+
+
+def bench(links, repeat=3):
+    finder = PackageFinder([], [], use_wheel=True)
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        rank(finder, links)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    sys.stdout.write('%d supported tags\n' % len(pep425tags.supported_tags))
+    for count in counts:
+        links = make_links(count)
+        elapsed = bench(links)
+        sys.stdout.write('%6d links: %.3fs (%d links/s)\n'
+                         % (count, elapsed, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -33,6 +33,7 @@ if sys.version_info >= (3,):
     from urllib.request import url2pathname
     from urllib.request import urlretrieve
     from email import message as emailmessage
+    from html.parser import HTMLParser
     import urllib.parse as urllib
     import urllib.request as urllib2
     import configparser as ConfigParser
@@ -70,6 +71,7 @@ else:
     from Queue import Queue, Empty
     from urllib import url2pathname, urlretrieve
     from email import Message as emailmessage
+    from HTMLParser import HTMLParser
     import urllib
     import urllib2
     import urlparse
@@ -118,6 +120,24 @@ def product(*args, **kwds):
         yield tuple(prod)
 
 
+## HTMLParseError is gone as of py35, malformed markup then ends up
+## as an AssertionError from the parser instead
+try:
+    from HTMLParser import HTMLParseError
+except ImportError:
+    try:
+        from html.parser import HTMLParseError
+    except ImportError:
+        HTMLParseError = NeverUsedException
+
+
+## OrderedDict is new in py27
+try:
+    from collections import OrderedDict
+except ImportError:
+    from pip.vendor.distlib.compat import OrderedDict
+
+
 ## only >=py32 has ssl.match_hostname and ssl.CertificateError
 try:
     from ssl import match_hostname, CertificateError
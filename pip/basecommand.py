@@ -8,6 +8,7 @@ import traceback
 import time
 import optparse
 
+from pip import timing
 from pip.log import logger
 from pip.download import urlopen
 from pip.exceptions import (BadCommand, InstallationError, UninstallationError,
@@ -130,6 +131,9 @@ class Command(object):
 
         urlopen.setup(proxystr=options.proxy, prompting=not options.no_input)
 
+        if options.timing_report:
+            timing.start_report()
+
         exit = SUCCESS
         store_log = False
         try:
@@ -170,6 +174,14 @@ class Command(object):
             logger.fatal('Exception:\n%s' % format_exc())
             store_log = True
             exit = UNKNOWN_ERROR
+        if options.timing_report:
+            try:
+                timing.stop_report().write(options.timing_report)
+                logger.notify('Wrote the timing report to %s'
+                              % options.timing_report)
+            except IOError:
+                e = sys.exc_info()[1]
+                logger.warn('Could not write the timing report: %s' % e)
         if log_fp is not None:
             log_fp.close()
         if store_log:
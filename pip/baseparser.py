@@ -365,4 +365,12 @@ standard_options = [
         metavar='path',
         help = "Path to alternate CA bundle."),
 
+    optparse.make_option(
+        '--timing-report',
+        dest='timing_report',
+        metavar='file',
+        default=None,
+        help='Write the timings of all the network requests, and a summary '
+        'per host, to <file> as JSON.'),
+
     ]
@@ -0,0 +1,593 @@
+"""Caches that persist between pip runs"""
+
+import hashlib
+import json
+import os
+import posixpath
+import sys
+import tempfile
+import time
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+from pip.backwardcompat import bytes, urllib, urlparse
+from pip.log import logger
+from pip.util import current_umask, hash_file, link_or_copy
+
+__all__ = ['DiskCache', 'PageStore', 'FailureStore', 'ResolutionStore',
+           'DownloadStore']
+
+
+def _key_digest(key):
+    if not isinstance(key, bytes):
+        key = key.encode('utf-8')
+    return hashlib.sha1(key).hexdigest()
+
+
+def _ensure_dir(path):
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+def atomic_write(path, data):
+    """Write the bytes ``data`` to ``path`` so that concurrent readers (and
+    other pip processes) never see a partially written file."""
+    dirname = os.path.dirname(path)
+    _ensure_dir(dirname)
+    fd, temp_path = tempfile.mkstemp(dir=dirname, prefix='.tmp-')
+    try:
+        fp = os.fdopen(fd, 'wb')
+        try:
+            fp.write(data)
+        finally:
+            fp.close()
+        if sys.platform == 'win32' and os.path.exists(path):
+            # rename() doesn't overwrite on Windows
+            os.remove(path)
+        os.rename(temp_path, path)
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class DiskCache(object):
+    """A directory of small JSON records, each stored under the hash of its
+    key.  Unreadable or corrupt records are treated as missing."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key, ext='.json'):
+        digest = _key_digest(key)
+        return os.path.join(self.directory, digest[:2], digest[2:] + ext)
+
+    def _iter_paths(self, ext='.json'):
+        if not os.path.isdir(self.directory):
+            return
+        for prefix in sorted(os.listdir(self.directory)):
+            subdir = os.path.join(self.directory, prefix)
+            if len(prefix) != 2 or not os.path.isdir(subdir):
+                continue
+            for name in sorted(os.listdir(subdir)):
+                if name.endswith(ext):
+                    yield os.path.join(subdir, name)
+
+    def _read(self, path):
+        try:
+            fp = open(path, 'rb')
+            try:
+                return json.loads(fp.read().decode('utf-8'))
+            finally:
+                fp.close()
+        except (IOError, OSError, ValueError):
+            return None
+
+    def get(self, key):
+        record = self._read(self._path(key))
+        if record is None or record.get('key') != key:
+            return None
+        return record['value']
+
+    def set(self, key, value):
+        data = json.dumps({'key': key, 'value': value})
+        try:
+            atomic_write(self._path(key), data.encode('utf-8'))
+        except (IOError, OSError):
+            e = sys.exc_info()[1]
+            logger.debug('Could not write cache entry for %s: %s', key, e)
+
+    def delete(self, key):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def items(self):
+        """Yields (key, value) for every record in the cache"""
+        for path in self._iter_paths():
+            record = self._read(path)
+            if record is not None:
+                yield record['key'], record['value']
+
+    def clear(self):
+        for key, value in list(self.items()):
+            self.delete(key)
+
+
+class PageStore(DiskCache):
+    """
+    On-disk store of fetched index pages.
+
+    Next to every page body we keep the validators (ETag/Last-Modified) the
+    server sent and the URL the request resolved to, so that a later run can
+    revalidate the page with a conditional GET instead of fetching it again.
+    Pages younger than ``max_age`` seconds are used without revalidation.
+    Once the stored bodies exceed ``max_size`` bytes, the least recently used
+    pages are evicted.
+    """
+
+    validator_headers = ('ETag', 'Last-Modified', 'Content-Type')
+
+    def __init__(self, directory, max_age=0, max_size=None):
+        super(PageStore, self).__init__(directory)
+        self.max_age = max_age
+        self.max_size = max_size
+        self._size = None
+        self._size_lock = threading.Lock()
+
+    def get(self, url):
+        """Return the stored record for ``url`` with its body under
+        ``'content'``, or None if there is no (readable) entry"""
+        record = super(PageStore, self).get(url)
+        if record is None:
+            return None
+        body_path = self._path(url, '.body')
+        try:
+            fp = open(body_path, 'rb')
+            try:
+                record['content'] = fp.read()
+            finally:
+                fp.close()
+            # The body's mtime is the page's last use, for eviction
+            os.utime(body_path, None)
+        except (IOError, OSError):
+            return None
+        return record
+
+    def is_fresh(self, record):
+        return time.time() - record['stored'] < self.max_age
+
+    def conditional_headers(self, record):
+        """Request headers that revalidate the given record"""
+        headers = {}
+        validators = record['headers']
+        if validators.get('ETag'):
+            headers['If-None-Match'] = validators['ETag']
+        if validators.get('Last-Modified'):
+            headers['If-Modified-Since'] = validators['Last-Modified']
+        return headers
+
+    def store(self, url, real_url, headers, content):
+        validators = {}
+        for name in self.validator_headers:
+            if headers.get(name):
+                validators[name] = headers.get(name)
+        if not (validators.get('ETag') or validators.get('Last-Modified')):
+            # Nothing to revalidate with, so it could only ever be used
+            # while fresh
+            if not self.max_age:
+                return
+        try:
+            atomic_write(self._path(url, '.body'), content)
+        except (IOError, OSError):
+            e = sys.exc_info()[1]
+            logger.debug('Could not store page %s: %s', url, e)
+            return
+        self.set(url, {'real_url': real_url, 'headers': validators,
+                       'stored': time.time(), 'size': len(content)})
+        self._account(len(content))
+
+    def refresh(self, url, record):
+        """Mark a record as just revalidated (e.g. after a 304)"""
+        self.set(url, {'real_url': record['real_url'],
+                       'headers': record['headers'],
+                       'stored': time.time(), 'size': record['size']})
+
+    def delete(self, url):
+        super(PageStore, self).delete(url)
+        body_path = self._path(url, '.body')
+        if os.path.exists(body_path):
+            os.remove(body_path)
+
+    def _account(self, added):
+        if self.max_size is None:
+            return
+        self._size_lock.acquire()
+        try:
+            if self._size is None:
+                self._size = sum([os.path.getsize(path)
+                                  for path in self._iter_paths('.body')])
+            else:
+                self._size += added
+            if self._size > self.max_size:
+                self._evict()
+        finally:
+            self._size_lock.release()
+
+    def _evict(self):
+        """Remove the least recently used pages until the store is back
+        under 90% of its maximum size"""
+        bodies = []
+        for path in self._iter_paths('.body'):
+            try:
+                bodies.append((os.path.getmtime(path),
+                               os.path.getsize(path), path))
+            except OSError:
+                continue
+        bodies.sort()
+        self._size = sum([size for mtime, size, path in bodies])
+        target = self.max_size * 0.9
+        for mtime, size, path in bodies:
+            if self._size <= target:
+                break
+            record_path = path[:-len('.body')] + '.json'
+            for p in (path, record_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            self._size -= size
+            logger.debug('Evicted cached page %s', path)
+
+
+class FailureStore(DiskCache):
+    """
+    On-disk record of index locations that could not be fetched.
+
+    Every record holds the accumulated failure level of the URL, when it last
+    failed and for how many seconds (``ttl``) the failure is remembered, so
+    that later runs don't wait for the same dead host to time out again.
+    Expired records are treated as missing.
+    """
+
+    def __init__(self, directory, ttl=3600):
+        super(FailureStore, self).__init__(directory)
+        self.ttl = ttl
+
+    def is_expired(self, record):
+        return time.time() - record['failed'] >= record['ttl']
+
+    def get(self, url):
+        record = super(FailureStore, self).get(url)
+        if record is not None and self.is_expired(record):
+            self.delete(url)
+            return None
+        return record
+
+    def add_failure(self, url, level, reason=None):
+        """Record a failure of ``url``, on top of any unexpired earlier
+        ones, and return the new record"""
+        record = self.get(url)
+        if record is not None:
+            level += record['level']
+        record = {'level': level, 'failed': time.time(), 'ttl': self.ttl,
+                  'reason': reason}
+        self.set(url, record)
+        return record
+
+    def items(self):
+        """Yields (url, record) for every unexpired failure"""
+        for url, record in super(FailureStore, self).items():
+            if not self.is_expired(record):
+                yield url, record
+
+
+class ResolutionStore(DiskCache):
+    """
+    On-disk record of the versions PackageFinder found for a requirement,
+    kept for ``ttl`` seconds so that later runs asking the same question
+    don't search the indexes again.  The key describes everything the
+    answer depends on; expired records are treated as missing.
+    """
+
+    def __init__(self, directory, ttl=0):
+        super(ResolutionStore, self).__init__(directory)
+        self.ttl = ttl
+
+    def is_expired(self, record):
+        return time.time() - record['stored'] >= record['ttl']
+
+    def get(self, key):
+        """The list of stored versions, or None"""
+        record = super(ResolutionStore, self).get(key)
+        if record is None:
+            return None
+        if self.is_expired(record):
+            self.delete(key)
+            return None
+        return record['versions']
+
+    def store(self, key, versions):
+        self.set(key, {'versions': versions, 'stored': time.time(),
+                       'ttl': self.ttl})
+
+
+class DownloadStore(object):
+    """
+    Content-addressed store of downloaded archives, the ``--download-cache``.
+
+    Every file is kept once, under the sha256 of its content, in
+    ``files/<2 hex digits>/<rest of the digest>``.  The URLs it was
+    downloaded from and its hashes under other names (``md5=<hex>``) map to
+    that digest, so the same archive served by different mirrors is stored
+    once, and a link whose hash the index advertises is found by that hash
+    whatever its URL.  A file's mtime is its last use: once the files
+    exceed ``max_size`` bytes, the least recently used ones are evicted.
+
+    Downloads that were interrupted are kept in ``partial``, with the
+    validator (ETag or Last-Modified) their response had, so that they can
+    be resumed.
+    """
+
+    #: The hashes computed for every file, under which it can be found
+    hash_names = ('sha256', 'md5')
+
+    #: Seconds after which temporary files are left over from a pip run that
+    #: died, rather than being written to
+    stale_temp_age = 24 * 60 * 60
+
+    def __init__(self, directory, max_size=None):
+        self.directory = directory
+        self.max_size = max_size
+        # digest -> size, content type, file names, URLs and hashes
+        self.entries = DiskCache(os.path.join(directory, 'entries'))
+        # URL -> digest
+        self.urls = DiskCache(os.path.join(directory, 'urls'))
+        # '<hash name>=<hex digest>' -> digest
+        self.hashes = DiskCache(os.path.join(directory, 'hashes'))
+        # URL -> validator of an interrupted download
+        self.partials = DiskCache(os.path.join(directory, 'partial'))
+        self._files = os.path.join(directory, 'files')
+
+    def path(self, digest):
+        return os.path.join(self._files, digest[:2], digest[2:])
+
+    def _legacy_path(self, url):
+        """Where download caches of earlier pip versions stored url"""
+        return os.path.join(self.directory, urllib.quote(url, ''))
+
+    def lookup(self, url, hash_name=None, hash=None):
+        """
+        Return ``(digest, record)`` of the stored file that has the given
+        hash or, failing that, was downloaded from ``url``; None if there
+        is none.  The file is at ``self.path(digest)``.
+        """
+        self._import_legacy(url)
+        digest = None
+        if hash_name and hash:
+            if hash_name == 'sha256':
+                digest = hash
+            else:
+                digest = self.hashes.get('%s=%s' % (hash_name, hash))
+        found = digest is not None and self._entry(digest)
+        if not found:
+            digest = self.urls.get(url)
+            found = digest is not None and self._entry(digest)
+        if not found:
+            return None
+        # The file's mtime is its last use, for eviction
+        try:
+            os.utime(self.path(digest), None)
+        except OSError:
+            pass
+        return digest, found
+
+    def _entry(self, digest):
+        """The record of digest, if its file is there"""
+        record = self.entries.get(digest)
+        if record is not None and os.path.exists(self.path(digest)):
+            return record
+        return None
+
+    def store(self, url, filename, content_type, name=None, hash_name=None,
+              move=False):
+        """
+        Store the file ``filename`` downloaded from ``url`` (under the name
+        ``name``, by default the basename of ``filename``) and return its
+        digest.  ``hash_name`` is a hash the index uses for it, which is
+        computed too.  With ``move``, filename (which must be on the file
+        system of the store, e.g. from temp_path()) is renamed into place
+        rather than linked, and is gone afterwards.
+        """
+        hashes = self._hash_file(filename, hash_name)
+        digest = hashes['sha256']
+        path = self.path(digest)
+        added = 0
+        if not os.path.exists(path):
+            _ensure_dir(os.path.dirname(path))
+            if move:
+                os.rename(filename, path)
+            else:
+                link_or_copy(filename, path)
+            added = os.path.getsize(path)
+        elif move:
+            os.remove(filename)
+        record = self.entries.get(digest) or {
+            'size': os.path.getsize(path), 'content_type': content_type,
+            'names': [], 'urls': [], 'hashes': {}}
+        name = name or os.path.basename(filename)
+        if name not in record['names']:
+            record['names'].append(name)
+        if url not in record['urls']:
+            record['urls'].append(url)
+        record['hashes'].update(hashes)
+        self.entries.set(digest, record)
+        self.urls.set(url, digest)
+        for hash_name, value in hashes.items():
+            if hash_name != 'sha256':
+                self.hashes.set('%s=%s' % (hash_name, value), digest)
+        if added:
+            self._account()
+        return digest
+
+    def temp_path(self):
+        """A new, empty file to download to, on the file system of the
+        store so that store() can move it into place"""
+        _ensure_dir(self._files)
+        fd, path = tempfile.mkstemp(dir=self._files, prefix='.tmp-')
+        os.close(fd)
+        # mkstemp() makes files only their owner can read
+        os.chmod(path, 0o666 & ~current_umask())
+        return path
+
+    def _hash_file(self, filename, extra_name=None):
+        names = list(self.hash_names)
+        if extra_name and extra_name not in names:
+            names.append(extra_name)
+        hashes = {}
+        for name in names:
+            try:
+                hashes[name] = hashlib.new(name)
+            except (ValueError, TypeError):
+                continue
+        hash_file(filename, hashes.values())
+        result = {}
+        for name, hash in hashes.items():
+            result[name] = hash.hexdigest()
+        return result
+
+    def _import_legacy(self, url):
+        """Move the file of url stored by an earlier pip version, if any,
+        into the store"""
+        legacy_path = self._legacy_path(url)
+        content_type_path = legacy_path + '.content-type'
+        if not (os.path.isfile(legacy_path)
+                and os.path.isfile(content_type_path)):
+            return
+        try:
+            fp = open(content_type_path)
+            try:
+                content_type = fp.read().strip()
+            finally:
+                fp.close()
+            self.store(url, legacy_path, content_type,
+                       name=posixpath.basename(urlparse.urlsplit(url)[2]),
+                       move=True)
+            os.remove(content_type_path)
+        except (IOError, OSError):
+            e = sys.exc_info()[1]
+            logger.debug('Could not import cached download %s: %s',
+                         legacy_path, e)
+
+    def partial(self, url):
+        """
+        Return ``(path, validator, size)`` of the interrupted download of
+        url, or None if there is none to resume.
+        """
+        record = self.partials.get(url)
+        if record is None:
+            return None
+        path = self.partials._path(url, '.part')
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        if not size:
+            self.discard_partial(url)
+            return None
+        return path, record['validator'], size
+
+    def start_partial(self, url, validator):
+        """Return the path to download url to, keeping what was downloaded
+        if the download is interrupted.  ``validator`` is the ETag or
+        Last-Modified header to resume it with."""
+        path = self.partials._path(url, '.part')
+        _ensure_dir(os.path.dirname(path))
+        self.partials.set(url, {'validator': validator})
+        return path
+
+    def discard_partial(self, url):
+        self.partials.delete(url)
+        path = self.partials._path(url, '.part')
+        if os.path.exists(path):
+            os.remove(path)
+
+    def remove(self, digest):
+        """Remove the file of digest and everything that refers to it"""
+        record = self.entries.get(digest)
+        if record is not None:
+            for url in record['urls']:
+                if self.urls.get(url) == digest:
+                    self.urls.delete(url)
+            for hash_name, value in record['hashes'].items():
+                key = '%s=%s' % (hash_name, value)
+                if self.hashes.get(key) == digest:
+                    self.hashes.delete(key)
+            self.entries.delete(digest)
+        path = self.path(digest)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def items(self):
+        """
+        Yields ``(digest, record, last_used)`` for every stored file, the
+        record having the ``size``, ``content_type``, ``names``, ``urls``
+        and ``hashes`` of the file.
+        """
+        for digest, record in self.entries.items():
+            try:
+                last_used = os.path.getmtime(self.path(digest))
+            except OSError:
+                continue
+            yield digest, record, last_used
+
+    def size(self):
+        return sum([record['size'] for digest, record, last_used
+                    in self.items()])
+
+    def _account(self):
+        if self.max_size is not None and self.size() > self.max_size:
+            self.prune(self.max_size * 0.9)
+
+    def prune(self, max_size=None):
+        """
+        Remove the least recently used files until the store holds at most
+        ``max_size`` bytes, as well as records whose file is gone and
+        leftovers of interrupted writes.  Returns the number of files and
+        of bytes removed.
+        """
+        files = []
+        for digest, record in list(self.entries.items()):
+            try:
+                files.append((os.path.getmtime(self.path(digest)),
+                              record['size'], digest))
+            except OSError:
+                self.remove(digest)
+        for cache in (self.urls, self.hashes):
+            for key, digest in list(cache.items()):
+                if self.entries.get(digest) is None:
+                    cache.delete(key)
+        # Leave the downloads other pip processes may be running alone
+        stale = time.time() - self.stale_temp_age
+        for dirpath, dirnames, filenames in os.walk(self._files):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if (filename.startswith('.tmp-')
+                        and os.path.getmtime(path) < stale):
+                    os.remove(path)
+        files.sort()
+        size = sum([size for mtime, size, digest in files])
+        removed = freed = 0
+        for mtime, file_size, digest in files:
+            if max_size is None or size <= max_size:
+                break
+            self.remove(digest)
+            logger.debug('Evicted cached download %s', digest)
+            size -= file_size
+            removed += 1
+            freed += file_size
+        return removed, freed
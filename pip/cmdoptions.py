@@ -1,6 +1,6 @@
 """shared options and groups"""
 from optparse import make_option, OptionGroup, SUPPRESS_HELP
-from pip.locations import build_prefix
+from pip.locations import build_prefix, default_cache_dir
 
 
 def make_option_group(group, parser):
@@ -23,7 +23,9 @@ index_url = make_option(
     dest='index_url',
     metavar='URL',
     default='https://pypi.python.org/simple/',
-    help='Base URL of Python Package Index (default %default).')
+    help='Base URL of Python Package Index (default %default). Prefix it '
+    'with "json+" to use the JSON API of the index instead of its pages, '
+    'e.g. json+https://pypi.python.org/pypi.')
 
 extra_index_url = make_option(
     '--extra-index-url',
@@ -107,6 +109,119 @@ no_allow_unsafe = make_option(
     help=SUPPRESS_HELP
 )
 
+local_indexes = make_option(
+    '--local-index',
+    dest='local_indexes',
+    metavar='path',
+    action='append',
+    default=[],
+    help="Look for archives in an index built by 'pip index build', given "
+    "as the index file or the directory it was built for.")
+
+cache_dir = make_option(
+    '--cache-dir',
+    dest='cache_dir',
+    metavar='dir',
+    default=default_cache_dir,
+    help='Store index data reused between runs in <dir> (default %default).')
+
+no_page_cache = make_option(
+    '--no-page-cache',
+    dest='page_cache',
+    action='store_false',
+    default=True,
+    help="Don't reuse index pages fetched by previous runs.")
+
+page_cache_max_age = make_option(
+    '--page-cache-max-age',
+    dest='page_cache_max_age',
+    metavar='sec',
+    type='int',
+    default=0,
+    help='Use cached index pages younger than <sec> seconds without '
+    'revalidating them with the index (default %default).')
+
+page_cache_size = make_option(
+    '--page-cache-size',
+    dest='page_cache_size',
+    metavar='MB',
+    type='int',
+    default=100,
+    help='Maximum size of the index page cache in MB (default %default).')
+
+failure_ttl = make_option(
+    '--failure-ttl',
+    dest='failure_ttl',
+    metavar='sec',
+    type='int',
+    default=3600,
+    help='Skip dependency links and pages linked from project pages that '
+    'could not be reached in previous runs for <sec> seconds; 0 forgets '
+    'failures between runs (default %default).')
+
+resolution_ttl = make_option(
+    '--resolution-ttl',
+    dest='resolution_ttl',
+    metavar='sec',
+    type='int',
+    default=0,
+    help='Reuse the versions found for a requirement by previous runs for '
+    '<sec> seconds, without searching the indexes again; 0 always searches '
+    '(default %default).')
+
+no_head_probes = make_option(
+    '--no-head-probes',
+    dest='head_probes',
+    action='store_false',
+    default=True,
+    help="Don't check links that look like archives with a HEAD request "
+    "before fetching them as pages; stop the GET once its headers show it "
+    "isn't HTML instead.")
+
+max_fetches = make_option(
+    '--max-fetches',
+    dest='max_fetches',
+    metavar='n',
+    type='int',
+    default=16,
+    help='Fetch at most <n> index pages at a time (default %default).')
+
+max_host_fetches = make_option(
+    '--max-host-fetches',
+    dest='max_host_fetches',
+    metavar='n',
+    type='int',
+    default=6,
+    help='Fetch at most <n> index pages at a time from the same host '
+    '(default %default).')
+
+prefer_local = make_option(
+    '--prefer-local',
+    dest='prefer_local',
+    action='store_true',
+    default=False,
+    help="Don't search the indexes for a requirement when the find-links "
+    "locations, local indexes or installed version already have the highest "
+    "version it allows, e.g. the version it pins with ==.")
+
+hedge = make_option(
+    '--hedge',
+    dest='hedge',
+    action='store_true',
+    default=False,
+    help='Treat the index URLs as mirrors of each other: when a project page '
+    'is slow to come from one, ask the next one too and use the first answer. '
+    'How long is slow is learned from the earlier fetches from each host.')
+
+ordered_indexes = make_option(
+    '--ordered-indexes',
+    dest='ordered_indexes',
+    action='store_true',
+    default=False,
+    help='Search the index URLs one after the other, --index-url first, and '
+    'stop at the first that has a version the requirement allows: the next '
+    'indexes are not asked for the project at all.')
+
 requirements = make_option(
     '-r', '--requirement',
     dest='requirements',
@@ -129,6 +244,15 @@ download_cache = make_option(
     default=None,
     help='Cache downloaded packages in <dir>.')
 
+download_cache_size = make_option(
+    '--download-cache-size',
+    dest='download_cache_size',
+    metavar='MB',
+    type='int',
+    default=None,
+    help='Maximum size of the download cache in MB; beyond it the least '
+    'recently used files are removed (default: no limit).')
+
 no_deps = make_option(
     '--no-deps', '--no-dependencies',
     dest='ignore_dependencies',
@@ -188,5 +312,18 @@ index_group = {
         no_allow_external,
         allow_unsafe,
         no_allow_unsafe,
+        local_indexes,
+        cache_dir,
+        no_page_cache,
+        page_cache_max_age,
+        page_cache_size,
+        failure_ttl,
+        resolution_ttl,
+        no_head_probes,
+        max_fetches,
+        max_host_fetches,
+        prefer_local,
+        hedge,
+        ordered_indexes,
         ]
     }
@@ -4,9 +4,11 @@ Package containing all pip commands
 
 
 from pip.commands.bundle import BundleCommand
+from pip.commands.cache import CacheCommand
 from pip.commands.completion import CompletionCommand
 from pip.commands.freeze import FreezeCommand
 from pip.commands.help import HelpCommand
+from pip.commands.index import IndexCommand
 from pip.commands.list import ListCommand
 from pip.commands.search import SearchCommand
 from pip.commands.show import ShowCommand
@@ -19,9 +21,11 @@ from pip.commands.wheel import WheelCommand
 
 commands = {
     BundleCommand.name: BundleCommand,
+    CacheCommand.name: CacheCommand,
     CompletionCommand.name: CompletionCommand,
     FreezeCommand.name: FreezeCommand,
     HelpCommand.name: HelpCommand,
+    IndexCommand.name: IndexCommand,
     SearchCommand.name: SearchCommand,
     ShowCommand.name: ShowCommand,
     InstallCommand.name: InstallCommand,
@@ -41,6 +45,8 @@ commands_order = [
     ShowCommand,
     SearchCommand,
     WheelCommand,
+    IndexCommand,
+    CacheCommand,
     ZipCommand,
     UnzipCommand,
     BundleCommand,
@@ -0,0 +1,155 @@
+import fnmatch
+import os
+import time
+
+from pip.basecommand import Command
+from pip.cache import DownloadStore, FailureStore
+from pip.cmdoptions import cache_dir, download_cache, download_cache_size
+from pip.exceptions import CommandError
+from pip.log import logger
+from pip.util import format_size
+
+
+class CacheCommand(Command):
+    """
+    Inspect and clear the data pip keeps between runs.
+
+    Subcommands:
+
+    failures: List the index locations that failed recently and are
+              skipped until their failure expires.
+    clear-failures: Forget the failures of the given URLs, or of all URLs.
+    list: List the files of the download cache, most recently used first.
+    info: Show the size and location of the download cache.
+    prune: Remove the least recently used files of the download cache until
+           it fits in --download-cache-size, and records of missing files.
+    remove: Remove the files of the download cache with the given digests
+            (or digest prefixes), URLs or file name patterns.
+    """
+    name = 'cache'
+    usage = """
+      %prog [options] failures
+      %prog [options] clear-failures [url ...]
+      %prog [options] list
+      %prog [options] info
+      %prog [options] prune
+      %prog [options] remove <digest|url|pattern> ..."""
+    summary = 'Inspect and clear the caches of index data and downloads.'
+
+    def __init__(self, *args, **kw):
+        super(CacheCommand, self).__init__(*args, **kw)
+        self.cmd_opts.add_option(cache_dir)
+        self.cmd_opts.add_option(download_cache)
+        self.cmd_opts.add_option(download_cache_size)
+
+        self.parser.insert_option_group(0, self.cmd_opts)
+
+    def run(self, options, args):
+        handlers = {
+            'failures': self.list_failures,
+            'clear-failures': self.clear_failures,
+            'list': self.list_downloads,
+            'info': self.download_info,
+            'prune': self.prune_downloads,
+            'remove': self.remove_downloads,
+        }
+        if not args or args[0] not in handlers:
+            raise CommandError('Please provide one of these subcommands: %s'
+                               % ', '.join(sorted(handlers)))
+        handlers[args[0]](options, args[1:])
+
+    def _failure_store(self, options):
+        return FailureStore(os.path.join(options.cache_dir, 'failures'))
+
+    def _download_store(self, options):
+        if not options.download_cache:
+            raise CommandError('Please give the download cache with '
+                               '--download-cache')
+        return DownloadStore(os.path.expanduser(options.download_cache))
+
+    def list_failures(self, options, args):
+        store = self._failure_store(options)
+        now = time.time()
+        failures = sorted(store.items())
+        if not failures:
+            logger.notify('No failed URLs are remembered.')
+        for url, record in failures:
+            logger.notify('%s (level %s, failed %s ago, expires in %s): %s'
+                          % (url, record['level'],
+                             format_seconds(now - record['failed']),
+                             format_seconds(record['failed'] + record['ttl'] - now),
+                             record['reason']))
+
+    def clear_failures(self, options, args):
+        store = self._failure_store(options)
+        if not args:
+            args = [url for url, record in store.items()]
+        for url in args:
+            store.delete(url)
+            logger.notify('Cleared %s' % url)
+
+    def list_downloads(self, options, args):
+        store = self._download_store(options)
+        now = time.time()
+        items = sorted(store.items(), key=lambda item: -item[2])
+        if not items:
+            logger.notify('The download cache is empty.')
+        for digest, record, last_used in items:
+            logger.notify('%s %8s  %s (used %s ago)'
+                          % (digest[:12], format_size(record['size']),
+                             ', '.join(record['names']),
+                             format_seconds(now - last_used)))
+            logger.indent += 2
+            try:
+                for url in record['urls']:
+                    logger.info(url)
+            finally:
+                logger.indent -= 2
+
+    def download_info(self, options, args):
+        store = self._download_store(options)
+        items = list(store.items())
+        urls = 0
+        for digest, record, last_used in items:
+            urls += len(record['urls'])
+        logger.notify('Location: %s' % store.directory)
+        logger.notify('Files: %s (from %s URLs)' % (len(items), urls))
+        logger.notify('Size: %s' % format_size(
+            sum([record['size'] for digest, record, last_used in items])))
+        if options.download_cache_size is not None:
+            logger.notify('Maximum size: %s MB' % options.download_cache_size)
+
+    def prune_downloads(self, options, args):
+        store = self._download_store(options)
+        max_size = None
+        if options.download_cache_size is not None:
+            max_size = options.download_cache_size * 1000 * 1000
+        removed, freed = store.prune(max_size)
+        logger.notify('Removed %s files (%s)' % (removed, format_size(freed)))
+
+    def remove_downloads(self, options, args):
+        if not args:
+            raise CommandError('Please give the digests, URLs or file name '
+                               'patterns of the files to remove')
+        store = self._download_store(options)
+        removed = 0
+        for digest, record, last_used in list(store.items()):
+            for arg in args:
+                if (digest.startswith(arg) or arg in record['urls']
+                        or fnmatch.filter(record['names'], arg)):
+                    store.remove(digest)
+                    logger.notify('Removed %s (%s)'
+                                  % (', '.join(record['names']), digest[:12]))
+                    removed += 1
+                    break
+        if not removed:
+            logger.warn('No cached download matches %s' % ' '.join(args))
+
+
+def format_seconds(seconds):
+    seconds = int(max(seconds, 0))
+    if seconds >= 3600:
+        return '%dh%02dm' % (seconds // 3600, seconds % 3600 // 60)
+    if seconds >= 60:
+        return '%dm%02ds' % (seconds // 60, seconds % 60)
+    return '%ds' % seconds
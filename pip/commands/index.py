@@ -0,0 +1,46 @@
+import os
+
+from pip.basecommand import Command
+from pip.exceptions import CommandError
+from pip.localindex import build_index, local_index_name
+from pip.log import logger
+
+
+class IndexCommand(Command):
+    """
+    Build a local package index.
+
+    Subcommands:
+
+    build: Index the archives below a directory (a plain directory of
+           archives or a mirrored simple index tree), so that
+           'pip install --local-index <dir>' finds them without scanning
+           or parsing pages.  Running it again only hashes the files that
+           were added or changed since.
+    """
+    name = 'index'
+    usage = """
+      %prog [options] build <dir>"""
+    summary = 'Build a local package index.'
+
+    def __init__(self, *args, **kw):
+        super(IndexCommand, self).__init__(*args, **kw)
+        self.cmd_opts.add_option(
+            '-o', '--output',
+            dest='output',
+            metavar='file',
+            default=None,
+            help='Write the index to <file> instead of <dir>/%s.'
+            % local_index_name)
+
+        self.parser.insert_option_group(0, self.cmd_opts)
+
+    def run(self, options, args):
+        if len(args) != 2 or args[0] != 'build':
+            raise CommandError('Please use: pip index build <dir>')
+        directory = args[1]
+        if not os.path.isdir(directory):
+            raise CommandError('%s is not a directory' % directory)
+        added, removed, total = build_index(directory, options.output)
+        logger.notify('Indexed %s files (%s new or changed, %s removed)'
+                      % (total, added, removed))
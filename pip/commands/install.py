@@ -69,6 +69,7 @@ class InstallCommand(Command):
             help="Download packages into <dir> instead of installing them, regardless of what's already installed.")
 
         cmd_opts.add_option(cmdoptions.download_cache)
+        cmd_opts.add_option(cmdoptions.download_cache_size)
 
         cmd_opts.add_option(
             '--src', '--source', '--source-dir', '--source-directory',
@@ -164,6 +165,19 @@ class InstallCommand(Command):
                              allow_insecure=options.allow_insecure,
                              allow_all_external=options.allow_all_external,
                              allow_all_prereleases=options.pre,
+                             cache_dir=options.cache_dir,
+                             page_cache=options.page_cache,
+                             page_cache_max_age=options.page_cache_max_age,
+                             page_cache_max_size=options.page_cache_size * 1000 * 1000,
+                             failure_ttl=options.failure_ttl,
+                             resolution_ttl=options.resolution_ttl,
+                             head_probes=options.head_probes,
+                             local_indexes=options.local_indexes,
+                             max_fetches=options.max_fetches,
+                             max_host_fetches=options.max_host_fetches,
+                             prefer_local=options.prefer_local,
+                             hedge=options.hedge,
+                             ordered_indexes=options.ordered_indexes,
                             )
 
     def run(self, options, args):
@@ -208,11 +222,15 @@ class InstallCommand(Command):
 
         finder = self._build_package_finder(options, index_urls)
 
+        download_cache_size = None
+        if options.download_cache_size is not None:
+            download_cache_size = options.download_cache_size * 1000 * 1000
         requirement_set = RequirementSet(
             build_dir=options.build_dir,
             src_dir=options.src_dir,
             download_dir=options.download_dir,
             download_cache=options.download_cache,
+            download_cache_size=download_cache_size,
             upgrade=options.upgrade,
             as_egg=options.as_egg,
             ignore_installed=options.ignore_installed,
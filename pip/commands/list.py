@@ -64,6 +64,19 @@ class ListCommand(Command):
                              allow_insecure=options.allow_insecure,
                              allow_all_external=options.allow_all_external,
                              allow_all_prereleases=options.pre,
+                             cache_dir=options.cache_dir,
+                             page_cache=options.page_cache,
+                             page_cache_max_age=options.page_cache_max_age,
+                             page_cache_max_size=options.page_cache_size * 1000 * 1000,
+                             failure_ttl=options.failure_ttl,
+                             resolution_ttl=options.resolution_ttl,
+                             head_probes=options.head_probes,
+                             local_indexes=options.local_indexes,
+                             max_fetches=options.max_fetches,
+                             max_host_fetches=options.max_host_fetches,
+                             prefer_local=options.prefer_local,
+                             hedge=options.hedge,
+                             ordered_indexes=options.ordered_indexes,
                         )
 
     def run(self, options, args):
@@ -112,17 +125,15 @@ class ListCommand(Command):
         finder.add_dependency_links(dependency_links)
 
         installed_packages = get_installed_distributions(local_only=options.local, include_editables=False, skip=self.skip)
-        for dist in installed_packages:
-            req = InstallRequirement.from_line(dist.key, None)
-            try:
-                link = finder.find_requirement(req, True)
-
-                # If link is None, means installed version is most up-to-date
-                if link is None:
-                    continue
-            except DistributionNotFound:
+        reqs = [InstallRequirement.from_line(dist.key, None)
+                for dist in installed_packages]
+        # Looking the packages up together fetches their pages concurrently
+        results = finder.find_requirements(reqs, True)
+        for dist, req, link in zip(installed_packages, reqs, results):
+            # If link is None, means installed version is most up-to-date
+            if link is None or isinstance(link, DistributionNotFound):
                 continue
-            except BestVersionAlreadyInstalled:
+            if isinstance(link, BestVersionAlreadyInstalled):
                 remote_version = req.installed_version
             else:
                 # It might be a good idea that link or finder had a public method
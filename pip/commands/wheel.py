@@ -57,6 +57,7 @@ class WheelCommand(Command):
             help="Extra arguments to be supplied to 'setup.py bdist_wheel'.")
         cmd_opts.add_option(cmdoptions.requirements)
         cmd_opts.add_option(cmdoptions.download_cache)
+        cmd_opts.add_option(cmdoptions.download_cache_size)
         cmd_opts.add_option(cmdoptions.no_deps)
         cmd_opts.add_option(cmdoptions.build_dir)
 
@@ -116,14 +117,31 @@ class WheelCommand(Command):
                                allow_insecure=options.allow_insecure,
                                allow_all_external=options.allow_all_external,
                                allow_all_prereleases=options.pre,
+                               cache_dir=options.cache_dir,
+                               page_cache=options.page_cache,
+                               page_cache_max_age=options.page_cache_max_age,
+                               page_cache_max_size=options.page_cache_size * 1000 * 1000,
+                               failure_ttl=options.failure_ttl,
+                               resolution_ttl=options.resolution_ttl,
+                               head_probes=options.head_probes,
+                               local_indexes=options.local_indexes,
+                               max_fetches=options.max_fetches,
+                               max_host_fetches=options.max_host_fetches,
+                               prefer_local=options.prefer_local,
+                               hedge=options.hedge,
+                               ordered_indexes=options.ordered_indexes,
                             )
 
         options.build_dir = os.path.abspath(options.build_dir)
+        download_cache_size = None
+        if options.download_cache_size is not None:
+            download_cache_size = options.download_cache_size * 1000 * 1000
         requirement_set = RequirementSet(
             build_dir=options.build_dir,
             src_dir=None,
             download_dir=None,
             download_cache=options.download_cache,
+            download_cache_size=download_cache_size,
             ignore_dependencies=options.ignore_dependencies,
             ignore_installed=True)
 
@@ -10,16 +10,25 @@ import socket
 import ssl
 import sys
 import tempfile
+import time
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
 
 import pip
 
+from pip import timing
 from pip.backwardcompat import (urllib, urllib2, httplib,
                                 urlparse, string_types, get_http_message_param,
-                                match_hostname, CertificateError)
+                                match_hostname, CertificateError, b)
+from pip.cache import DownloadStore
 from pip.exceptions import InstallationError, HashMismatch
 from pip.util import (splitext, rmtree, format_size, display_path,
                       backup_dir, ask_path_exists, unpack_file,
-                      create_download_cache_folder, cache_download)
+                      create_download_cache_folder, hash_file,
+                      link_or_copy, start_untar)
 from pip.vcs import vcs
 from pip.log import logger
 from pip.locations import default_cert_path
@@ -101,6 +110,57 @@ def get_file_content(url, comes_from=None):
 _scheme_re = re.compile(r'^(http|https|file):', re.I)
 _url_slash_drive_re = re.compile(r'/*([a-z])\|', re.I)
 
+def _create_connection(address, **kwargs):
+    """
+    socket.create_connection(), with the DNS lookup and the connect timed
+    separately when the request is being timed.
+    """
+    timed = timing.current()
+    if timed is None:
+        return socket.create_connection(address, **kwargs)
+    host, port = address
+    start = time.time()
+    infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    timed.dns = time.time() - start
+    start = time.time()
+    error = socket.error('getaddrinfo returns an empty list')
+    for family, socktype, proto, canonname, sockaddr in infos:
+        sock = None
+        try:
+            sock = socket.socket(family, socktype, proto)
+            # New sockets have the default timeout, which httplib's
+            #   default timeout object stands for
+            timeout = kwargs.get('timeout', sock.gettimeout())
+            if timeout is None or isinstance(timeout, (int, float)):
+                sock.settimeout(timeout)
+            if kwargs.get('source_address'):
+                sock.bind(kwargs['source_address'])
+            sock.connect(sockaddr)
+            timed.connect = time.time() - start
+            return sock
+        except socket.error:
+            error = sys.exc_info()[1]
+            if sock is not None:
+                sock.close()
+    raise error
+
+
+class TimedHTTPConnection(httplib.HTTPConnection):
+    """
+    A HTTPConnection whose DNS lookup and connect are timed when the request
+    is being timed.
+    """
+    def connect(self):
+        if timing.current() is None:
+            return httplib.HTTPConnection.connect(self)
+        kwargs = {'timeout': self.timeout}
+        if getattr(self, 'source_address', None):
+            kwargs['source_address'] = self.source_address
+        self.sock = _create_connection((self.host, self.port), **kwargs)
+        if getattr(self, '_tunnel_host', None):
+            self._tunnel()
+
+
 class VerifiedHTTPSConnection(httplib.HTTPSConnection):
     """
     A connection that wraps connections with ssl certificate verification.
@@ -119,7 +179,7 @@ class VerifiedHTTPSConnection(httplib.HTTPSConnection):
         if hasattr(self, 'source_address'):
             self.connection_kwargs.update(source_address = self.source_address)
 
-        sock = socket.create_connection((self.host, self.port), **self.connection_kwargs)
+        sock = _create_connection((self.host, self.port), **self.connection_kwargs)
 
         # for >= py2.7
         if getattr(self, '_tunnel_host', None):
@@ -129,11 +189,15 @@ class VerifiedHTTPSConnection(httplib.HTTPSConnection):
         # get alternate bundle or use our included bundle
         cert_path = os.environ.get('PIP_CERT', '') or default_cert_path
 
+        start = time.time()
         self.sock = ssl.wrap_socket(sock,
                                 self.key_file,
                                 self.cert_file,
                                 cert_reqs=ssl.CERT_REQUIRED,
                                 ca_certs=cert_path)
+        timed = timing.current()
+        if timed is not None:
+            timed.tls = time.time() - start
 
         try:
             match_hostname(self.sock.getpeercert(), self.host)
@@ -144,14 +208,210 @@ class VerifiedHTTPSConnection(httplib.HTTPSConnection):
 
 
 
+class PooledResponse(object):
+    """
+    The body of a response received on a pooled connection.  Once it has
+    been read completely the connection goes back to the pool, if it is
+    closed early the connection is dropped.
+    """
+    def __init__(self, response, release):
+        self._response = response
+        self._release = release
+        self._buffer = b('')
+
+    def _finish(self, complete):
+        if self._release is not None:
+            keep = complete and not self._response.will_close
+            self._release(keep)
+            self._release = None
+
+    def _is_complete(self):
+        response = self._response
+        return (response.isclosed()
+                or (not response.chunked and response.length == 0))
+
+    def read(self, amt=None):
+        if amt is None:
+            data = self._response.read()
+        else:
+            data = self._response.read(amt)
+        if not data or self._is_complete():
+            self._finish(True)
+        return data
+
+    def readline(self, *args):
+        response = self._response
+        if hasattr(response, 'readline'):
+            line = response.readline(*args)
+            if not line or self._is_complete():
+                self._finish(True)
+            return line
+        # Python 2's HTTPResponse can't read lines itself, and reading from
+        # its socket file directly would block on a kept-alive connection
+        line = self._buffer
+        while not line.endswith(b('\n')):
+            data = self.read(8192)
+            if not data:
+                break
+            line += data
+        pos = line.find(b('\n')) + 1 or len(line)
+        line, self._buffer = line[:pos], line[pos:]
+        return line
+
+    def readlines(self, *args):
+        return list(self)
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+    def fileno(self):
+        return self._response.fileno()
+
+    def close(self):
+        self._finish(self._is_complete())
+        self._response.close()
+
+
+class ConnectionPool(object):
+    """
+    Keeps HTTP/1.1 connections alive between requests, so that fetching many
+    pages from (and downloading from) the same host doesn't pay a TCP and
+    TLS handshake per request.  Connections are pooled per host and through
+    proxies per (proxy, tunneled host); at most ``maxsize`` idle connections
+    are kept per host and idle connections older than ``idle_timeout``
+    seconds are closed rather than reused.
+    """
+    def __init__(self, maxsize=10, idle_timeout=60):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        now = time.time()
+        self._lock.acquire()
+        try:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, released = idle.pop()
+                if now - released < self.idle_timeout:
+                    return conn
+                conn.close()
+        finally:
+            self._lock.release()
+        return None
+
+    def _put(self, key, conn):
+        self._lock.acquire()
+        try:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append((conn, time.time()))
+                return
+        finally:
+            self._lock.release()
+        conn.close()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            for idle in self._idle.values():
+                for conn, released in idle:
+                    conn.close()
+            self._idle = {}
+        finally:
+            self._lock.release()
+
+    def open(self, connection_class, req):
+        """The keep-alive counterpart of urllib2's AbstractHTTPHandler.do_open"""
+        if hasattr(req, 'get_host'):
+            host = req.get_host()
+        else:
+            host = req.host
+        if not host:
+            raise urllib2.URLError('no host given')
+        tunnel_host = getattr(req, '_tunnel_host', None)
+        key = (connection_class, host, tunnel_host)
+
+        headers = dict(req.unredirected_hdrs)
+        headers.update(dict((k, v) for k, v in req.headers.items()
+                            if k not in headers))
+        headers['Connection'] = 'keep-alive'
+        headers = dict((name.title(), val) for name, val in headers.items())
+        tunnel_headers = {}
+        if tunnel_host and 'Proxy-Authorization' in headers:
+            tunnel_headers['Proxy-Authorization'] = headers.pop('Proxy-Authorization')
+        if hasattr(req, 'get_selector'):
+            selector = req.get_selector()
+        else:
+            selector = req.selector
+
+        conn = self._get(key)
+        reused = conn is not None
+        timed = timing.current()
+        while True:
+            if conn is None:
+                conn = connection_class(host, timeout=req.timeout)
+                if tunnel_host:
+                    set_tunnel = getattr(conn, 'set_tunnel', None) or conn._set_tunnel
+                    set_tunnel(tunnel_host, headers=tunnel_headers)
+            try:
+                conn.request(req.get_method(), selector, req.data, headers)
+                response = conn.getresponse()
+                if timed is not None:
+                    timed.reused = reused
+                    timed.first_byte = timed.elapsed()
+                break
+            except (socket.error, httplib.HTTPException):
+                e = sys.exc_info()[1]
+                conn.close()
+                conn = None
+                if not reused:
+                    raise urllib2.URLError(e)
+                # The server closed the idle connection; try a fresh one
+                reused = False
+
+        def release(keep):
+            if keep:
+                self._put(key, conn)
+            else:
+                conn.close()
+
+        resp = urllib2.addinfourl(PooledResponse(response, release),
+                                  response.msg, req.get_full_url())
+        resp.code = response.status
+        resp.msg = response.reason
+        return resp
+
+
+class PooledHTTPHandler(urllib2.HTTPHandler):
+    """
+    A HTTPHandler that reuses connections from a ConnectionPool.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+        urllib2.HTTPHandler.__init__(self)
+
+    def http_open(self, req):
+        return self.pool.open(TimedHTTPConnection, req)
+
+
 class VerifiedHTTPSHandler(urllib2.HTTPSHandler):
     """
-    A HTTPSHandler that uses our own VerifiedHTTPSConnection.
+    A HTTPSHandler that uses our own VerifiedHTTPSConnection, reused from a
+    ConnectionPool if one is given.
     """
-    def __init__(self, connection_class = VerifiedHTTPSConnection):
+    def __init__(self, connection_class = VerifiedHTTPSConnection, pool=None):
         self.specialized_conn_class = connection_class
+        self.pool = pool
         urllib2.HTTPSHandler.__init__(self)
     def https_open(self, req):
+        if self.pool is not None:
+            return self.pool.open(self.specialized_conn_class, req)
         return self.do_open(self.specialized_conn_class, req)
 
 
@@ -162,6 +422,9 @@ class URLOpener(object):
     def __init__(self):
         self.passman = urllib2.HTTPPasswordMgrWithDefaultRealm()
         self.proxy_handler = None
+        # Shared by all openers, so page fetches, HEAD requests and
+        #   downloads all reuse the same connections
+        self.pool = ConnectionPool()
 
     def __call__(self, url):
         """
@@ -197,7 +460,11 @@ class URLOpener(object):
         does the dirty work of actually getting the rsponse object using urllib2
         and its HTTP auth builtins.
         """
-        scheme, netloc, path, query, frag = urlparse.urlsplit(url)
+        if isinstance(url, urllib2.Request):
+            scheme, netloc, path, query, frag = urlparse.urlsplit(
+                url.get_full_url())
+        else:
+            scheme, netloc, path, query, frag = urlparse.urlsplit(url)
         req = self.get_request(url)
 
         stored_username, stored_password = self.passman.find_user_password(None, netloc)
@@ -224,14 +491,14 @@ class URLOpener(object):
             args.extend([self.proxy_handler, urllib2.CacheFTPHandler])
 
         if kwargs.get('scheme') == 'https':
-            https_handler = VerifiedHTTPSHandler()
+            https_handler = VerifiedHTTPSHandler(pool=self.pool)
             director = urllib2.build_opener(https_handler, *args)
             #strip out HTTPHandler to prevent MITM spoof
             for handler in director.handlers:
                 if isinstance(handler, urllib2.HTTPHandler):
                     director.handlers.remove(handler)
         else:
-            director = urllib2.build_opener(*args)
+            director = urllib2.build_opener(PooledHTTPHandler(self.pool), *args)
 
         # Add our new headers to the opener
         headers = [x for x in director.addheaders if x[0].lower() != "user-agent"]
@@ -265,8 +532,13 @@ class URLOpener(object):
 
         Returns a tuple:
             (url-without-auth, username, password)
+
+        If url is a urllib2.Request, url-without-auth is one too, with the
+        same headers.
         """
+        request = None
         if isinstance(url, urllib2.Request):
+            request = url
             result = urlparse.urlsplit(url.get_full_url())
         else:
             result = urlparse.urlsplit(url)
@@ -286,6 +558,9 @@ class URLOpener(object):
             netloc = netloc.replace('%s:%s@' % (username, password), '', 1)
 
         target_url = urlparse.urlunsplit((scheme, netloc, path, query, frag))
+        if request is not None:
+            target_url = urllib2.Request(
+                target_url, headers=dict(request.header_items()))
         return target_url, username, password, scheme
 
     def get_proxy(self, proxystr=''):
@@ -455,31 +730,49 @@ def _get_hash_from_file(target_file, link):
         logger.warn("Unsupported hash name %s for package %s" % (link.hash_name, link))
         return None
 
-    fp = open(target_file, 'rb')
-    while True:
-        chunk = fp.read(4096)
-        if not chunk:
-            break
-        download_hash.update(chunk)
-    fp.close()
+    hash_file(target_file, [download_hash])
     return download_hash
 
 
-def _download_url(resp, link, temp_location):
-    fp = open(temp_location, 'wb')
+#: The range of the sizes of the reads of downloads, in bytes
+DOWNLOAD_CHUNK_MIN = 64 * 1024
+DOWNLOAD_CHUNK_MAX = 4 * 1024 * 1024
+#: How long one read of a download may take before reads get smaller
+DOWNLOAD_CHUNK_TIME = 0.2
+#: The minimum time between two redraws of the progress of a download
+PROGRESS_INTERVAL = 0.1
+
+
+def _download_url(resp, link, temp_location, offset=0, stream=None):
+    """
+    Write the body of resp to temp_location and return its hash, if link
+    has one.  If ``offset`` is given, resp is the rest of the file whose
+    first ``offset`` bytes are in temp_location already.  The body is
+    written to ``stream`` (a TarStream) as well, if given.
+    """
     download_hash = None
     if link.hash and link.hash_name:
         try:
             download_hash = hashlib.new(link.hash_name)
         except ValueError:
             logger.warn("Unsupported hash name %s for package %s" % (link.hash_name, link))
+    if offset:
+        # The hash covers the whole file, not only what's downloaded now
+        if download_hash is not None:
+            hash_file(temp_location, [download_hash])
+        fp = open(temp_location, 'ab')
+    else:
+        fp = open(temp_location, 'wb')
     try:
         total_length = int(resp.info()['content-length'])
     except (ValueError, KeyError, TypeError):
         total_length = 0
-    downloaded = 0
+    if total_length:
+        total_length += offset
+    downloaded = offset
     show_progress = total_length > 40 * 1000 or not total_length
     show_url = link.show_url
+    timed = timing.current()
     try:
         if show_progress:
             ## FIXME: the URL can get really long in this message:
@@ -489,14 +782,28 @@ def _download_url(resp, link, temp_location):
                 logger.start_progress('Downloading %s (unknown size): ' % show_url)
         else:
             logger.notify('Downloading %s' % show_url)
-        logger.info('Downloading from URL %s' % link)
+        logger.info('Downloading from URL %s', link)
 
+        chunk_size = DOWNLOAD_CHUNK_MIN
+        last_progress = 0
         while True:
-            chunk = resp.read(4096)
+            started = time.time()
+            chunk = resp.read(chunk_size)
             if not chunk:
                 break
+            elapsed = time.time() - started
+            # Read more at once while the data comes in fast, less when a
+            #   read keeps the progress waiting
+            if (len(chunk) == chunk_size and elapsed < DOWNLOAD_CHUNK_TIME / 4
+                    and chunk_size < DOWNLOAD_CHUNK_MAX):
+                chunk_size *= 2
+            elif elapsed > DOWNLOAD_CHUNK_TIME and chunk_size > DOWNLOAD_CHUNK_MIN:
+                chunk_size //= 2
             downloaded += len(chunk)
-            if show_progress:
+            # show_progress() only writes while no other message was shown
+            if (show_progress and logger.in_progress_hanging
+                    and started - last_progress >= PROGRESS_INTERVAL):
+                last_progress = started
                 if not total_length:
                     logger.show_progress('%s' % format_size(downloaded))
                 else:
@@ -504,13 +811,50 @@ def _download_url(resp, link, temp_location):
             if download_hash is not None:
                 download_hash.update(chunk)
             fp.write(chunk)
+            if stream is not None:
+                stream.write(chunk)
+        fp.close()
+        if total_length and downloaded < total_length:
+            # The connection was closed early
+            raise IOError('Download of %s stopped after %s of %s'
+                          % (link, format_size(downloaded),
+                             format_size(total_length)))
+    except:
         fp.close()
+        timing.end(timed, status=getattr(resp, 'code', None),
+                   bytes=downloaded - offset, cache='miss',
+                   error=sys.exc_info()[1])
+        raise
     finally:
         if show_progress:
             logger.end_progress('%s downloaded' % format_size(downloaded))
+    timing.end(timed, status=getattr(resp, 'code', None),
+               bytes=downloaded - offset, cache='miss')
     return download_hash
 
 
+def _resume_validator(resp):
+    """The validator to resume the download of resp with, if the server
+    takes byte ranges for it"""
+    info = resp.info()
+    if (info.get('accept-ranges', '').lower() != 'bytes'
+            or info.get('content-encoding', 'identity') != 'identity'):
+        return None
+    etag = info.get('etag')
+    # If-Range only works with strong ETags
+    if etag and not etag.startswith('W/'):
+        return etag
+    return info.get('last-modified')
+
+
+def _resumes(resp, offset):
+    """Is resp the part of the file after its first offset bytes?"""
+    if getattr(resp, 'code', None) != 206:
+        return False
+    content_range = resp.info().get('content-range', '')
+    return content_range.startswith('bytes %s-' % offset)
+
+
 def _copy_file(filename, location, content_type, link):
     copy = True
     download_location = os.path.join(location, link.filename)
@@ -529,30 +873,27 @@ def _copy_file(filename, location, content_type, link):
                         % (display_path(download_location), display_path(dest_file)))
             shutil.move(download_location, dest_file)
     if copy:
-        shutil.copy(filename, download_location)
+        link_or_copy(filename, download_location)
         logger.indent -= 2
         logger.notify('Saved %s' % display_path(download_location))
 
 
-def unpack_http_url(link, location, download_cache, download_dir=None):
+def unpack_http_url(link, location, download_cache, download_dir=None,
+                    download_cache_size=None):
     temp_dir = tempfile.mkdtemp('-unpack', 'pip-')
     temp_location = None
     target_url = link.url.split('#', 1)[0]
 
-    already_cached = False
-    cache_file = None
-    cache_content_type_file = None
+    store = None
+    cached = None
+    stored = False
+    unpacked = False
     download_hash = None
     if download_cache:
-        cache_file = os.path.join(download_cache,
-                                   urllib.quote(target_url, ''))
-        cache_content_type_file = cache_file + '.content-type'
-        already_cached = (
-            os.path.exists(cache_file) and
-            os.path.exists(cache_content_type_file)
-            )
         if not os.path.isdir(download_cache):
             create_download_cache_folder(download_cache)
+        store = DownloadStore(download_cache, max_size=download_cache_size)
+        cached = store.lookup(target_url, link.hash_name, link.hash)
 
     already_downloaded = None
     if download_dir:
@@ -578,11 +919,15 @@ def unpack_http_url(link, location, download_cache, download_dir=None):
                 already_downloaded = None
 
     # We have a cached file, and we haven't already found a good downloaded copy
-    if already_cached and not temp_location:
-        with open(cache_content_type_file) as fp:
-            content_type = fp.read().strip()
-        temp_location = cache_file
+    if cached is not None and not temp_location:
+        digest, record = cached
+        cache_file = store.path(digest)
+        content_type = record['content_type']
+        # A link under the file's name, which unpacking goes by
+        temp_location = os.path.join(temp_dir, link.filename)
+        link_or_copy(cache_file, temp_location)
         logger.notify('Using download cache from %s' % cache_file)
+        timing.end(timing.begin(target_url, 'download'), cache='hit')
         if link.hash and link.hash_name:
             download_hash = _get_hash_from_file(cache_file, link)
             try:
@@ -592,14 +937,24 @@ def unpack_http_url(link, location, download_cache, download_dir=None):
                     'Cached file %s has bad hash, '
                     're-downloading.' % temp_location
                     )
+                os.unlink(temp_location)
                 temp_location = None
-                os.unlink(cache_file)
-                os.unlink(cache_content_type_file)
-                already_cached = False
+                store.remove(digest)
+                cached = None
 
     # We don't have either a cached or a downloaded copy
     if not temp_location:
-        resp = _get_response_from_url(target_url, link)
+        # What an earlier, interrupted run downloaded already
+        partial = None
+        if store is not None:
+            partial = store.partial(target_url)
+        timing.begin(target_url, 'download')
+        if partial is not None:
+            partial_location, validator, offset = partial
+            resp = _get_response_from_url(target_url, link, {
+                'Range': 'bytes=%s-' % offset, 'If-Range': validator})
+        else:
+            resp = _get_response_from_url(target_url, link)
         content_type = resp.info().get('content-type', '')
         filename = link.filename  # fallback
         # Have a look at the Content-Disposition header for a better guess
@@ -619,31 +974,91 @@ def unpack_http_url(link, location, download_cache, download_dir=None):
             if ext:
                 filename += ext
         temp_location = os.path.join(temp_dir, filename)
-        download_hash = _download_url(resp, link, temp_location)
-        if link.hash and link.hash_name:
-            _check_hash(download_hash, link)
+        # With a download cache, the download goes straight into it, where
+        #   it is moved into place once complete and kept to be resumed if
+        #   it's interrupted
+        download_location = temp_location
+        offset = 0
+        resumable = False
+        if partial is not None and _resumes(resp, offset=partial[2]):
+            download_location, validator, offset = partial
+            resumable = True
+            logger.notify('Resuming the download of %s after %s'
+                          % (link.show_url, format_size(offset)))
+        elif store is not None:
+            validator = _resume_validator(resp)
+            if validator:
+                download_location = store.start_partial(target_url, validator)
+                resumable = True
+            else:
+                if partial is not None:
+                    store.discard_partial(target_url)
+                download_location = store.temp_path()
+        # Tar archives are unpacked while they download (but not what a
+        #   resumed download got earlier)
+        stream = None
+        if not offset:
+            stream = start_untar(temp_location, location)
+        try:
+            download_hash = _download_url(resp, link, download_location,
+                                          offset, stream=stream)
+            if link.hash and link.hash_name:
+                _check_hash(download_hash, link)
+        except:
+            if stream is not None:
+                stream.discard()
+            if store is not None:
+                if not resumable:
+                    if os.path.exists(download_location):
+                        os.remove(download_location)
+                elif isinstance(sys.exc_info()[1], HashMismatch):
+                    # Resuming it would only give the same bad file
+                    store.discard_partial(target_url)
+            raise
+        unpacked = stream is not None and stream.finish()
+        if store is not None:
+            # Linked before it's stored, which may evict it again
+            link_or_copy(download_location, temp_location)
+            logger.notify('Storing download in cache at %s'
+                          % display_path(download_cache))
+            store.store(target_url, download_location, content_type,
+                        name=link.filename, hash_name=link.hash_name,
+                        move=True)
+            if resumable:
+                store.discard_partial(target_url)
+            stored = True
 
     if download_dir and not already_downloaded:
         _copy_file(temp_location, download_dir, content_type, link)
-    unpack_file(temp_location, location, content_type, link)
-    if cache_file and not already_cached:
-        cache_download(cache_file, temp_location, content_type)
-    if not (already_cached or already_downloaded):
+    if not unpacked:
+        unpack_file(temp_location, location, content_type, link)
+    if store is not None and cached is None and not stored:
+        logger.notify('Storing download in cache at %s'
+                      % display_path(download_cache))
+        store.store(target_url, temp_location, content_type,
+                    name=link.filename, hash_name=link.hash_name)
+    if not already_downloaded:
         os.unlink(temp_location)
     os.rmdir(temp_dir)
 
 
-def _get_response_from_url(target_url, link):
+def _get_response_from_url(target_url, link, headers=None):
     try:
-        resp = urlopen(target_url)
+        if headers:
+            headers['Accept-encoding'] = 'identity'
+            resp = urlopen(urllib2.Request(target_url, headers=headers))
+        else:
+            resp = urlopen(target_url)
     except urllib2.HTTPError:
         e = sys.exc_info()[1]
         logger.fatal("HTTP error %s while getting %s" % (e.code, link))
+        timing.end(timing.current(), status=e.code, cache='miss', error=e)
         raise
     except IOError:
         e = sys.exc_info()[1]
         # Typically an FTP error
         logger.fatal("Error %s while getting %s" % (e, link))
+        timing.end(timing.current(), cache='miss', error=e)
         raise
     return resp
 
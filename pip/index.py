@@ -4,6 +4,7 @@ import sys
 import os
 import re
 import gzip
+import json
 import mimetypes
 import posixpath
 import pkg_resources
@@ -11,24 +12,24 @@ import random
 import socket
 import ssl
 import string
+import time
 import zlib
 
-try:
-    import threading
-except ImportError:
-    import dummy_threading as threading
-
+from pip import timing
 from pip.log import logger
-from pip.util import Inf, normalize_name, splitext, is_prerelease
+from pip.util import (Inf, normalize_name, splitext, is_prerelease,
+                      parse_version, VersionSpecifier)
 from pip.exceptions import DistributionNotFound, BestVersionAlreadyInstalled,\
     InstallationError
 from pip.backwardcompat import (WindowsError, BytesIO,
-                                Queue, urlparse,
+                                urlparse, urllib2,
                                 URLError, HTTPError, u,
-                                product, url2pathname,
-                                Empty as QueueEmpty)
-from pip.backwardcompat import CertificateError
+                                product, url2pathname)
+from pip.backwardcompat import CertificateError, HTMLParser, HTMLParseError
 from pip.download import urlopen, path_to_url2, url_to_path, geturl, Urllib2HeadRequest
+from pip.cache import DiskCache, FailureStore, PageStore, ResolutionStore
+from pip.localindex import LocalIndex, local_index_name
+from pip.scheduler import FetchScheduler, HedgedJob, LatencyStats
 from pip.wheel import Wheel, wheel_ext, wheel_setuptools_support, setuptools_requirement
 from pip.pep425tags import supported_tags, supported_tags_noarch, get_platform
 from pip.vendor import html5lib
@@ -42,6 +43,10 @@ INSECURE_SCHEMES = {
     "http": ["https"],
 }
 
+# Index URLs with this prefix serve the PyPI JSON API (<index>/<project>/json)
+#   instead of simple index pages
+JSON_INDEX_PREFIX = "json+"
+
 
 class PackageFinder(object):
     """This finds packages.
@@ -53,11 +58,57 @@ class PackageFinder(object):
     def __init__(self, find_links, index_urls,
             use_wheel=False, allow_external=[], allow_insecure=[],
             allow_all_external=False, allow_all_insecure=False,
-            allow_all_prereleases=False):
+            allow_all_prereleases=False, cache_dir=None, page_cache=True,
+            page_cache_max_age=0, page_cache_max_size=None, failure_ttl=3600,
+            head_probes=True, local_indexes=[], max_fetches=16,
+            max_host_fetches=6, prefer_local=False, hedge=False,
+            resolution_ttl=0, ordered_indexes=False):
         self.find_links = find_links
         self.index_urls = index_urls
         self.dependency_links = []
-        self.cache = PageCache()
+
+        # Where data reused between runs is kept; nothing is persisted if None
+        self.cache_dir = cache_dir
+        page_store = None
+        if cache_dir and page_cache:
+            page_store = PageStore(os.path.join(cache_dir, 'pages'),
+                                   max_age=page_cache_max_age,
+                                   max_size=page_cache_max_size)
+        failure_store = None
+        if cache_dir and failure_ttl:
+            failure_store = FailureStore(os.path.join(cache_dir, 'failures'),
+                                         ttl=failure_ttl)
+        archive_store = None
+        if cache_dir:
+            archive_store = DiskCache(os.path.join(cache_dir, 'archives'))
+        # Failures of the locations the user gave are not remembered between
+        #   runs: one offline run must not make the next skip the index
+        self.cache = PageCache(store=page_store, failures=failure_store,
+                               archives=archive_store,
+                               unstored_failures=[
+                                   url.replace(JSON_INDEX_PREFIX, '', 1)
+                                   for url in index_urls + find_links])
+        # The versions found for requirements, reused by later runs for
+        #   resolution_ttl seconds
+        self.resolutions = None
+        if cache_dir and resolution_ttl:
+            self.resolutions = ResolutionStore(
+                os.path.join(cache_dir, 'resolutions'), ttl=resolution_ttl)
+        # Whether links that look like archives are checked with a HEAD
+        #   request before they're fetched as pages; if not, the GET is
+        #   aborted as soon as its headers show it isn't HTML
+        self.head_probes = head_probes
+
+        # Indexes built by 'pip index build', searched before any page
+        self.local_indexes = []
+        for path in local_indexes:
+            if os.path.isdir(path):
+                path = os.path.join(path, local_index_name)
+            try:
+                self.local_indexes.append(LocalIndex(path))
+            except (IOError, OSError, ValueError):
+                e = sys.exc_info()[1]
+                logger.warn('Could not open local index %s: %s' % (path, e))
         # These are boring links that have already been logged somehow:
         self.logged_links = set()
 
@@ -86,6 +137,45 @@ class PackageFinder(object):
         # Do we want to allow _all_ pre-releases?
         self.allow_all_prereleases = allow_all_prereleases
 
+        # Looked up once rather than for every link
+        self.platform = get_platform()
+
+        # Do we skip the indexes for requirements whose best version is
+        #   available locally already?
+        self.prefer_local = prefer_local
+
+        # Fetches the pages of all the requirements looked up
+        self.scheduler = FetchScheduler(max_workers=max_fetches,
+                                        max_per_host=max_host_fetches)
+
+        # Are the index URLs mirrors of each other, so that a project page
+        #   that is slow to come from one is asked from the next as well?
+        self.hedge = hedge
+        # How long fetching pages takes, by host; decides when to hedge
+        self.latency = LatencyStats()
+
+        # Are the index URLs searched one after the other, stopping at the
+        #   first that has versions of a project the requirement allows?
+        #   They shadow each other then, so they are never hedged.
+        self.ordered_indexes = ordered_indexes
+
+        # The real names of the projects of indexes, by index URL, and the
+        #   names the main index corrected requirement names to; both are
+        #   kept between runs in the 'names' cache
+        self._names_store = None
+        if cache_dir:
+            self._names_store = DiskCache(os.path.join(cache_dir, 'names'))
+        self._name_maps = {}
+        self._redirects = None
+
+        # The find-links directories scanned so far, by path, and where their
+        #   listings are kept between runs
+        self._find_links_directories = {}
+        self._find_links_store = None
+        if cache_dir:
+            self._find_links_store = DiskCache(
+                os.path.join(cache_dir, 'find-links'))
+
     @property
     def use_wheel(self):
         return self._use_wheel
@@ -103,10 +193,13 @@ class PackageFinder(object):
         ## FIXME: also, we should track comes_from (i.e., use Link)
         self.dependency_links.extend(links)
 
-    def _sort_locations(self, locations):
+    def _sort_locations(self, locations, project=None):
         """
         Sort locations into "files" (archives) and "urls", and return
         a pair of lists (files,urls)
+
+        If ``project`` is given, only the files of find-links directories
+        that can belong to that project are returned.
         """
         files = []
         urls = []
@@ -132,8 +225,13 @@ class PackageFinder(object):
                     path = url_to_path(url)
                 if is_find_link and os.path.isdir(path):
                     path = os.path.realpath(path)
-                    for item in os.listdir(path):
-                        sort_path(os.path.join(path, item))
+                    if project is None:
+                        for item in os.listdir(path):
+                            sort_path(os.path.join(path, item))
+                    else:
+                        directory = self._find_links_directory(path)
+                        urls.extend(directory.html_urls())
+                        files.extend(directory.file_urls(project))
                 elif is_file_url and os.path.isdir(path):
                     urls.append(url)
                 elif os.path.isfile(path):
@@ -143,6 +241,14 @@ class PackageFinder(object):
 
         return files, urls
 
+    def _find_links_directory(self, path):
+        """The FindLinksDirectory of ``path``, scanned once per finder"""
+        directory = self._find_links_directories.get(path)
+        if directory is None:
+            directory = FindLinksDirectory(path, self._find_links_store)
+            self._find_links_directories[path] = directory
+        return directory
+
     def _link_sort_key(self, link_tuple):
         """
         Function used to generate link sort key for link tuples.
@@ -178,43 +284,158 @@ class PackageFinder(object):
         """
         return sorted(applicable_versions, key=self._link_sort_key, reverse=True)
 
-    def find_requirement(self, req, upgrade):
+    def _project_url(self, index_url, url_name):
+        if index_url.startswith(JSON_INDEX_PREFIX):
+            return posixpath.join(index_url, url_name, 'json')
+        loc = posixpath.join(index_url, url_name)
+        # For maximum compatibility with easy_install, ensure the path
+        # ends in a trailing slash.  Although this isn't in the spec
+        # (and PyPI can handle it without the slash) some other index
+        # implementations might break if they relied on easy_install's behavior.
+        if not loc.endswith('/'):
+            loc = loc + '/'
+        return loc
+
+    def _requirement_locations(self, req, url_name):
+        """The index pages and find-links locations to search for req"""
+        locations = []
+        for index_locations in self._index_locations(req, url_name):
+            locations.extend(index_locations)
+        return locations + self.find_links
+
+    def _index_locations(self, req, url_name):
+        """The pages to search for req on each index URL, as a list of
+        lists in the order of the index URLs"""
+        if url_name is None:
+            return []
+        result = [[self._project_url(url, url_name)]
+                  for url in self.index_urls]
+        # The JSON of a project lists all its releases already
+        if result and not self.index_urls[0].startswith(JSON_INDEX_PREFIX):
+            main_index_url = result[0][0]
+            for version in req.absolute_versions:
+                result[0].insert(0, posixpath.join(main_index_url, version))
+        return result
+
+    def prefetch(self, reqs):
+        """
+        Fetch the index and find-links pages of all the given requirements
+        concurrently, so that looking them up afterwards is answered from
+        the page cache instead of paying the network latency per
+        requirement.
+        """
+        trusted, untrusted = {}, {}
+        hedged = []
+        for req in reqs:
+            if req.url_name is None:
+                continue
+            if self.prefer_local and self._best_version_is_local(req):
+                continue
+            if (self.resolutions is not None and self.resolutions.get(
+                    self._resolution_key(req)) is not None):
+                continue
+            url_name = self._redirected_name(req.url_name)
+            _, url_locations = self._sort_locations(
+                self._requirement_locations(req, url_name), req.name)
+            if self.ordered_indexes:
+                # The next indexes are only asked if the first has nothing
+                later = self._later_index_locations(req, url_name)
+                url_locations = [url for url in url_locations
+                                 if url not in later]
+            mirrors = self._mirror_urls(url_name)
+            if mirrors:
+                hedged.append(self._submit_mirrored(
+                    [Link(url, trusted=True) for url in mirrors], req))
+            for url in url_locations:
+                if url not in mirrors:
+                    trusted.setdefault(url, req)
+        _, url_locations = self._sort_locations(self.dependency_links)
+        for url in url_locations:
+            untrusted.setdefault(url, None)
+
+        jobs = [(Link(url, trusted=True), req) for url, req in trusted.items()]
+        jobs.extend([(Link(url), req) for url, req in untrusted.items()
+                     if url not in trusted])
+        if not jobs and not hedged:
+            return
+        logger.debug('Prefetching %s pages', len(jobs) + len(hedged))
+        jobs = [self._submit_page(link, req) for link, req in jobs] + hedged
+        for job in jobs:
+            job.wait()
+
+    def find_requirements(self, reqs, upgrade):
+        """
+        Look up several requirements at once.  Their pages are prefetched
+        concurrently, then every requirement is looked up like
+        find_requirement() does.
 
-        def mkurl_pypi_url(url):
-            loc = posixpath.join(url, url_name)
-            # For maximum compatibility with easy_install, ensure the path
-            # ends in a trailing slash.  Although this isn't in the spec
-            # (and PyPI can handle it without the slash) some other index
-            # implementations might break if they relied on easy_install's behavior.
-            if not loc.endswith('/'):
-                loc = loc + '/'
-            return loc
-
-        url_name = req.url_name
+        Returns a list with an item per requirement: the Link or None
+        find_requirement() returned for it, or the DistributionNotFound or
+        BestVersionAlreadyInstalled exception it raised.
+        """
+        self.prefetch(reqs)
+        results = []
+        for req in reqs:
+            try:
+                results.append(self.find_requirement(req, upgrade))
+            except (DistributionNotFound, BestVersionAlreadyInstalled):
+                results.append(sys.exc_info()[1])
+        return results
+
+    def _find_all_versions(self, req, local_only=None):
+        """All the versions of req that the find-links locations, local
+        indexes, index pages and dependency links have, in order of
+        priority, as (parsed version, link, version) tuples.  With
+        ``local_only``, no remote page is searched; by default that's the
+        case if --prefer-local finds the best version req allows locally."""
+        url_name = self._redirected_name(req.url_name)
+        # No remote page is searched if the best version is available locally
+        if local_only is None:
+            local_only = self.prefer_local and self._best_version_is_local(req)
         # Only check main index if index URL is given:
-        main_index_url = None
-        if self.index_urls:
+        if self.index_urls and not local_only:
             # Check that we have the url_name correctly spelled:
-            main_index_url = Link(mkurl_pypi_url(self.index_urls[0]), trusted=True)
+            main_index_url = Link(self._project_url(self.index_urls[0], url_name), trusted=True)
             # This will also cache the page, so it's okay that we get it again later:
-            page = self._get_page(main_index_url, req)
+            mirrors = self._mirror_urls(url_name)
+            if mirrors:
+                page = self._submit_mirrored(
+                    [Link(url, trusted=True) for url in mirrors], req).wait()
+            else:
+                page = self._get_page(main_index_url, req)
             if page is None:
                 url_name = self._find_url_name(Link(self.index_urls[0], trusted=True), url_name, req) or req.url_name
-
-        if url_name is not None:
-            locations = [
-                mkurl_pypi_url(url)
-                for url in self.index_urls] + self.find_links
-        else:
-            locations = list(self.find_links)
-        for version in req.absolute_versions:
-            if url_name is not None and main_index_url is not None:
-                locations = [
-                    posixpath.join(main_index_url.url, version)] + locations
-
-        file_locations, url_locations = self._sort_locations(locations)
+                self._add_redirect(req.url_name, url_name)
+            elif not self.index_urls[0].startswith(JSON_INDEX_PREFIX):
+                # The index may have redirected to the real name
+                real_name = posixpath.basename(page.url.rstrip('/'))
+                if (real_name != url_name and
+                        normalize_name(real_name) == normalize_name(url_name)):
+                    self._add_redirect(req.url_name, real_name)
+
+        locations = self._requirement_locations(req, url_name)
+        file_locations, url_locations = self._sort_locations(locations, req.name)
         _flocations, _ulocations = self._sort_locations(self.dependency_links)
         file_locations.extend(_flocations)
+        if local_only:
+            url_locations = [url for url in url_locations
+                             if url.startswith('file:')]
+            _ulocations = [url for url in _ulocations
+                           if url.startswith('file:')]
+        # The project pages of mirrored indexes are fetched by one hedged job
+        mirrors = []
+        if not local_only:
+            mirrors = self._mirror_urls(url_name)
+            url_locations = [url for url in url_locations if url not in mirrors]
+        # ... and those of ordered indexes one index at a time
+        index_locations = []
+        if self.ordered_indexes and not local_only:
+            for urls in self._index_locations(req, url_name):
+                _, urls = self._sort_locations(urls)
+                index_locations.append([Link(url, trusted=True)
+                                        for url in urls])
+                url_locations = [url for url in url_locations
+                                 if url not in urls]
 
         # We trust every url that the user has given us whether it was given
         #   via --index-url or --find-links
@@ -223,12 +444,15 @@ class PackageFinder(object):
         # We explicitly do not trust links that came from dependency_links
         locations.extend([Link(url) for url in _ulocations])
 
-        logger.debug('URLs to search for versions for %s:' % req)
-        for location in locations:
-            logger.debug('* %s' % location)
+        logger.debug('URLs to search for versions for %s:', req)
+        searched = []
+        for links in index_locations:
+            searched.extend(links)
+        for location in searched + locations:
+            logger.debug('* %s', location)
 
             # Determine if this url used a secure transport mechanism
-            parsed = urlparse.urlparse(str(location))
+            parsed = urlparse.urlparse(str(location).replace(JSON_INDEX_PREFIX, '', 1))
             if parsed.scheme in INSECURE_SCHEMES:
                 secure_schemes = INSECURE_SCHEMES[parsed.scheme]
 
@@ -254,18 +478,26 @@ class PackageFinder(object):
             self._package_versions(
                 # We trust every directly linked archive in find_links
                 [Link(url, '-f', trusted=True) for url in self.find_links], req.name.lower()))
+        # ... and in the local indexes
+        found_versions.extend(
+            self._package_versions(
+                self._local_index_links(req.name), req.name.lower()))
         page_versions = []
-        for page in self._get_pages(locations, req):
-            logger.debug('Analyzing links from page %s' % page.url)
-            logger.indent += 2
-            try:
-                page_versions.extend(self._package_versions(page.links, req.name.lower()))
-            finally:
-                logger.indent -= 2
+        for i, links in enumerate(index_locations):
+            versions = self._page_versions(self._get_pages(links, req), req)
+            page_versions.extend(versions)
+            if self._has_applicable_version(req, versions):
+                if i + 1 < len(index_locations):
+                    logger.info('Found %s on %s, not searching the next '
+                                'indexes', req.name, self.index_urls[i])
+                break
+        mirrors = [Link(url, trusted=True) for url in mirrors]
+        page_versions.extend(self._page_versions(
+            self._get_pages(locations, req, mirrors), req))
         dependency_versions = list(self._package_versions(
             [Link(url) for url in self.dependency_links], req.name.lower()))
         if dependency_versions:
-            logger.info('dependency_links found: %s' % ', '.join([link.url for parsed, link, version in dependency_versions]))
+            logger.info('dependency_links found: %s', ', '.join([link.url for parsed, link, version in dependency_versions]))
         file_versions = list(self._package_versions(
                 [Link(url) for url in file_locations], req.name.lower()))
         if not found_versions and not page_versions and not dependency_versions and not file_versions:
@@ -280,25 +512,64 @@ class PackageFinder(object):
                             " (use --allow-insecure %s to allow)." % req.name)
 
             raise DistributionNotFound('No distributions at all found for %s' % req)
+        if file_versions:
+            file_versions.sort(reverse=True)
+            logger.info('Local files found: %s', ', '.join([url_to_path(link.url) for parsed, link, version in file_versions]))
+        #this is an intentional priority ordering
+        return file_versions + found_versions + page_versions + dependency_versions
+
+    def _page_versions(self, pages, req):
+        versions = []
+        for page in pages:
+            logger.debug('Analyzing links from page %s', page.url)
+            logger.indent += 2
+            try:
+                versions.extend(self._package_versions(page.links, req.name.lower()))
+            finally:
+                logger.indent -= 2
+        return versions
+
+    def _has_applicable_version(self, req, versions):
+        """Whether any of versions is one find_requirement() may pick"""
+        specifier = VersionSpecifier(req.req)
+        for parsed_version, link, version in versions:
+            if version not in specifier:
+                continue
+            if is_prerelease(version) and not (self.allow_all_prereleases or req.prereleases):
+                continue
+            return True
+        return False
+
+    def find_requirement(self, req, upgrade):
+        found_versions = None
+        if self.resolutions is not None:
+            key = self._resolution_key(req)
+            found_versions = self._stored_versions(key)
+        if found_versions is None:
+            local_only = self.prefer_local and self._best_version_is_local(req)
+            found_versions = self._find_all_versions(req, local_only)
+            # What the local listings had for one specifier doesn't answer
+            #   any other; it's cheap to look up again anyway
+            if self.resolutions is not None and not local_only:
+                self._store_versions(key, found_versions)
         installed_version = []
         if req.satisfied_by is not None:
             installed_version = [(req.satisfied_by.parsed_version, InfLink, req.satisfied_by.version)]
-        if file_versions:
-            file_versions.sort(reverse=True)
-            logger.info('Local files found: %s' % ', '.join([url_to_path(link.url) for parsed, link, version in file_versions]))
         #this is an intentional priority ordering
-        all_versions = installed_version + file_versions + found_versions + page_versions + dependency_versions
+        all_versions = installed_version + found_versions
         applicable_versions = []
+        specifier = VersionSpecifier(req.req)
+        specs = ','.join([''.join(s) for s in req.req.specs])
         for (parsed_version, link, version) in all_versions:
-            if version not in req.req:
-                logger.info("Ignoring link %s, version %s doesn't match %s"
-                            % (link, version, ','.join([''.join(s) for s in req.req.specs])))
+            if version not in specifier:
+                logger.info("Ignoring link %s, version %s doesn't match %s",
+                            link, version, specs)
                 continue
             elif is_prerelease(version) and not (self.allow_all_prereleases or req.prereleases):
                 # If this version isn't the already installed one, then
                 #   ignore it if it's a pre-release.
                 if link is not InfLink:
-                    logger.info("Ignoring link %s, version %s is a pre-release (use --pre to allow)." % (link, version))
+                    logger.info("Ignoring link %s, version %s is a pre-release (use --pre to allow).", link, version)
                     continue
             applicable_versions.append((parsed_version, link, version))
         applicable_versions = self._sort_versions(applicable_versions)
@@ -348,79 +619,259 @@ class PackageFinder(object):
         return selected_version
 
 
+    def _resolution_key(self, req):
+        """What the versions found for req depend on, as a string"""
+        def mtime(path):
+            if os.path.exists(path):
+                return os.stat(path).st_mtime
+            return None
+        find_links = []
+        for url in self.find_links:
+            path = url
+            if url.startswith('file:'):
+                path = url_to_path(url)
+            find_links.append([url, mtime(path)])
+        tags = None
+        if self.use_wheel:
+            tags = ['-'.join(tag) for tag in supported_tags]
+        key = [
+            normalize_name(req.name), self.index_urls, find_links,
+            sorted(self.dependency_links),
+            [[index.path, mtime(index.path)] for index in self.local_indexes],
+            tags, sorted(self.allow_external), self.allow_all_external,
+            sorted(self.allow_insecure), self.allow_all_insecure,
+            # Mirrors answer for each other when hedging
+            self.hedge]
+        if self.ordered_indexes:
+            # Which indexes were searched depends on what req allows
+            key.append(['ordered', sorted(req.req.specs),
+                        bool(self.allow_all_prereleases or req.prereleases)])
+        return json.dumps(key)
+
+    def _stored_versions(self, key):
+        """The versions stored under key by an earlier run, or None"""
+        stored = self.resolutions.get(key)
+        if stored is None:
+            return None
+        logger.info('Using the versions found by an earlier run')
+        return [(parse_version(version),
+                 Link(url, internal=internal, trusted=trusted), version)
+                for version, url, internal, trusted in stored]
+
+    def _store_versions(self, key, versions):
+        self.resolutions.store(key, [
+            [version, link.url, link.internal, link.trusted]
+            for parsed_version, link, version in versions])
+
+    def _best_version_is_local(self, req):
+        """
+        Whether the find-links locations, the local indexes or the installed
+        version have the highest version req allows (see
+        VersionSpecifier.upper_bound), so that no index can offer a better
+        one.  Only local listings are looked at, no page is fetched.
+        """
+        bound = VersionSpecifier(req.req).upper_bound()
+        if bound is None:
+            return False
+        if (is_prerelease(bound)
+                and not (self.allow_all_prereleases or req.prereleases)):
+            return False
+        bound = parse_version(bound)
+        if (req.satisfied_by is not None
+                and req.satisfied_by.parsed_version == bound):
+            logger.info('Installed version of %s is the best one, not '
+                        'searching the indexes' % req.name)
+            return True
+        file_locations, _ = self._sort_locations(self.find_links, req.name)
+        links = [Link(url) for url in file_locations]
+        links.extend([Link(url, '-f', trusted=True) for url in self.find_links])
+        links.extend(self._local_index_links(req.name))
+        for parsed_version, link, version in self._package_versions(
+                links, req.name.lower()):
+            if parsed_version == bound:
+                logger.info('Found %s locally, not searching the indexes'
+                            % link)
+                return True
+        return False
+
+    def _local_index_links(self, name):
+        links = []
+        for index in self.local_indexes:
+            for record in index.lookup(name):
+                links.append(Link(index.url(record), trusted=True))
+        return links
+
     def _find_url_name(self, index_url, url_name, req):
         """Finds the true URL name of a package, when the given name isn't quite correct.
         This is usually used to implement case-insensitivity."""
+        if index_url.url.startswith(JSON_INDEX_PREFIX):
+            # There's no page listing all projects to look the name up in
+            return None
         if not index_url.url.endswith('/'):
             # Vaguely part of the PyPI API... weird but true.
             ## FIXME: bad to modify this?
             index_url.url += '/'
+        names = self._index_names(index_url, req)
+        if names is None:
+            logger.fatal('Cannot fetch index base URL %s' % index_url)
+            return
+        base = names.get(normalize_name(req.url_name))
+        if base is not None:
+            logger.notify('Real name of requirement %s is %s' % (url_name, base))
+        return base
+
+    def _index_names(self, index_url, req):
+        """
+        A dict mapping the normalized names of the projects of an index to
+        their real names, or None if its root page can't be fetched.
+
+        The map is built from the root page once and stored with the ETag or
+        Last-Modified of the page, so later runs, which revalidate the page
+        with a conditional GET, don't parse it again while it's unchanged.
+        """
+        names = self._name_maps.get(index_url.url)
+        if names is not None:
+            return names
         page = self._get_page(index_url, req)
         if page is None:
-            logger.fatal('Cannot fetch index base URL %s' % index_url)
+            return None
+        validator = None
+        if page.headers:
+            validator = (page.headers.get('ETag')
+                         or page.headers.get('Last-Modified'))
+        record = None
+        if self._names_store is not None and validator:
+            record = self._names_store.get(index_url.url)
+        if record is not None and record['validator'] == validator:
+            names = record['names']
+        else:
+            names = {}
+            for link in page.links:
+                base = posixpath.basename(link.path.rstrip('/'))
+                names.setdefault(normalize_name(base), base)
+            if self._names_store is not None and validator:
+                self._names_store.set(index_url.url,
+                                      {'validator': validator, 'names': names})
+        self._name_maps[index_url.url] = names
+        return names
+
+    def _load_redirects(self):
+        if self._redirects is None:
+            self._redirects = {}
+            if self._names_store is not None and self.index_urls:
+                self._redirects = self._names_store.get(
+                    'redirects ' + self.index_urls[0]) or {}
+        return self._redirects
+
+    def _redirected_name(self, url_name):
+        """The name the main index corrected url_name to before, or
+        url_name"""
+        if url_name is None or not self.index_urls:
+            return url_name
+        return self._load_redirects().get(normalize_name(url_name), url_name)
+
+    def _add_redirect(self, url_name, real_name):
+        """Remember that the main index knows url_name as real_name"""
+        if url_name is None:
             return
-        norm_name = normalize_name(req.url_name)
-        for link in page.links:
-            base = posixpath.basename(link.path.rstrip('/'))
-            if norm_name == normalize_name(base):
-                logger.notify('Real name of requirement %s is %s' % (url_name, base))
-                return base
-        return None
-
-    def _get_pages(self, locations, req):
-        """Yields (page, page_url) from the given locations, skipping
-        locations that have errors, and adding download/homepage links"""
-        pending_queue = Queue()
-        for location in locations:
-            pending_queue.put(location)
-        done = []
+        redirects = self._load_redirects()
+        key = normalize_name(url_name)
+        if real_name == url_name:
+            if key not in redirects:
+                return
+            del redirects[key]
+        elif redirects.get(key) == real_name:
+            return
+        else:
+            redirects[key] = real_name
+        if self._names_store is not None:
+            self._names_store.set('redirects ' + self.index_urls[0], redirects)
+
+    def _get_pages(self, locations, req, mirrors=()):
+        """Returns the pages of the given locations, skipping locations
+        that have errors, and adding download/homepage links.  They are
+        fetched by the shared scheduler of the finder.
+
+        ``mirrors`` are alternative locations of the same page, of which
+        only the first to answer is used."""
+        pending = []
         seen = set()
-        threads = []
-        for i in range(min(10, len(locations))):
-            t = threading.Thread(target=self._get_queued_page, args=(req, pending_queue, done, seen))
-            t.setDaemon(True)
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
-        return done
+        if mirrors:
+            seen.update(mirrors)
+            pending.append(self._submit_mirrored(mirrors, req))
 
-    _log_lock = threading.Lock()
+        def submit(location):
+            if location not in seen:
+                seen.add(location)
+                pending.append(self._submit_page(location, req))
 
-    def _get_queued_page(self, req, pending_queue, done, seen):
-        while 1:
-            try:
-                location = pending_queue.get(False)
-            except QueueEmpty:
-                return
-            if location in seen:
-                continue
-            seen.add(location)
-            page = self._get_page(location, req)
+        for location in locations:
+            submit(location)
+        done = []
+        while pending:
+            page = pending.pop(0).wait()
             if page is None:
                 continue
             done.append(page)
-            for link in page.rel_links():
-                normalized = normalize_name(req.name).lower()
-
-                if (not normalized in self.allow_external
-                        and not self.allow_all_external):
-                    self.need_warn_external = True
-                    logger.debug("Not searching %s for files because external "
-                                 "urls are disallowed." % link)
-                    continue
+            for link in self._searchable_rel_links(page, req):
+                submit(link)
+        return done
 
-                if (link.trusted is not None
-                        and not link.trusted
-                        and not normalized in self.allow_insecure
-                        and not self.allow_all_insecure):
-                    logger.debug("Not searching %s for urls, it is an "
-                                "untrusted link and cannot produce safe or "
-                                "verifiable files." % link)
-                    self.need_warn_insecure = True
-                    continue
+    def _submit_page(self, link, req):
+        """Schedule fetching the page of link; returns a FetchJob"""
+        return self.scheduler.submit(
+            link.url.replace(JSON_INDEX_PREFIX, '', 1), self._get_page, link, req)
+
+    def _later_index_locations(self, req, url_name):
+        """The pages of req on the index URLs after the first"""
+        later = set()
+        for urls in self._index_locations(req, url_name)[1:]:
+            later.update(urls)
+        return later
+
+    def _mirror_urls(self, url_name):
+        """The project pages of url_name on all the index URLs, if they
+        are hedged as mirrors of each other"""
+        if (not self.hedge or self.ordered_indexes
+                or len(self.index_urls) < 2 or url_name is None):
+            return []
+        return [self._project_url(url, url_name) for url in self.index_urls]
+
+    def _submit_mirrored(self, links, req):
+        """Schedule fetching the page that all of links serve, hedging
+        between them; returns a HedgedJob"""
+        # Pages that are at hand already don't need to be asked again
+        links = sorted(links, key=lambda link: self.cache.get_page(
+            link.url.replace(JSON_INDEX_PREFIX, '', 1)) is None)
+        return HedgedJob(
+            self.scheduler,
+            [(link.url.replace(JSON_INDEX_PREFIX, '', 1), self._get_page,
+              (link, req)) for link in links],
+            self.latency.threshold)
+
+    def _searchable_rel_links(self, page, req):
+        """The homepage/download links of page that may be searched"""
+        for link in page.rel_links():
+            normalized = normalize_name(req.name).lower()
+
+            if (not normalized in self.allow_external
+                    and not self.allow_all_external):
+                self.need_warn_external = True
+                logger.debug("Not searching %s for files because external "
+                             "urls are disallowed.", link)
+                continue
+
+            if (link.trusted is not None
+                    and not link.trusted
+                    and not normalized in self.allow_insecure
+                    and not self.allow_all_insecure):
+                logger.debug("Not searching %s for urls, it is an "
+                            "untrusted link and cannot produce safe or "
+                            "verifiable files.", link)
+                self.need_warn_insecure = True
+                continue
 
-                pending_queue.put(link)
+            yield link
 
     _egg_fragment_re = re.compile(r'#egg=([^&]*)')
     _egg_info_re = re.compile(r'([a-z0-9_.]+)-([a-z0-9_.-]+)', re.I)
@@ -458,8 +909,6 @@ class PackageFinder(object):
 
         Meant to be overridden by subclasses, not called by clients.
         """
-        platform = get_platform()
-
         version = None
         if link.egg_fragment:
             egg_info = link.egg_fragment
@@ -467,7 +916,7 @@ class PackageFinder(object):
             egg_info, ext = link.splitext()
             if not ext:
                 if link not in self.logged_links:
-                    logger.debug('Skipping link %s; not a file' % link)
+                    logger.debug('Skipping link %s; not a file', link)
                     self.logged_links.add(link)
                 return []
             if egg_info.endswith('.tar'):
@@ -476,18 +925,18 @@ class PackageFinder(object):
                 ext = '.tar' + ext
             if ext not in self._known_extensions():
                 if link not in self.logged_links:
-                    logger.debug('Skipping link %s; unknown archive format: %s' % (link, ext))
+                    logger.debug('Skipping link %s; unknown archive format: %s', link, ext)
                     self.logged_links.add(link)
                 return []
             if "macosx10" in link.path and ext == '.zip':
                 if link not in self.logged_links:
-                    logger.debug('Skipping link %s; macosx10 one' % (link))
+                    logger.debug('Skipping link %s; macosx10 one', link)
                     self.logged_links.add(link)
                 return []
             if link.wheel and link.wheel.name.lower() == search_name.lower():
                 version = link.wheel.version
                 if not link.wheel.supported():
-                    logger.debug('Skipping %s because it is not compatible with this Python' % link)
+                    logger.debug('Skipping %s because it is not compatible with this Python', link)
                     return []
 
                 # This is a dirty hack to prevent installing Binary Wheels from
@@ -497,21 +946,21 @@ class PackageFinder(object):
                 #   on linux that deals with the inherent problems of binary
                 #   distribution this can be removed.
                 comes_from = getattr(link, "comes_from", None)
-                if (not platform.startswith('win')
+                if (not self.platform.startswith('win')
                     and comes_from is not None
                     and urlparse.urlparse(comes_from.url).netloc.endswith(
                                                         "pypi.python.org")):
                     if not link.wheel.supported(tags=supported_tags_noarch):
                         logger.debug(
                             "Skipping %s because it is a pypi-hosted binary "
-                            "Wheel on an unsupported platform" % link
+                            "Wheel on an unsupported platform", link
                         )
                         return []
 
         if not version:
             version = self._egg_info_matches(egg_info, search_name, link)
         if version is None:
-            logger.debug('Skipping link %s; wrong project name (not %s)' % (link, search_name))
+            logger.debug('Skipping link %s; wrong project name (not %s)', link, search_name)
             return []
 
         if (link.internal is not None
@@ -520,7 +969,7 @@ class PackageFinder(object):
                 and not self.allow_all_external):
             # We have a link that we are sure is external, so we should skip
             #   it unless we are allowing externals
-            logger.debug("Skipping %s because it is externally hosted." % link)
+            logger.debug("Skipping %s because it is externally hosted.", link)
             self.need_warn_external = True
             return []
 
@@ -532,7 +981,7 @@ class PackageFinder(object):
             #   so we should skip it unless we are allowing unsafe installs
             #   for this requirement.
             logger.debug("Skipping %s because it is an insecure and "
-                         "unverifiable file." % link)
+                         "unverifiable file.", link)
             self.need_warn_insecure = True
             return []
 
@@ -541,17 +990,17 @@ class PackageFinder(object):
             version = version[:match.start()]
             py_version = match.group(1)
             if py_version != sys.version[:3]:
-                logger.debug('Skipping %s because Python version is incorrect' % link)
+                logger.debug('Skipping %s because Python version is incorrect', link)
                 return []
-        logger.debug('Found link %s, version: %s' % (link, version))
-        return [(pkg_resources.parse_version(version),
+        logger.debug('Found link %s, version: %s', link, version)
+        return [(parse_version(version),
                link,
                version)]
 
     def _egg_info_matches(self, egg_info, search_name, link):
         match = self._egg_info_re.search(egg_info)
         if not match:
-            logger.debug('Could not parse version from link: %s' % link)
+            logger.debug('Could not parse version from link: %s', link)
             return None
         name = match.group(0).lower()
         # To match the "safe" name that pkg_resources creates:
@@ -564,37 +1013,167 @@ class PackageFinder(object):
             return None
 
     def _get_page(self, link, req):
-        return HTMLPage.get_page(link, req, cache=self.cache)
+        url = link.url.replace(JSON_INDEX_PREFIX, '', 1)
+        # Only fetches that go over the network tell how fast a host is
+        timed = (url.startswith(('http:', 'https:'))
+                 and self.cache.get_page(url.split('#', 1)[0]) is None)
+        start = time.time()
+        if link.url.startswith(JSON_INDEX_PREFIX):
+            page = JSONPage.get_page(
+                Link(url, trusted=link.trusted), req, cache=self.cache)
+        else:
+            page = HTMLPage.get_page(link, req, cache=self.cache,
+                                     head_probes=self.head_probes)
+        if timed:
+            self.latency.record(FetchScheduler.host(url), time.time() - start)
+        return page
+
+
+class FindLinksDirectory(object):
+    """
+    The listing of a --find-links directory, grouped by project.
+
+    Files are grouped by the first dash-separated part of their lowercased
+    name, so finding the files that can belong to a project only looks at
+    that group.  The listing is kept in ``store`` (a DiskCache) with the
+    mtime of the directory, and reused by later runs as long as the
+    directory doesn't change.
+    """
+
+    # Names that PackageFinder._egg_info_re matches from their start
+    _plain_re = re.compile(r'^[a-z0-9_.]+-[a-z0-9_.-]+$', re.I)
+
+    def __init__(self, path, store=None):
+        self.path = path
+        mtime = os.stat(path).st_mtime
+        record = None
+        if store is not None:
+            record = store.get(path)
+        if record is None or record['mtime'] != mtime:
+            record = self._scan()
+            record['mtime'] = mtime
+            if store is not None:
+                store.set(path, record)
+        else:
+            logger.debug('Using the cached listing of %s', path)
+        self._html = record['html']
+        self._groups = record['groups']
+        self._other = record['other']
+
+    @staticmethod
+    def _key(item):
+        """The lowercased name of an item without its extension, with
+        underscores made dashes like PackageFinder._egg_info_matches does"""
+        return splitext(item)[0].lower().replace('_', '-')
+
+    def _scan(self):
+        html, groups, other = [], {}, []
+        for item in os.listdir(self.path):
+            if mimetypes.guess_type(item, strict=False)[0] == 'text/html':
+                html.append(item)
+            elif self._plain_re.match(splitext(item)[0]):
+                groups.setdefault(self._key(item).split('-', 1)[0], []).append(item)
+            else:
+                # Can't tell which project this is; give it to all of them
+                other.append(item)
+        return {'html': html, 'groups': groups, 'other': other}
+
+    def _urls(self, items):
+        return [path_to_url2(os.path.join(self.path, item)) for item in items]
+
+    def html_urls(self):
+        return self._urls(self._html)
+
+    def file_urls(self, project):
+        """The files that can be archives of ``project``"""
+        prefix = project.lower() + '-'
+        group = self._groups.get(prefix.split('-', 1)[0], [])
+        return self._urls([item for item in group
+                           if self._key(item).startswith(prefix)]
+                          + self._other)
 
 
 class PageCache(object):
     """Cache of HTML pages"""
 
     failure_limit = 3
+    # Failures recorded by previous runs skip a URL from this level on; a
+    #   404 or an unreachable host is level 2, a single timeout is level 1
+    stored_failure_limit = 2
 
-    def __init__(self):
+    def __init__(self, store=None, failures=None, archives=None,
+                 unstored_failures=()):
         self._failures = {}
         self._pages = {}
         self._archives = {}
+        # An optional PageStore keeping pages between runs
+        self.store = store
+        # An optional FailureStore remembering failed URLs between runs
+        self.failures = failures
+        # The URLs (and those below them) whose failures aren't remembered
+        #   between runs
+        self.unstored_failures = tuple(unstored_failures)
+        # An optional DiskCache remembering which URLs are archives
+        self.archives = archives
 
     def too_many_failures(self, url):
-        return self._failures.get(url, 0) >= self.failure_limit
+        if self._failures.get(url, 0) >= self.failure_limit:
+            return True
+        if (self.failures is None or url in self._failures
+                or url.startswith(self.unstored_failures)):
+            return False
+        record = self.failures.get(url)
+        if record is None:
+            return False
+        if record['level'] < self.stored_failure_limit:
+            self._failures[url] = 0
+            return False
+        logger.info('Skipping URL %s, it failed %s seconds ago (%s)'
+                    % (url, int(time.time() - record['failed']),
+                       record['reason']))
+        self._failures[url] = self.failure_limit
+        return True
 
     def get_page(self, url):
         return self._pages.get(url)
 
     def is_archive(self, url):
-        return self._archives.get(url, False)
+        """True or False if it is known whether ``url`` is an archive (and
+        not an HTML page), None if it isn't known"""
+        if url not in self._archives and self.archives is not None:
+            self._archives[url] = self.archives.get(url)
+        return self._archives.get(url)
 
     def set_is_archive(self, url, value=True):
+        if self._archives.get(url) == value:
+            return
         self._archives[url] = value
+        if self.archives is not None:
+            self.archives.set(url, value)
 
-    def add_page_failure(self, url, level):
+    def add_page_failure(self, url, level, reason=None, store=True):
+        """Count a failure of url; unless ``store`` is False, later runs
+        skip it too (see too_many_failures())"""
         self._failures[url] = self._failures.get(url, 0)+level
+        if (store and self.failures is not None
+                and not url.startswith(self.unstored_failures)):
+            self.failures.add_failure(url, level, reason)
 
     def add_page(self, urls, page):
         for url in urls:
             self._pages[url] = page
+            if self.failures is not None and url in self._failures:
+                # It works again, forget about earlier failures
+                self.failures.delete(url)
+
+    def get_stored_page(self, url):
+        if self.store is None:
+            return None
+        return self.store.get(url)
+
+    def store_page(self, url, real_url, headers, content):
+        if self.store is not None:
+            self.store.store(url, real_url, headers, content)
 
 
 class HTMLPage(object):
@@ -607,7 +1186,6 @@ class HTMLPage(object):
 
     def __init__(self, content, url, headers=None, trusted=None):
         self.content = content
-        self.parsed = html5lib.parse(self.content, namespaceHTMLElements=False)
         self.url = url
         self.headers = headers
         self.trusted = trusted
@@ -615,8 +1193,18 @@ class HTMLPage(object):
     def __str__(self):
         return self.url
 
+    @property
+    def parsed(self):
+        # Parsed on first use, pages answered from the cache are often never
+        # looked at
+        if not hasattr(self, "_parsed"):
+            self._parsed = html5lib.parse(self.content,
+                                          namespaceHTMLElements=False)
+        return self._parsed
+
     @classmethod
-    def get_page(cls, link, req, cache=None, skip_archives=True):
+    def get_page(cls, link, req, cache=None, skip_archives=True,
+                 head_probes=True):
         url = link.url
         url = url.split('#', 1)[0]
         if cache.too_many_failures(url):
@@ -633,23 +1221,29 @@ class HTMLPage(object):
             inst = cache.get_page(url)
             if inst is not None:
                 return inst
+        timed = None
         try:
+            filename = link.filename
+            looks_like_archive = False
+            for bad_ext in ['.tar', '.tar.gz', '.tar.bz2', '.tgz', '.zip']:
+                if filename.endswith(bad_ext):
+                    looks_like_archive = True
             if skip_archives:
+                is_archive = None
                 if cache is not None:
-                    if cache.is_archive(url):
+                    is_archive = cache.is_archive(url)
+                    if is_archive:
+                        return None
+                if looks_like_archive and head_probes and is_archive is None:
+                    content_type = cls._get_content_type(url)
+                    if not content_type.lower().startswith('text/html'):
+                        logger.debug('Skipping page %s because of Content-Type: %s', link, content_type)
+                        if cache is not None:
+                            cache.set_is_archive(url)
                         return None
-                filename = link.filename
-                for bad_ext in ['.tar', '.tar.gz', '.tar.bz2', '.tgz', '.zip']:
-                    if filename.endswith(bad_ext):
-                        content_type = cls._get_content_type(url)
-                        if content_type.lower().startswith('text/html'):
-                            break
-                        else:
-                            logger.debug('Skipping page %s because of Content-Type: %s' % (link, content_type))
-                            if cache is not None:
-                                cache.set_is_archive(url)
-                            return None
-            logger.debug('Getting page %s' % url)
+                    if cache is not None:
+                        cache.set_is_archive(url, False)
+            logger.debug('Getting page %s', url)
 
             # Tack index.html onto file:// URLs that point to directories
             (scheme, netloc, path, params, query, fragment) = urlparse.urlparse(url)
@@ -658,20 +1252,39 @@ class HTMLPage(object):
                 if not url.endswith('/'):
                     url += '/'
                 url = urlparse.urljoin(url, 'index.html')
-                logger.debug(' file: URL is directory, getting %s' % url)
+                logger.debug(' file: URL is directory, getting %s', url)
+
+            # Pages kept from previous runs are revalidated with a
+            #   conditional GET, so an unchanged page costs one round trip
+            #   and no body transfer.
+            stored = None
+            if scheme in ('http', 'https'):
+                timed = timing.begin(url, 'page')
+                if cache is not None:
+                    stored = cache.get_stored_page(url)
+            request = url
+            if stored is not None:
+                if cache.store.is_fresh(stored):
+                    logger.debug(' using cached page %s', url)
+                    timing.end(timed, cache='hit')
+                    return cls._from_stored(url, stored, link, cache)
+                headers = cache.store.conditional_headers(stored)
+                headers['Accept-encoding'] = 'identity'
+                request = urllib2.Request(url, headers=headers)
 
-            resp = urlopen(url)
+            try:
+                resp = urlopen(request)
+            except HTTPError:
+                e = sys.exc_info()[1]
+                if stored is None or e.code != 304:
+                    raise
+                logger.debug(' page %s has not been modified', url)
+                timing.end(timed, status=304, cache='revalidated')
+                cache.store.refresh(url, stored)
+                return cls._from_stored(url, stored, link, cache)
 
             real_url = geturl(resp)
             headers = resp.info()
-            contents = resp.read()
-            encoding = headers.get('Content-Encoding', None)
-            #XXX need to handle exceptions and add testing for this
-            if encoding is not None:
-                if encoding == 'gzip':
-                    contents = gzip.GzipFile(fileobj=BytesIO(contents)).read()
-                if encoding == 'deflate':
-                    contents = zlib.decompress(contents)
 
             # The check for archives above only works if the url ends with
             #   something that looks like an archive. However that is not a
@@ -679,16 +1292,34 @@ class HTMLPage(object):
             #   redirects to http://superb-dca3.dl.sourceforge.net/project/docutils/docutils/0.8.1/docutils-0.8.1.tar.gz
             #   Unless we issue a HEAD request on every url we cannot know
             #   ahead of time for sure if something is HTML or not. However we
-            #   can check after we've downloaded it.
+            #   can check the headers of the GET before reading its body.
             content_type = headers.get('Content-Type', 'unknown')
-            if not content_type.lower().startswith("text/html"):
-                logger.debug('Skipping page %s because of Content-Type: %s' %
-                                            (link, content_type))
+            if not cls._accepts_content_type(content_type):
+                logger.debug('Skipping page %s because of Content-Type: %s',
+                             link, content_type)
+                resp.close()
+                timing.end(timed, status=getattr(resp, 'code', None),
+                           cache='miss')
                 if cache is not None:
                     cache.set_is_archive(url)
                 return None
+            if looks_like_archive and cache is not None:
+                cache.set_is_archive(url, False)
+
+            contents = resp.read()
+            timing.end(timed, status=getattr(resp, 'code', None),
+                       bytes=len(contents), cache='miss')
+            encoding = headers.get('Content-Encoding', None)
+            #XXX need to handle exceptions and add testing for this
+            if encoding is not None:
+                if encoding == 'gzip':
+                    contents = gzip.GzipFile(fileobj=BytesIO(contents)).read()
+                if encoding == 'deflate':
+                    contents = zlib.decompress(contents)
 
             inst = cls(u(contents), real_url, headers, trusted=link.trusted)
+            if cache is not None and scheme in ('http', 'https'):
+                cache.store_page(url, real_url, headers, contents)
         except (HTTPError, URLError, socket.timeout, socket.error, OSError, WindowsError):
             e = sys.exc_info()[1]
             desc = str(e)
@@ -715,15 +1346,34 @@ class HTMLPage(object):
             else:
                 log_meth = logger.info
                 level = 1
+            timing.end(timed, status=getattr(e, 'code', None), cache='miss',
+                       error=desc)
+            if isinstance(e, HTTPError) and getattr(e, 'fp', None) is not None:
+                # Gives the kept-alive connection back to the pool
+                e.fp.close()
             log_meth('Could not fetch URL %s: %s' % (link, desc))
             log_meth('Will skip URL %s when looking for download links for %s' % (link.url, req))
             if cache is not None:
-                cache.add_page_failure(url, level)
+                # A missing page may be published any moment
+                cache.add_page_failure(
+                    url, level, desc,
+                    store=not (isinstance(e, HTTPError) and e.code == 404))
             return None
         if cache is not None:
             cache.add_page([url, real_url], inst)
         return inst
 
+    @classmethod
+    def _from_stored(cls, url, stored, link, cache):
+        inst = cls(u(stored['content']), stored['real_url'],
+                   stored['headers'], trusted=link.trusted)
+        cache.add_page([url, stored['real_url']], inst)
+        return inst
+
+    @staticmethod
+    def _accepts_content_type(content_type):
+        return content_type.lower().startswith("text/html")
+
     @staticmethod
     def _get_content_type(url):
         """Get the Content-Type of the given url, using a HEAD request"""
@@ -733,7 +1383,13 @@ class HTMLPage(object):
             ## assertion error?
             return ''
         req = Urllib2HeadRequest(url, headers={'Host': netloc})
-        resp = urlopen(req)
+        timed = timing.begin(url, 'head')
+        try:
+            resp = urlopen(req)
+        except:
+            e = sys.exc_info()[1]
+            timing.end(timed, status=getattr(e, 'code', None), error=e)
+            raise
         try:
             if hasattr(resp, 'code') and resp.code != 200 and scheme not in ('ftp', 'ftps'):
                 ## FIXME: doesn't handle redirects
@@ -741,38 +1397,59 @@ class HTMLPage(object):
             return resp.info().get('content-type', '')
         finally:
             resp.close()
+            timing.end(timed, status=getattr(resp, 'code', None))
 
-    @property
-    def api_version(self):
-        if not hasattr(self, "_api_version"):
-            _api_version = None
+    def _extract(self):
+        """Collect the anchors, <base> and api-version <meta> of the page.
 
+        This is a single pass of the stdlib HTMLParser; html5lib is only
+        used for pages that parser chokes on.
+        """
+        if hasattr(self, "_anchors"):
+            return
+        extractor = LinkExtractor()
+        try:
+            extractor.feed(self.content)
+            extractor.close()
+            anchors = extractor.anchors
+            base_href = extractor.base_href
+            api_version = extractor.api_version
+        except (HTMLParseError, AssertionError):
+            logger.debug('Falling back to html5lib to parse %s', self.url)
+            anchors = [(a.get("href"), a.get("rel"))
+                       for a in self.parsed.findall(".//a")]
+            base = self.parsed.find(".//base")
+            base_href = base is not None and base.get("href") or None
             metas = [x for x in self.parsed.findall(".//meta")
                         if x.get("name", "").lower() == "api-version"]
-            if metas:
-                try:
-                    _api_version = int(metas[0].get("value", None))
-                except (TypeError, ValueError):
-                    _api_version = None
-            self._api_version = _api_version
+            api_version = metas and metas[0].get("value", None) or None
+
+        try:
+            self._api_version = int(api_version)
+        except (TypeError, ValueError):
+            self._api_version = None
+        self._base_url = base_href or self.url
+        self._anchors = anchors
+
+    @property
+    def api_version(self):
+        self._extract()
         return self._api_version
 
     @property
     def base_url(self):
-        if not hasattr(self, "_base_url"):
-            base = self.parsed.find(".//base")
-            if base is not None and base.get("href"):
-                self._base_url = base.get("href")
-            else:
-                self._base_url = self.url
+        self._extract()
         return self._base_url
 
     @property
     def links(self):
-        """Yields all links in the page"""
-        for anchor in self.parsed.findall(".//a"):
-            if anchor.get("href"):
-                href = anchor.get("href")
+        """All links in the page, built once per page"""
+        if not hasattr(self, "_links"):
+            self._extract()
+            links = []
+            for href, rel in self._anchors:
+                if not href:
+                    continue
                 url = self.clean_link(urlparse.urljoin(self.base_url, href))
 
                 # Determine if this link is internal. If that distinction
@@ -782,10 +1459,11 @@ class HTMLPage(object):
                 if self.api_version and self.api_version >= 2:
                     # Only api_versions >= 2 have a distinction between
                     #   external and internal links
-                    internal = bool(anchor.get("rel")
-                                and "internal" in anchor.get("rel").split())
+                    internal = bool(rel and "internal" in rel.split())
 
-                yield Link(url, self, internal=internal)
+                links.append(Link(url, self, internal=internal))
+            self._links = links
+        return self._links
 
     def rel_links(self):
         for url in self.explicit_rel_links():
@@ -797,13 +1475,13 @@ class HTMLPage(object):
         """Yields all links with the given relations"""
         rels = set(rels)
 
-        for anchor in self.parsed.findall(".//a"):
-            if anchor.get("rel") and anchor.get("href"):
-                found_rels = set(anchor.get("rel").split())
+        self._extract()
+        for href, rel in self._anchors:
+            if rel and href:
+                found_rels = set(rel.split())
                 # Determine the intersection between what rels were found and
                 #   what rels were being looked for
                 if found_rels & rels:
-                    href = anchor.get("href")
                     url = self.clean_link(urlparse.urljoin(self.base_url, href))
                     yield Link(url, self, trusted=False)
 
@@ -832,18 +1510,122 @@ class HTMLPage(object):
             lambda match: '%%%2x' % ord(match.group(0)), url)
 
 
+class JSONPage(HTMLPage):
+    """
+    The JSON description of a project, in the format of PyPI's JSON API
+    (https://pypi.python.org/pypi/<project>/json).
+
+    It is fetched and cached like an HTMLPage, but its links are built from
+    the files listed in it, with their digests as hash fragments, instead of
+    being parsed out of HTML.
+    """
+
+    # The listed files are all hosted by the index, and the digests make
+    #   them verifiable just like those on an API version 2 simple page
+    api_version = 2
+
+    @staticmethod
+    def _accepts_content_type(content_type):
+        content_type = content_type.lower()
+        # file:// URLs are served as text/plain
+        return 'json' in content_type or content_type.startswith('text/plain')
+
+    @property
+    def base_url(self):
+        return self.url
+
+    @property
+    def links(self):
+        if not hasattr(self, '_links'):
+            self._links = list(self._iter_links())
+        return self._links
+
+    def _iter_links(self):
+        try:
+            data = json.loads(self.content)
+        except ValueError:
+            logger.debug('Could not parse JSON from %s', self.url)
+            return
+        releases = data.get('releases')
+        if releases:
+            files = []
+            for version in sorted(releases):
+                files.extend(releases[version])
+        else:
+            files = data.get('urls') or []
+        for info in files:
+            url = urlparse.urljoin(self.url, info['url'])
+            if '#' not in url:
+                digests = info.get('digests') or {}
+                if digests.get('sha256'):
+                    url += '#sha256=' + digests['sha256']
+                elif info.get('md5_digest'):
+                    url += '#md5=' + info['md5_digest']
+            yield Link(url, self, internal=True)
+
+    def rel_links(self):
+        return []
+
+
+class LinkExtractor(HTMLParser):
+    """Collects what pip needs from a page -- the (href, rel) of every
+    anchor, the first <base> href and the api-version <meta> -- while the
+    page is being tokenized, without building a document tree."""
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.anchors = []
+        self.base_href = None
+        self.api_version = None
+        self._seen_base = False
+        self._seen_api_version = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in ('a', 'base', 'meta'):
+            return
+        # Like html5lib, the first of duplicated attributes wins
+        attributes = {}
+        for name, value in attrs:
+            if name not in attributes:
+                attributes[name] = value or ''
+        if tag == 'a':
+            self.anchors.append((attributes.get('href'),
+                                 attributes.get('rel')))
+        elif tag == 'base':
+            if not self._seen_base:
+                self._seen_base = True
+                self.base_href = attributes.get('href') or None
+        elif attributes.get('name', '').lower() == 'api-version':
+            if not self._seen_api_version:
+                self._seen_api_version = True
+                self.api_version = attributes.get('value')
+
+
 class Link(object):
 
+    # Pages create a lot of links, and most of what is derived from the url
+    #   is used over and over while sorting and filtering them, so it is
+    #   computed on first use and kept in these slots
+    _cached = ('_parts', '_filename', '_splitext', '_egg_fragment',
+               '_hash_match', '_wheel')
+    __slots__ = ('_url', 'comes_from', 'internal', 'trusted') + _cached
+
     def __init__(self, url, comes_from=None, internal=None, trusted=None):
         self.url = url
         self.comes_from = comes_from
         self.internal = internal
         self.trusted = trusted
 
-        # Set whether it's a wheel
-        self.wheel = None
-        if url != Inf and self.splitext()[1] == wheel_ext:
-            self.wheel = Wheel(self.filename)
+    def _get_url(self):
+        return self._url
+
+    def _set_url(self, url):
+        self._url = url
+        for name in self._cached:
+            if hasattr(self, name):
+                delattr(self, name)
+
+    url = property(_get_url, _set_url)
 
     def __str__(self):
         if self.comes_from:
@@ -875,53 +1657,92 @@ class Link(object):
     def __hash__(self):
         return hash(self.url)
 
+    @property
+    def _split(self):
+        try:
+            return self._parts
+        except AttributeError:
+            self._parts = urlparse.urlsplit(self.url)
+            return self._parts
+
     @property
     def filename(self):
-        _, netloc, path, _, _ = urlparse.urlsplit(self.url)
+        try:
+            return self._filename
+        except AttributeError:
+            pass
+        _, netloc, path, _, _ = self._split
         name = posixpath.basename(path.rstrip('/')) or netloc
         assert name, ('URL %r produced no filename' % self.url)
+        self._filename = name
         return name
 
     @property
     def scheme(self):
-        return urlparse.urlsplit(self.url)[0]
+        return self._split[0]
 
     @property
     def path(self):
-        return urlparse.urlsplit(self.url)[2]
+        return self._split[2]
 
     def splitext(self):
-        return splitext(posixpath.basename(self.path.rstrip('/')))
+        try:
+            return self._splitext
+        except AttributeError:
+            self._splitext = splitext(posixpath.basename(self.path.rstrip('/')))
+            return self._splitext
 
     @property
     def url_without_fragment(self):
-        scheme, netloc, path, query, fragment = urlparse.urlsplit(self.url)
+        scheme, netloc, path, query, fragment = self._split
         return urlparse.urlunsplit((scheme, netloc, path, query, None))
 
     _egg_fragment_re = re.compile(r'#egg=([^&]*)')
 
     @property
     def egg_fragment(self):
+        try:
+            return self._egg_fragment
+        except AttributeError:
+            pass
         match = self._egg_fragment_re.search(self.url)
-        if not match:
-            return None
-        return match.group(1)
+        if match:
+            self._egg_fragment = match.group(1)
+        else:
+            self._egg_fragment = None
+        return self._egg_fragment
 
     _hash_re = re.compile(r'(sha1|sha224|sha384|sha256|sha512|md5)=([a-f0-9]+)')
 
+    @property
+    def _hash(self):
+        try:
+            return self._hash_match
+        except AttributeError:
+            match = self._hash_re.search(self.url)
+            self._hash_match = match and match.groups() or (None, None)
+            return self._hash_match
+
     @property
     def hash(self):
-        match = self._hash_re.search(self.url)
-        if match:
-            return match.group(2)
-        return None
+        return self._hash[1]
 
     @property
     def hash_name(self):
-        match = self._hash_re.search(self.url)
-        if match:
-            return match.group(1)
-        return None
+        return self._hash[0]
+
+    @property
+    def wheel(self):
+        """The Wheel if this links to a wheel file, otherwise None"""
+        try:
+            return self._wheel
+        except AttributeError:
+            pass
+        wheel = None
+        if self.url != Inf and self.splitext()[1] == wheel_ext:
+            wheel = Wheel(self.filename)
+        self._wheel = wheel
+        return wheel
 
     @property
     def show_url(self):
@@ -0,0 +1,269 @@
+"""
+A compact, memory-mapped index of a local directory of archives.
+
+``pip index build`` writes it and ``PackageFinder`` reads it with
+``--local-index``, so that looking up a project in a large mirror is a binary
+search instead of fetching and parsing its HTML pages.
+
+The file starts with a header::
+
+    magic (8 bytes) | project count (uint32) | base length (uint32) | base
+
+``base`` is the directory the archive filenames are relative to, or empty for
+the directory of the index file itself.  A table with one entry per project
+follows, sorted by project name (lowercased, with runs of punctuation turned
+into dashes)::
+
+    name offset | name length | records offset | records length (4x uint32)
+
+The offsets point into the data area that makes up the rest of the file.  The
+records of a project are lines of tab-separated fields: version, filename,
+sha256, tags, size and mtime.  The tags of wheels are comma-separated
+``pyver-abi-plat`` triples.
+"""
+
+import hashlib
+import mmap
+import os
+import pkg_resources
+import re
+import struct
+
+from pip.backwardcompat import b
+from pip.cache import atomic_write
+from pip.download import path_to_url
+from pip.log import logger
+from pip.util import splitext
+from pip.wheel import Wheel, wheel_ext
+
+__all__ = ['LocalIndex', 'build_index', 'local_index_name']
+
+#: The name of the index file inside the indexed directory
+local_index_name = 'pip-index.bin'
+
+_magic = b('PIPIDX\x00\x01')
+_header = struct.Struct('>II')
+_entry = struct.Struct('>IIII')
+
+archive_extensions = ('.tar.gz', '.tar.bz2', '.tar', '.tgz', '.zip', wheel_ext)
+
+_name_version_re = re.compile(r'^(.+?)-(\d.*)$')
+
+
+def project_key(name):
+    """The name a project is indexed under"""
+    return pkg_resources.safe_name(name).lower()
+
+
+class IndexRecord(object):
+    """A file in the index"""
+
+    fields = ('version', 'filename', 'sha256', 'tags', 'size', 'mtime')
+
+    def __init__(self, version, filename, sha256, tags=(), size=0, mtime=0):
+        self.version = version
+        self.filename = filename
+        self.sha256 = sha256
+        self.tags = tuple(tags)
+        self.size = int(size)
+        self.mtime = int(mtime)
+
+    def __repr__(self):
+        return '<IndexRecord %s>' % self.filename
+
+    def serialize(self):
+        return '\t'.join([self.version, self.filename, self.sha256,
+                          ','.join(self.tags), str(self.size),
+                          str(self.mtime)])
+
+    @classmethod
+    def parse(cls, line):
+        version, filename, sha256, tags, size, mtime = line.split('\t')
+        return cls(version, filename, sha256, tags and tags.split(',') or (),
+                   size, mtime)
+
+
+class LocalIndex(object):
+    """A read-only, memory-mapped index file"""
+
+    def __init__(self, path):
+        self.path = path
+        fp = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            fp.close()
+        if self._map[:len(_magic)] != _magic:
+            self._map.close()
+            raise ValueError('%s is not a pip index file' % path)
+        offset = len(_magic)
+        self._count, base_len = _header.unpack_from(self._map, offset)
+        offset += _header.size
+        base = self._map[offset:offset + base_len].decode('utf-8')
+        self.base = base or os.path.dirname(os.path.abspath(path))
+        self._table = offset + base_len
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def _table_entry(self, i):
+        return _entry.unpack_from(self._map, self._table + i * _entry.size)
+
+    def _name(self, i):
+        name_offset, name_len = self._table_entry(i)[:2]
+        return self._map[name_offset:name_offset + name_len]
+
+    def projects(self):
+        for i in range(self._count):
+            yield self._name(i).decode('utf-8')
+
+    def lookup(self, name):
+        """The records of the project ``name`` (a binary search)"""
+        key = project_key(name).encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self._count or self._name(lo) != key:
+            return []
+        records_offset, records_len = self._table_entry(lo)[2:]
+        data = self._map[records_offset:records_offset + records_len]
+        return [IndexRecord.parse(line)
+                for line in data.decode('utf-8').splitlines()]
+
+    def items(self):
+        """Yields (project name, records) for every project"""
+        for name in self.projects():
+            yield name, self.lookup(name)
+
+    def url(self, record):
+        """The file:// URL of a record, with its hash as fragment"""
+        path = os.path.join(self.base, *record.filename.split('/'))
+        return '%s#sha256=%s' % (path_to_url(path), record.sha256)
+
+
+def write_index(path, projects, base=''):
+    """Write the index of ``projects``, a dict mapping project keys to
+    lists of IndexRecords, to ``path``"""
+    names = sorted(projects)
+    base = base.encode('utf-8')
+    table_offset = len(_magic) + _header.size + len(base)
+    offset = table_offset + _entry.size * len(names)
+    table, data = [], []
+    for name in names:
+        name_bytes = name.encode('utf-8')
+        records = sorted(projects[name], key=lambda r: r.filename)
+        records_bytes = '\n'.join(
+            [r.serialize() for r in records]).encode('utf-8')
+        table.append(_entry.pack(offset, len(name_bytes),
+                                 offset + len(name_bytes), len(records_bytes)))
+        data.append(name_bytes)
+        data.append(records_bytes)
+        offset += len(name_bytes) + len(records_bytes)
+    atomic_write(path, b('').join(
+        [_magic, _header.pack(len(names), len(base)), base]
+        + table + data))
+
+
+def parse_filename(filename, project_dir=None):
+    """Return (project key, version, tags) for an archive
+    filename, or None if it can't be parsed.  ``project_dir`` is the name of
+    the directory the file is in, which in a simple index tree is the project
+    name and disambiguates names with dashes."""
+    if filename.endswith(wheel_ext):
+        try:
+            wheel = Wheel(filename)
+        except AttributeError:
+            return None
+        tags = sorted(['-'.join(tag) for tag in wheel.file_tags])
+        return project_key(wheel.name), wheel.version, tags
+    stem, ext = splitext(filename)
+    if ext not in archive_extensions:
+        return None
+    if project_dir:
+        prefix = project_key(project_dir) + '-'
+        if project_key(stem).startswith(prefix):
+            return prefix[:-1], stem[len(prefix):], []
+    match = _name_version_re.match(stem)
+    if not match:
+        return None
+    return project_key(match.group(1)), match.group(2), []
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    fp = open(path, 'rb')
+    try:
+        while True:
+            chunk = fp.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+    finally:
+        fp.close()
+    return digest.hexdigest()
+
+
+def build_index(directory, path=None):
+    """
+    Index the archives found anywhere below ``directory`` into ``path``
+    (``directory``/pip-index.bin by default).
+
+    If the index already exists, only files that are new or changed since
+    are hashed; the records of unchanged files are reused and those of
+    removed files are dropped.  Returns (added, removed, total) counts.
+    """
+    directory = os.path.abspath(directory)
+    if path is None:
+        path = os.path.join(directory, local_index_name)
+    path = os.path.abspath(path)
+
+    known = {}
+    if os.path.exists(path):
+        try:
+            index = LocalIndex(path)
+        except ValueError:
+            index = None
+        if index is not None:
+            try:
+                for name, records in index.items():
+                    for record in records:
+                        known[record.filename] = record
+            finally:
+                index.close()
+
+    projects = {}
+    added = total = 0
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            full_path = os.path.join(dirpath, filename)
+            if full_path == path:
+                continue
+            parsed = parse_filename(filename, os.path.basename(dirpath))
+            if parsed is None:
+                continue
+            name, version, tags = parsed
+            relpath = os.path.relpath(full_path, directory).replace(os.sep, '/')
+            stat = os.stat(full_path)
+            record = known.pop(relpath, None)
+            if (record is None or record.size != stat.st_size
+                    or record.mtime != int(stat.st_mtime)):
+                logger.info('Indexing %s' % relpath)
+                record = IndexRecord(version, relpath, _hash_file(full_path),
+                                     tags, stat.st_size, stat.st_mtime)
+                added += 1
+            projects.setdefault(name, []).append(record)
+            total += 1
+
+    base = ''
+    if os.path.dirname(path) != directory:
+        base = directory
+    write_index(path, projects, base)
+    return added, len(known), total
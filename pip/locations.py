@@ -127,6 +127,8 @@ else:
         bin_py = '/usr/local/bin'
         default_log_file = os.path.join(user_dir, 'Library/Logs/pip.log')
 
+default_cache_dir = os.path.join(default_storage_dir, 'cache')
+
 
 def distutils_scheme(dist_name, user=False, home=None):
     """
@@ -17,6 +17,10 @@ def _color_wrap(*colors):
     return wrapped
 
 
+def _no_color(inp):
+    return inp
+
+
 def should_color(consumer, environ, std=(sys.stdout, sys.stderr)):
     real_consumer = (consumer if not isinstance(consumer, colorama.AnsiToWin32)
                         else consumer.wrapped)
@@ -82,6 +86,17 @@ class Logger(object):
         self.in_progress = None
         self.in_progress_hanging = False
 
+    def _get_consumers(self):
+        return self._consumers
+
+    def _set_consumers(self, consumers):
+        self._consumers = consumers
+        self._dispatch = None
+
+    # Changing the consumers (by assignment, add_consumers() or
+    # move_stdout_to_stderr()) rebuilds the dispatch table
+    consumers = property(_get_consumers, _set_consumers)
+
     def add_consumers(self, *consumers):
         if sys.platform.startswith("win"):
             for level, consumer in consumers:
@@ -93,6 +108,55 @@ class Logger(object):
                     self.consumers.append((level, consumer))
         else:
             self.consumers.extend(consumers)
+        self._dispatch = None
+
+    def _get_dispatch(self):
+        """
+        Return ``(min_level, dispatch)``: the lowest level any consumer
+        accepts, and for each consumer a tuple ``(consumer_level, consumer,
+        write, colorizer)`` where ``write`` writes a line to a stream (None
+        for callables) and ``colorizer`` is None unless it gets colors.
+        """
+        if self._dispatch is None:
+            dispatch = []
+            for consumer_level, consumer in self._consumers:
+                write = colorizer = None
+                if hasattr(consumer, 'write'):
+                    if isinstance(consumer, colorama.AnsiToWin32):
+                        write = consumer.write
+                    else:
+                        write = self._writer(consumer)
+                    if should_color(consumer, os.environ):
+                        colorizer = self.COLORS.get
+                dispatch.append((consumer_level, consumer, write, colorizer))
+            levels = [level for level, consumer in self._consumers]
+            if levels:
+                min_level = min(levels)
+            else:
+                min_level = None
+            self._dispatch = (min_level, dispatch)
+        return self._dispatch
+
+    def _writer(self, consumer):
+        def write(rendered):
+            backwardcompat.fwrite(consumer, rendered)
+        return write
+
+    def is_enabled_for(self, level):
+        """
+        Would a message at ``level`` be shown by any consumer?  Check this
+        before building the arguments of a message that are costly to
+        compute.
+        """
+        min_level = self._get_dispatch()[0]
+        if min_level is None:
+            return False
+        if isinstance(level, slice):
+            for consumer_level, consumer in self._consumers:
+                if self.level_matches(level, consumer_level):
+                    return True
+            return False
+        return level >= min_level
 
     def debug(self, msg, *args, **kw):
         self.log(self.DEBUG, msg, *args, **kw)
@@ -130,13 +194,22 @@ class Logger(object):
             self.error(msg, *args, **kwargs)
 
     def log(self, level, msg, *args, **kw):
+        """
+        Log ``msg % args`` (or ``msg % kw``).  The message is only formatted
+        if a consumer shows it, so pass the arguments rather than formatting
+        the message beforehand.
+        """
         if args:
             if kw:
                 raise TypeError(
                     "You may give positional or keyword arguments, not both")
+        min_level, dispatch = self._get_dispatch()
+        if min_level is None or (not isinstance(level, slice)
+                                 and level < min_level):
+            return
         args = args or kw
         rendered = None
-        for consumer_level, consumer in self.consumers:
+        for consumer_level, consumer, write, colorizer in dispatch:
             if self.level_matches(level, consumer_level):
                 if (self.in_progress_hanging
                     and consumer in (sys.stdout, sys.stderr)):
@@ -152,19 +225,13 @@ class Logger(object):
                     if self.explicit_levels:
                         ## FIXME: should this be a name, not a level number?
                         rendered = '%02i %s' % (level, rendered)
-                if hasattr(consumer, 'write'):
-                    if should_color(consumer, os.environ):
+                if write is not None:
+                    line = rendered
+                    if colorizer is not None:
                         # We are printing to stdout or stderr and it supports
                         #   colors so render our text colored
-                        colorizer = self.COLORS.get(level, lambda x: x)
-                        rendered = colorizer(rendered)
-
-                    rendered += '\n'
-
-                    if isinstance(consumer, colorama.AnsiToWin32):
-                        consumer.write(rendered)
-                    else:
-                        backwardcompat.fwrite(consumer, rendered)
+                        line = colorizer(level, _no_color)(line)
+                    write(line + '\n')
                 else:
                     consumer(rendered)
 
@@ -275,5 +342,6 @@ class Logger(object):
         for item in to_remove:
             self.consumers.remove(item)
         self.consumers.extend(to_add)
+        self._dispatch = None
 
 logger = Logger()
@@ -98,5 +98,38 @@ def get_supported(versions=None, noarch=False):
 
     return supported
 
+def tag_priorities(tags):
+    """Map each tag of the list `tags` to its index in it: the lower, the
+    more preferred.  A tag listed twice keeps its first index."""
+    priorities = {}
+    for i, tag in enumerate(tags):
+        if tag not in priorities:
+            priorities[tag] = i
+    return priorities
+
+
+_priorities = {}
+
+
+def get_priorities(tags):
+    """Return tag_priorities(tags), computed once per list of tags.
+
+    The table is found by the identity of the list, so lists of tags must
+    not be modified in place once they were used.
+    """
+    try:
+        cached_tags, priorities = _priorities[id(tags)]
+        if cached_tags is tags:
+            return priorities
+    except KeyError:
+        pass
+    if len(_priorities) >= 16:
+        _priorities.clear()
+    priorities = tag_priorities(tags)
+    # keeping a reference to `tags` keeps its id from being reused
+    _priorities[id(tags)] = (tags, priorities)
+    return priorities
+
+
 supported_tags = get_supported()
 supported_tags_noarch = get_supported(noarch=True)
@@ -852,11 +852,14 @@ class RequirementSet(object):
 
     def __init__(self, build_dir, src_dir, download_dir, download_cache=None,
                  upgrade=False, ignore_installed=False, as_egg=False, target_dir=None,
-                 ignore_dependencies=False, force_reinstall=False, use_user_site=False):
+                 ignore_dependencies=False, force_reinstall=False, use_user_site=False,
+                 download_cache_size=None):
         self.build_dir = build_dir
         self.src_dir = src_dir
         self.download_dir = download_dir
         self.download_cache = download_cache
+        # In bytes; None if the download cache may grow without limit
+        self.download_cache_size = download_cache_size
         self.upgrade = upgrade
         self.ignore_installed = ignore_installed
         self.force_reinstall = force_reinstall
@@ -979,8 +982,26 @@ class RequirementSet(object):
                                        'an equivalent install with --no-install?)'
                                        % (req_to_install, req_to_install.source_dir))
 
+    def _requirements_to_look_up(self):
+        """The top-level requirements prepare_files will search indexes for"""
+        for req in self.requirements.values():
+            if req.editable or req.url or req.req is None:
+                continue
+            if not (self.upgrade or self.ignore_installed):
+                try:
+                    pkg_resources.get_distribution(req.req)
+                    # Already satisfied, it won't be looked up
+                    continue
+                except (pkg_resources.DistributionNotFound,
+                        pkg_resources.VersionConflict):
+                    pass
+            yield req
+
     def prepare_files(self, finder, force_root_egg_info=False, bundle=False):
         """Prepare process. Create temp directories, download and/or unpack files."""
+        # Fetch the index pages of every known requirement concurrently
+        #   instead of one requirement at a time
+        finder.prefetch(list(self._requirements_to_look_up()))
         unnamed = list(self.unnamed_requirements)
         reqs = list(self.requirements.values())
         while reqs or unnamed:
@@ -1232,7 +1253,8 @@ class RequirementSet(object):
         else:
             if self.download_cache:
                 self.download_cache = os.path.expanduser(self.download_cache)
-            retval = unpack_http_url(link, location, self.download_cache, self.download_dir)
+            retval = unpack_http_url(link, location, self.download_cache, self.download_dir,
+                                     self.download_cache_size)
             if only_download:
                 write_delete_marker_file(location)
             return retval
@@ -0,0 +1,314 @@
+"""A shared, bounded pool of threads fetching pages"""
+
+import atexit
+import sys
+import time
+import weakref
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+from pip.backwardcompat import urlparse
+from pip.log import logger
+
+__all__ = ['FetchScheduler', 'FetchJob', 'HedgedJob', 'LatencyStats']
+
+
+class FetchJob(object):
+    """A fetch submitted to a FetchScheduler; wait() returns its result"""
+
+    def __init__(self, host, func, args):
+        self.host = host
+        self.func = func
+        self.args = args
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+        self._listeners = []
+        self.cancelled = False
+
+    def run(self):
+        try:
+            self._result = self.func(*self.args)
+        except:
+            self._exc_info = sys.exc_info()
+        self._finish()
+
+    def _finish(self):
+        self._done.set()
+        for event in self._listeners:
+            event.set()
+
+    def notify(self, event):
+        """Set the threading.Event ``event`` when the job is done"""
+        self._listeners.append(event)
+        if self.done():
+            event.set()
+
+    def done(self):
+        return self._done.isSet()
+
+    def succeeded(self):
+        """Whether the job is done and returned something else than None"""
+        return (self.done() and not self.cancelled
+                and self._exc_info is None and self._result is not None)
+
+    def wait(self):
+        """Block until the job has run; return its result or raise its
+        exception"""
+        self._done.wait()
+        if self.cancelled:
+            return None
+        if self._exc_info is not None:
+            exc_type, exc_value, tb = self._exc_info
+            raise exc_value
+        return self._result
+
+
+class FetchScheduler(object):
+    """
+    Runs fetch jobs on at most ``max_workers`` threads, with at most
+    ``max_per_host`` of them talking to the same host at a time.
+
+    The threads are started on demand and live as long as there is work,
+    so one scheduler serves all the requirements a finder looks up; they
+    exit after ``idle_timeout`` seconds without any.  ``queued``,
+    ``in_flight`` and ``in_flight_by_host`` tell how busy it is.
+    """
+
+    def __init__(self, max_workers=16, max_per_host=6, idle_timeout=5):
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self._jobs = []
+        self._workers = 0
+        self.in_flight = 0
+        self.in_flight_by_host = {}
+        self.completed = 0
+        self._threads = []
+        self._shutdown = False
+        self._cond = threading.Condition(threading.Lock())
+        _schedulers.append(weakref.ref(self))
+
+    @staticmethod
+    def host(url):
+        return urlparse.urlsplit(url)[1]
+
+    @property
+    def queued(self):
+        return len(self._jobs)
+
+    def stats(self):
+        """A snapshot of the counters"""
+        self._cond.acquire()
+        try:
+            return {'queued': len(self._jobs), 'in_flight': self.in_flight,
+                    'in_flight_by_host': dict(self.in_flight_by_host),
+                    'completed': self.completed, 'workers': self._workers}
+        finally:
+            self._cond.release()
+
+    def submit(self, url, func, *args):
+        """Schedule ``func(*args)``, which fetches ``url``"""
+        job = FetchJob(self.host(url), func, args)
+        self._cond.acquire()
+        try:
+            self._jobs.append(job)
+            free = self._workers - self.in_flight
+            if free < len(self._jobs) and self._workers < self.max_workers:
+                self._workers += 1
+                thread = threading.Thread(target=self._work)
+                thread.setDaemon(True)
+                thread.start()
+                self._threads = [t for t in self._threads if t.is_alive()]
+                self._threads.append(thread)
+            self._cond.notify()
+        finally:
+            self._cond.release()
+        return job
+
+    def cancel(self, job):
+        """Cancel a job: if it hasn't started, it never will and wait()
+        returns None; if it is running, it isn't interrupted but its result
+        is dropped"""
+        self._cond.acquire()
+        try:
+            job.cancelled = True
+            if job in self._jobs:
+                self._jobs.remove(job)
+                job._finish()
+        finally:
+            self._cond.release()
+
+    def _next_job(self):
+        # Called with the lock held
+        for i, job in enumerate(self._jobs):
+            if self.in_flight_by_host.get(job.host, 0) < self.max_per_host:
+                del self._jobs[i]
+                return job
+        return None
+
+    def _work(self):
+        self._cond.acquire()
+        try:
+            while True:
+                job = self._next_job()
+                if job is None:
+                    started = time.time()
+                    if not self._shutdown:
+                        self._cond.wait(self.idle_timeout)
+                    if not self._jobs and (
+                            self._shutdown
+                            or time.time() - started >= self.idle_timeout):
+                        self._workers -= 1
+                        return
+                    continue
+                self.in_flight += 1
+                self.in_flight_by_host[job.host] = \
+                    self.in_flight_by_host.get(job.host, 0) + 1
+                self._cond.release()
+                try:
+                    job.run()
+                finally:
+                    self._cond.acquire()
+                    self.in_flight -= 1
+                    self.in_flight_by_host[job.host] -= 1
+                    if not self.in_flight_by_host[job.host]:
+                        del self.in_flight_by_host[job.host]
+                    self.completed += 1
+                    # A job of the host that just got a free slot may be
+                    #   waiting
+                    self._cond.notifyAll()
+        finally:
+            self._cond.release()
+
+    def shutdown(self):
+        """Let the workers finish the queued jobs, and wait for them to
+        exit"""
+        self._cond.acquire()
+        try:
+            self._shutdown = True
+            self._cond.notifyAll()
+            threads = list(self._threads)
+        finally:
+            self._cond.release()
+        for thread in threads:
+            thread.join()
+
+
+class HedgedJob(object):
+    """
+    Fetches the same thing from any of several places (e.g. the pages of a
+    project on mirrored indexes), with the wait() of a FetchJob.
+
+    The first alternative is submitted right away.  When it hasn't
+    answered after ``delay(host)`` seconds, or failed, the next one is
+    submitted too, and so on; the first job to return something wins and
+    the others are cancelled.
+    """
+
+    def __init__(self, scheduler, alternatives, delay):
+        self.scheduler = scheduler
+        self.delay = delay
+        # (url, func, args) of the alternatives not submitted yet
+        self._alternatives = list(alternatives)
+        self._event = threading.Event()
+        self.jobs = []
+        self._submitted = None
+        self._submit_next()
+
+    def _submit_next(self):
+        url, func, args = self._alternatives.pop(0)
+        job = self.scheduler.submit(url, func, *args)
+        job.notify(self._event)
+        self.jobs.append(job)
+        self._submitted = time.time()
+        if len(self.jobs) > 1:
+            logger.debug('Hedging with %s', url)
+
+    def wait(self):
+        """The result of the first job that succeeded, or None if none
+        did"""
+        while True:
+            for job in self.jobs:
+                if job.succeeded():
+                    for other in self.jobs:
+                        if other is not job and not other.done():
+                            self.scheduler.cancel(other)
+                    return job.wait()
+            pending = [job for job in self.jobs if not job.done()]
+            if self._alternatives:
+                timeout = (self._submitted + self.delay(self.jobs[-1].host)
+                           - time.time())
+                if not pending or timeout <= 0:
+                    self._submit_next()
+                    continue
+                self._event.wait(timeout)
+            elif pending:
+                self._event.wait()
+            else:
+                return None
+            self._event.clear()
+
+
+class LatencyStats(object):
+    """
+    The durations of the last ``window`` fetches from every host, to tell
+    how long a fetch may take before it's worth hedging: the
+    ``percentile`` of the durations of its host, or ``default`` while
+    there are fewer than ``min_samples`` of them.
+    """
+
+    def __init__(self, window=50, percentile=0.95, min_samples=5,
+                 default=1.0):
+        self.window = window
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default = default
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, host, seconds):
+        self._lock.acquire()
+        try:
+            samples = self._samples.setdefault(host, [])
+            samples.append(seconds)
+            if len(samples) > self.window:
+                del samples[0]
+        finally:
+            self._lock.release()
+
+    def threshold(self, host):
+        self._lock.acquire()
+        try:
+            samples = sorted(self._samples.get(host, []))
+        finally:
+            self._lock.release()
+        if len(samples) < self.min_samples:
+            return self.default
+        return samples[int(self.percentile * (len(samples) - 1))]
+
+    def stats(self):
+        """(count, median, threshold) by host"""
+        result = {}
+        for host in list(self._samples):
+            samples = sorted(self._samples[host])
+            result[host] = (len(samples), samples[len(samples) // 2],
+                            self.threshold(host))
+        return result
+
+
+_schedulers = []
+
+
+def _shutdown_all():
+    # Idle workers would otherwise be killed in the middle of the
+    #   interpreter's shutdown
+    for ref in _schedulers:
+        scheduler = ref()
+        if scheduler is not None:
+            scheduler.shutdown()
+
+atexit.register(_shutdown_all)
@@ -0,0 +1,177 @@
+"""
+Timings of the network requests pip makes, written to the file given with
+``--timing-report``.
+
+The code making a request calls begin() and end(); while it runs,
+the connection code fills in the DNS, connect, TLS and first byte times of
+the current request of its thread.  Both are no-ops unless a report was
+started, so the overhead without ``--timing-report`` is one global lookup.
+"""
+
+import json
+import time
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+from pip.backwardcompat import urlparse
+
+__all__ = ['RequestTiming', 'TimingReport', 'start_report', 'stop_report',
+           'begin', 'end', 'current']
+
+#: The report being collected, if any
+report = None
+
+_local = threading.local()
+
+
+class RequestTiming(object):
+    """
+    The timings of one request, in seconds: ``dns``, ``connect`` and
+    ``tls`` are the durations of these steps (None if a kept-alive
+    connection was reused), ``first_byte`` and ``total`` the time from the
+    start of the request until the response headers and the end of the
+    body.  ``cache`` tells whether it was answered by a cache: 'hit',
+    'revalidated' (a conditional request) or 'miss'.
+    """
+
+    fields = ('url', 'host', 'kind', 'started', 'dns', 'connect', 'tls',
+              'first_byte', 'total', 'reused', 'bytes', 'status', 'cache',
+              'error')
+
+    def __init__(self, url, kind):
+        self.url = url
+        self.host = urlparse.urlsplit(url)[1]
+        self.kind = kind
+        self.started = time.time()
+        self.dns = self.connect = self.tls = None
+        self.first_byte = self.total = None
+        self.reused = False
+        self.bytes = 0
+        self.status = None
+        self.cache = None
+        self.error = None
+
+    def elapsed(self):
+        return time.time() - self.started
+
+    def as_dict(self):
+        result = {}
+        for name in self.fields:
+            result[name] = getattr(self, name)
+        return result
+
+
+def _stats(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {'mean': sum(values) / len(values),
+            'median': values[len(values) // 2],
+            'p95': values[int(0.95 * (len(values) - 1))],
+            'max': values[-1]}
+
+
+class TimingReport(object):
+    """The timed requests of a pip run"""
+
+    def __init__(self):
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def begin(self, url, kind):
+        timing = RequestTiming(url, kind)
+        self._lock.acquire()
+        try:
+            self.requests.append(timing)
+        finally:
+            self._lock.release()
+        _local.timing = timing
+        return timing
+
+    def end(self, timing, status=None, bytes=None, cache=None, error=None):
+        if timing.total is None:
+            timing.total = timing.elapsed()
+            if status is not None:
+                timing.status = status
+            if bytes is not None:
+                timing.bytes = bytes
+            if cache is not None:
+                timing.cache = cache
+            if error is not None:
+                timing.error = str(error)
+        if getattr(_local, 'timing', None) is timing:
+            _local.timing = None
+
+    def summary(self):
+        """Totals and statistics of the requests, by host"""
+        by_host = {}
+        for timing in list(self.requests):
+            by_host.setdefault(timing.host, []).append(timing)
+        summary = {}
+        for host, timings in by_host.items():
+            cache = {}
+            for timing in timings:
+                if timing.cache is not None:
+                    cache[timing.cache] = cache.get(timing.cache, 0) + 1
+            summary[host] = {
+                'requests': len(timings),
+                'errors': len([t for t in timings if t.error is not None]),
+                'bytes': sum([t.bytes for t in timings]),
+                'connections': len([t for t in timings
+                                    if t.connect is not None]),
+                'cache': cache,
+            }
+            for name in ('dns', 'connect', 'tls', 'first_byte', 'total'):
+                summary[host][name] = _stats(
+                    [getattr(t, name) for t in timings
+                     if getattr(t, name) is not None])
+        return summary
+
+    def as_dict(self):
+        return {'requests': [t.as_dict() for t in list(self.requests)],
+                'hosts': self.summary()}
+
+    def write(self, path):
+        fp = open(path, 'w')
+        try:
+            fp.write(json.dumps(self.as_dict(), indent=2, sort_keys=True))
+        finally:
+            fp.close()
+
+
+def start_report():
+    global report
+    report = TimingReport()
+    return report
+
+
+def stop_report():
+    global report
+    result, report = report, None
+    return result
+
+
+def begin(url, kind):
+    """Start timing a request to ``url``; ``kind`` is 'page', 'head' or
+    'download'.  Returns the RequestTiming, or None if no report is being
+    collected."""
+    if report is None:
+        return None
+    return report.begin(url, kind)
+
+
+def end(timing, **kwargs):
+    """Finish timing a request started with begin(); the keyword arguments
+    are those of TimingReport.end()"""
+    if timing is not None and report is not None:
+        report.end(timing, **kwargs)
+
+
+def current():
+    """The request being timed in this thread, or None"""
+    if report is None:
+        return None
+    return getattr(_local, 'timing', None)
@@ -1,5 +1,6 @@
 import sys
 import shutil
+import mmap
 import os
 import stat
 import re
@@ -8,10 +9,20 @@ import pkg_resources
 import zipfile
 import tarfile
 import subprocess
+import tempfile
 import textwrap
+
+try:
+    import threading
+    _have_threads = True
+except ImportError:
+    import dummy_threading as threading
+    _have_threads = False
+
 from pip.exceptions import InstallationError, BadCommand, PipError
 from pip.backwardcompat import(WindowsError, string_types, raw_input,
-                                console_to_str, user_site, PermissionError)
+                                console_to_str, user_site, PermissionError,
+                                OrderedDict, b)
 from pip.locations import site_packages, running_under_virtualenv, virtualenv_no_global
 from pip.log import logger
 from pip.vendor.distlib import version
@@ -25,7 +36,10 @@ __all__ = ['rmtree', 'display_path', 'backup_dir',
            'make_path_relative', 'normalize_path',
            'renames', 'get_terminal_size', 'get_prog',
            'unzip_file', 'untar_file', 'create_download_cache_folder',
-           'cache_download', 'unpack_file', 'call_subprocess']
+           'unpack_file', 'call_subprocess', 'hash_file', 'link_or_copy',
+           'TarStream', 'start_untar',
+           'LRUCache', 'memoize', 'parse_version', 'is_prerelease',
+           'VersionSpecifier']
 
 
 def get_prog():
@@ -203,6 +217,92 @@ def is_svn_page(html):
             and re.search(r'Powered by (?:<a[^>]*?>)?Subversion', html, re.I))
 
 
+def hash_file(path, hashes, block_size=1024 * 1024):
+    """
+    Feed the content of the file at ``path`` to each of the hash objects
+    ``hashes``.  Files of at least ``block_size`` bytes are mapped into
+    memory and hashed at once, smaller ones are read in a single block.
+    """
+    fp = open(path, 'rb')
+    try:
+        if os.path.getsize(path) >= block_size:
+            try:
+                mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (EnvironmentError, ValueError):
+                # e.g. on file systems that can't map files
+                mapped = None
+            if mapped is not None:
+                try:
+                    for hash in hashes:
+                        hash.update(mapped)
+                finally:
+                    mapped.close()
+                return
+        while True:
+            chunk = fp.read(block_size)
+            if not chunk:
+                break
+            for hash in hashes:
+                hash.update(chunk)
+    finally:
+        fp.close()
+
+
+# The ioctl that makes a file a copy-on-write clone of another on Linux
+#   (btrfs, XFS and others)
+FICLONE = 0x40049409
+
+
+def _clone_or_copy(source, dest):
+    """Make dest a clone of source if the file system can, else a copy"""
+    if sys.platform.startswith('linux'):
+        try:
+            import fcntl
+            src = open(source, 'rb')
+            try:
+                dst = open(dest, 'wb')
+                try:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                    return
+                finally:
+                    dst.close()
+            finally:
+                src.close()
+        except (ImportError, IOError, OSError):
+            # Not supported by this file system, or across file systems
+            pass
+    shutil.copyfile(source, dest)
+
+
+def link_or_copy(source, dest):
+    """
+    Give ``dest`` the content of the file ``source`` without copying it
+    where possible: as a hard link to it, else as a copy-on-write clone
+    (a reflink) where the file system supports them, and only as a copy
+    when neither works, e.g. across devices.  ``dest`` is replaced
+    atomically, so no reader ever sees a partial file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(dest) or '.',
+                                     prefix='.tmp-')
+    os.close(fd)
+    try:
+        os.remove(temp_path)
+        try:
+            os.link(source, temp_path)
+        except (AttributeError, OSError):
+            # No hard links on this platform or file system, or across
+            #   devices
+            _clone_or_copy(source, temp_path)
+        if sys.platform == 'win32' and os.path.exists(dest):
+            # rename() doesn't overwrite on Windows
+            os.remove(dest)
+        os.rename(temp_path, dest)
+    finally:
+        # rename() does nothing if dest was a link to source already
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
 def file_contents(filename):
     fp = open(filename, 'rb')
     try:
@@ -552,49 +652,234 @@ def untar_file(filename, location):
                 continue
             if leading:
                 fn = split_leading_dir(fn)[1]
-            path = os.path.join(location, fn)
-            if member.isdir():
-                if not os.path.exists(path):
-                    os.makedirs(path)
-            elif member.issym():
-                try:
-                    tar._extract_member(member, path)
-                except:
-                    e = sys.exc_info()[1]
-                    # Some corrupt tar files seem to produce this
-                    # (specifically bad symlinks)
-                    logger.warn(
-                        'In the tar file %s the member %s is invalid: %s'
-                        % (filename, member.name, e))
-                    continue
-            else:
-                try:
-                    fp = tar.extractfile(member)
-                except (KeyError, AttributeError):
-                    e = sys.exc_info()[1]
-                    # Some corrupt tar files seem to produce this
-                    # (specifically bad symlinks)
-                    logger.warn(
-                        'In the tar file %s the member %s is invalid: %s'
-                        % (filename, member.name, e))
-                    continue
-                if not os.path.exists(os.path.dirname(path)):
-                    os.makedirs(os.path.dirname(path))
-                destfp = open(path, 'wb')
-                try:
-                    shutil.copyfileobj(fp, destfp)
-                finally:
-                    destfp.close()
-                fp.close()
-                # member have any execute permissions for user/group/world?
-                if member.mode & 0o111:
-                    # make dest file have execute for user/group/world
-                    # no-op on windows per python docs
-                    os.chmod(path, (0o777-current_umask() | 0o111))
+            _untar_member(tar, member, os.path.join(location, fn), filename)
     finally:
         tar.close()
 
 
+def _untar_member(tar, member, path, filename):
+    """Write the member of tar (read from ``filename``) to path"""
+    if member.isdir():
+        if not os.path.exists(path):
+            os.makedirs(path)
+    elif member.issym():
+        try:
+            tar._extract_member(member, path)
+        except:
+            e = sys.exc_info()[1]
+            # Some corrupt tar files seem to produce this
+            # (specifically bad symlinks)
+            logger.warn(
+                'In the tar file %s the member %s is invalid: %s'
+                % (filename, member.name, e))
+    else:
+        try:
+            fp = tar.extractfile(member)
+        except (KeyError, AttributeError):
+            e = sys.exc_info()[1]
+            # Some corrupt tar files seem to produce this
+            # (specifically bad symlinks)
+            logger.warn(
+                'In the tar file %s the member %s is invalid: %s'
+                % (filename, member.name, e))
+            return
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        destfp = open(path, 'wb')
+        try:
+            shutil.copyfileobj(fp, destfp)
+        finally:
+            destfp.close()
+        fp.close()
+        # member have any execute permissions for user/group/world?
+        if member.mode & 0o111:
+            # make dest file have execute for user/group/world
+            # no-op on windows per python docs
+            os.chmod(path, (0o777-current_umask() | 0o111))
+
+
+class _ChunkBuffer(object):
+    """
+    The bytes written to a TarStream and not read by its thread yet.
+    write() waits while more than ``max_size`` bytes are buffered.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._chunks = []
+        # Where reading continues in the first chunk
+        self._pos = 0
+        self._size = 0
+        # No more bytes are written, or wanted by the reader
+        self._closed = self._stopped = False
+        self._condition = threading.Condition()
+
+    def write(self, data):
+        self._condition.acquire()
+        try:
+            while self._size > self.max_size and not self._stopped:
+                self._condition.wait()
+            if not self._stopped:
+                self._chunks.append(data)
+                self._size += len(data)
+                self._condition.notify_all()
+        finally:
+            self._condition.release()
+
+    def read(self, size=-1):
+        parts = []
+        self._condition.acquire()
+        try:
+            while size != 0:
+                if not self._chunks:
+                    if self._closed:
+                        break
+                    self._condition.wait()
+                    continue
+                chunk = self._chunks[0]
+                end = len(chunk)
+                if size > 0:
+                    end = min(end, self._pos + size)
+                    size -= end - self._pos
+                parts.append(chunk[self._pos:end])
+                if end < len(chunk):
+                    self._pos = end
+                else:
+                    self._chunks.pop(0)
+                    self._size -= len(chunk)
+                    self._pos = 0
+                    self._condition.notify_all()
+        finally:
+            self._condition.release()
+        return b('').join(parts)
+
+    def close(self):
+        """The end of the data: read() returns what's left, then nothing"""
+        self._condition.acquire()
+        try:
+            self._closed = True
+            self._condition.notify_all()
+        finally:
+            self._condition.release()
+
+    def stop(self):
+        """Drop what is buffered and ignore what is written from now on"""
+        self._condition.acquire()
+        try:
+            self._chunks = []
+            self._size = 0
+            self._closed = self._stopped = True
+            self._condition.notify_all()
+        finally:
+            self._condition.release()
+
+
+class TarStream(object):
+    """
+    Unpacks the tar archive ``filename`` to ``location`` in a thread while
+    its bytes are written to it, e.g. as it downloads.  The members go to a
+    staging directory next to location first: finish() moves them into
+    place, discard() throws them away, e.g. when the hash of the download
+    turns out wrong.
+    """
+
+    #: Bytes written but not unpacked yet, beyond which write() waits
+    max_buffered = 16 * 1024 * 1024
+
+    def __init__(self, filename, location):
+        self.filename = filename
+        self.location = location
+        self.error = None
+        parent = os.path.dirname(os.path.abspath(location))
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        self._staging = tempfile.mkdtemp('-unpack', '.pip-', parent)
+        self._names = []
+        self._buffer = _ChunkBuffer(self.max_buffered)
+        self._thread = threading.Thread(target=self._unpack)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, data):
+        self._buffer.write(data)
+
+    def _unpack(self):
+        try:
+            tar = tarfile.open(fileobj=self._buffer, mode='r|*')
+            try:
+                for member in tar:
+                    if member.name == 'pax_global_header':
+                        continue
+                    name = member.name.lstrip('/').lstrip('\\')
+                    path = os.path.normpath(os.path.join(self._staging, name))
+                    if (path != self._staging and
+                            not path.startswith(self._staging + os.path.sep)):
+                        raise InstallationError(
+                            'The tar file %s has a member outside of it: %s'
+                            % (self.filename, member.name))
+                    self._names.append(name)
+                    _untar_member(tar, member, path, self.filename)
+            finally:
+                tar.close()
+        except:
+            self.error = sys.exc_info()[1]
+        # The archive ended (or couldn't be read): the rest isn't needed
+        self._buffer.stop()
+
+    def finish(self):
+        """
+        Wait until the archive is unpacked and move it to location.  Returns
+        False if it couldn't be unpacked as it was written, in which case
+        the caller unpacks the complete file instead.
+        """
+        self._buffer.close()
+        self._thread.join()
+        try:
+            if self.error is not None:
+                logger.debug('Could not unpack %s while downloading it: %s',
+                             self.filename, self.error)
+                return False
+            source = self._staging
+            if self._names and has_leading_dir(self._names):
+                leading = os.path.join(
+                    source, split_leading_dir(self._names[0])[0])
+                if os.path.isdir(leading):
+                    source = leading
+            names = os.listdir(source)
+            for name in names:
+                if os.path.exists(os.path.join(self.location, name)):
+                    # Leave merging into existing files to untar_file()
+                    return False
+            if not os.path.exists(self.location):
+                os.makedirs(self.location)
+            for name in names:
+                os.rename(os.path.join(source, name),
+                          os.path.join(self.location, name))
+            return True
+        finally:
+            rmtree(self._staging)
+
+    def discard(self):
+        """Stop unpacking, and throw away what was unpacked"""
+        self._buffer.stop()
+        self._thread.join()
+        rmtree(self._staging)
+
+
+def start_untar(filename, location):
+    """
+    Return a TarStream unpacking the archive ``filename`` to ``location``
+    as it's written, or None if the name isn't that of a tar archive (or
+    there are no threads to unpack it in).
+    """
+    if not _have_threads:
+        return None
+    if splitext(filename)[1].lower() not in ('.tar', '.tar.gz', '.tar.bz2',
+                                              '.tgz', '.tbz'):
+        return None
+    return TarStream(filename, location)
+
+
 def create_download_cache_folder(folder):
     logger.indent -= 2
     logger.notify('Creating supposed download cache at %s' % folder)
@@ -602,14 +887,6 @@ def create_download_cache_folder(folder):
     os.makedirs(folder)
 
 
-def cache_download(target_file, temp_location, content_type):
-    logger.notify('Storing download in cache at %s' % display_path(target_file))
-    shutil.copyfile(temp_location, target_file)
-    fp = open(target_file+'.content-type', 'w')
-    fp.write(content_type)
-    fp.close()
-
-
 def unpack_file(filename, location, content_type, link):
     filename = os.path.realpath(filename)
     if (content_type == 'application/zip'
@@ -702,6 +979,74 @@ def call_subprocess(cmd, show_stdout=True,
         return ''.join(all_output)
 
 
+class LRUCache(object):
+    """A mapping of at most ``maxsize`` items that forgets the least
+    recently used ones first.  It is safe to share between threads."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        self._lock.acquire()
+        try:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+        finally:
+            self._lock.release()
+
+    def __setitem__(self, key, value):
+        self._lock.acquire()
+        try:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._data.clear()
+        finally:
+            self._lock.release()
+
+
+def memoize(maxsize=1024):
+    """Decorator remembering the results of a function of hashable
+    positional arguments in an LRUCache (available as ``.cache``)"""
+    def decorator(func):
+        cache = LRUCache(maxsize)
+        missing = object()
+
+        def wrapper(*args):
+            result = cache.get(args, missing)
+            if result is missing:
+                result = func(*args)
+                cache[args] = result
+            return result
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+# The same versions are parsed over and over while looking at the links of
+#   the index pages, so both of these are shared by the whole process
+parse_version = memoize(10000)(pkg_resources.parse_version)
+
+
+@memoize(10000)
 def is_prerelease(vers):
     """
     Attempt to determine if this is a pre-release using PEP386/PEP426 rules.
@@ -717,3 +1062,94 @@ def is_prerelease(vers):
 
     parsed = version.normalized_key(normalized)
     return any([any([y in set(["a", "b", "c", "rc", "dev"]) for y in x]) for x in parsed])
+
+
+class VersionSpecifier(object):
+    """
+    The version specifiers of a pkg_resources Requirement, compiled once
+    into comparisons against (memoized) parsed versions, so that
+    ``version in VersionSpecifier(req)`` means ``version in req`` without
+    parsing anything again.
+    """
+
+    # The state machine of pkg_resources (before it used packaging): the
+    #   action for a version equal to, greater than and lower than the
+    #   specified one (indexed by the comparison: 0, 1, -1).  T/F decide the
+    #   match, + and - tentatively match or not, . leaves it undecided.
+    _transitions = {
+        '<': '--T',
+        '<=': 'T-T',
+        '>': 'F+F',
+        '>=': 'T+F',
+        '==': 'T..',
+        '!=': 'F++',
+    }
+
+    def __init__(self, req):
+        self.req = req
+        self._results = {}
+        specifier = getattr(req, 'specifier', None)
+        if specifier is not None:
+            # packaging's specifiers accept parsed versions as they are
+            self._specifiers = list(specifier)
+            self._match = self._match_specifiers
+        else:
+            index = [(parse_version(v), self._transitions[op])
+                     for op, v in req.specs]
+            index.sort()
+            self._index = index
+            self._match = self._match_index
+
+    def __contains__(self, version):
+        result = self._results.get(version)
+        if result is None:
+            result = self._results[version] = self._match(version)
+        return result
+
+    def upper_bound(self):
+        """
+        The highest version the specifiers allow, if they put one with
+        ``==`` or ``<=``, or None.  The bound is only trusted when no ``>``,
+        ``>=``, ``!=`` or ``~=`` specifier from it on could let a higher
+        version match again (the old pkg_resources semantics would).
+        """
+        bound = None
+        for op, version in self.req.specs:
+            if op in ('==', '===', '<='):
+                if '*' in version:
+                    return None
+                if bound is None or parse_version(version) > parse_version(bound):
+                    bound = version
+        if bound is None:
+            return None
+        for op, version in self.req.specs:
+            if (op in ('>', '>=', '!=', '~=')
+                    and parse_version(version) >= parse_version(bound)):
+                return None
+        if bound not in self:
+            return None
+        return bound
+
+    def _match_specifiers(self, version):
+        parsed = parse_version(version)
+        for specifier in self._specifiers:
+            if not specifier.contains(parsed, prereleases=True):
+                return False
+        return True
+
+    def _match_index(self, version):
+        parsed = parse_version(version)
+        last = None
+        for spec_version, transitions in self._index:
+            action = transitions[(parsed > spec_version) - (parsed < spec_version)]
+            if action == 'F':
+                return False
+            elif action == 'T':
+                return True
+            elif action == '+':
+                last = True
+            elif action == '-' or last is None:
+                last = False
+        if last is None:
+            last = True
+        return last
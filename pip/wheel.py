@@ -265,14 +265,19 @@ class Wheel(object):
         """
         if tags is None: # for mock
             tags = pep425tags.supported_tags
-        indexes = [tags.index(c) for c in self.file_tags if c in tags]
+        priorities = pep425tags.get_priorities(tags)
+        indexes = [priorities[c] for c in self.file_tags if c in priorities]
         return min(indexes) if indexes else None
 
     def supported(self, tags=None):
         """Is this wheel supported on this system?"""
         if tags is None: # for mock
             tags = pep425tags.supported_tags
-        return bool(set(tags).intersection(self.file_tags))
+        priorities = pep425tags.get_priorities(tags)
+        for tag in self.file_tags:
+            if tag in priorities:
+                return True
+        return False
 
 
 class WheelBuilder(object):
@@ -0,0 +1,439 @@
+import hashlib
+import os
+import time
+from shutil import rmtree
+from tempfile import mkdtemp
+
+import pytest
+
+from mock import Mock, patch
+from pip.backwardcompat import HTTPError, URLError, b, urllib
+from pip.cache import (DiskCache, DownloadStore, FailureStore, PageStore,
+                       ResolutionStore)
+from pip.exceptions import DistributionNotFound
+from pip.index import HTMLPage, Link, PackageFinder, PageCache
+from pip.req import InstallRequirement
+from tests.lib import path_to_url, tests_data
+
+
+class TestDiskCache(object):
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.cache = DiskCache(os.path.join(self.tempdir, 'records'))
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def test_roundtrip(self):
+        self.cache.set('http://a.example.com/', {'level': 2})
+        assert self.cache.get('http://a.example.com/') == {'level': 2}
+        assert self.cache.get('http://b.example.com/') is None
+
+    def test_items_and_delete(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        assert sorted(self.cache.items()) == [('a', 1), ('b', 2)]
+        self.cache.delete('a')
+        assert list(self.cache.items()) == [('b', 2)]
+        self.cache.clear()
+        assert list(self.cache.items()) == []
+
+    def test_corrupt_record_is_missing(self):
+        self.cache.set('a', 1)
+        fp = open(self.cache._path('a'), 'w')
+        fp.write('{not json')
+        fp.close()
+        assert self.cache.get('a') is None
+
+
+class TestPageStore(object):
+
+    url = 'https://pypi.example.com/simple/foo/'
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def test_store_and_revalidation_headers(self):
+        store = PageStore(self.tempdir)
+        store.store(self.url, self.url + 'index.html',
+                    {'ETag': '"abc"', 'Last-Modified': 'yesterday'},
+                    b('<html></html>'))
+        record = store.get(self.url)
+        assert record['content'] == b('<html></html>')
+        assert record['real_url'] == self.url + 'index.html'
+        assert not store.is_fresh(record)
+        assert store.conditional_headers(record) == {
+            'If-None-Match': '"abc"', 'If-Modified-Since': 'yesterday'}
+
+    def test_pages_without_validators_are_not_stored(self):
+        store = PageStore(self.tempdir)
+        store.store(self.url, self.url, {}, b('<html></html>'))
+        assert store.get(self.url) is None
+
+    def test_max_age(self):
+        store = PageStore(self.tempdir, max_age=60)
+        store.store(self.url, self.url, {}, b('<html></html>'))
+        record = store.get(self.url)
+        assert store.is_fresh(record)
+        record['stored'] = time.time() - 61
+        assert not store.is_fresh(record)
+
+    def test_lru_eviction(self):
+        store = PageStore(self.tempdir, max_size=250)
+        headers = {'ETag': '"x"'}
+        for i in range(3):
+            url = self.url + str(i)
+            store.store(url, url, headers, b('x') * 100)
+            # make the first page the most recently used one
+            store.get(self.url + '0')
+        assert store.get(self.url + '0') is not None
+        assert store.get(self.url + '1') is None
+        assert store.get(self.url + '2') is not None
+
+
+class TestConditionalGet(object):
+
+    url = 'https://pypi.example.com/simple/foo/'
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.store = PageStore(self.tempdir)
+        self.store.store(self.url, self.url, {'ETag': '"abc"'},
+                         b('<a href="foo-1.0.tar.gz">foo-1.0.tar.gz</a>'))
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    @patch('pip.index.urlopen')
+    def test_not_modified_uses_stored_page(self, mock_urlopen):
+        mock_urlopen.side_effect = HTTPError(self.url, 304, 'Not Modified',
+                                             {}, None)
+        page = HTMLPage.get_page(Link(self.url), None,
+                                 cache=PageCache(store=self.store))
+        request = mock_urlopen.call_args[0][0]
+        assert request.get_header('If-none-match') == '"abc"'
+        assert [link.filename for link in page.links] == ['foo-1.0.tar.gz']
+
+    @patch('pip.index.urlopen')
+    def test_fresh_page_is_not_revalidated(self, mock_urlopen):
+        self.store.max_age = 60
+        page = HTMLPage.get_page(Link(self.url), None,
+                                 cache=PageCache(store=self.store))
+        assert not mock_urlopen.called
+        assert page.url == self.url
+
+
+class TestFailureStore(object):
+
+    url = 'http://dead.example.com/'
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.store = FailureStore(self.tempdir, ttl=60)
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def test_failures_accumulate(self):
+        self.store.add_failure(self.url, 1, 'timed out')
+        record = self.store.add_failure(self.url, 2, 'refused')
+        assert record['level'] == 3
+        assert self.store.get(self.url)['reason'] == 'refused'
+
+    def test_expired_failures_are_forgotten(self):
+        record = self.store.add_failure(self.url, 2)
+        record['failed'] = time.time() - 61
+        self.store.set(self.url, record)
+        assert self.store.get(self.url) is None
+        assert list(self.store.items()) == []
+        assert self.store.add_failure(self.url, 1)['level'] == 1
+
+    @patch('pip.index.urlopen')
+    def test_later_runs_skip_dead_urls(self, mock_urlopen):
+        mock_urlopen.side_effect = URLError('Connection refused')
+        HTMLPage.get_page(Link(self.url), None,
+                          cache=PageCache(failures=self.store))
+        assert mock_urlopen.call_count == 1
+
+        # A new run doesn't even try
+        cache = PageCache(failures=self.store)
+        assert HTMLPage.get_page(Link(self.url), None, cache=cache) is None
+        assert mock_urlopen.call_count == 1
+
+    @patch('pip.index.urlopen')
+    def test_single_timeout_is_retried(self, mock_urlopen):
+        self.store.add_failure(self.url, 1, 'timed out')
+        mock_urlopen.side_effect = URLError('Connection refused')
+        HTMLPage.get_page(Link(self.url), None,
+                          cache=PageCache(failures=self.store))
+        assert mock_urlopen.call_count == 1
+        assert self.store.get(self.url)['level'] == 3
+
+    @patch('pip.index.urlopen')
+    def test_missing_pages_are_not_remembered(self, mock_urlopen):
+        mock_urlopen.side_effect = HTTPError(self.url, 404, 'Not Found', {},
+                                             None)
+        cache = PageCache(failures=self.store)
+        HTMLPage.get_page(Link(self.url), None, cache=cache)
+        assert self.store.get(self.url) is None
+
+    @patch('pip.index.urlopen')
+    def test_failures_of_indexes_are_not_remembered(self, mock_urlopen):
+        mock_urlopen.side_effect = URLError('Connection refused')
+        url = self.url + 'simple/project/'
+        cache = PageCache(failures=self.store,
+                          unstored_failures=[self.url + 'simple'])
+        HTMLPage.get_page(Link(url), None, cache=cache)
+        assert self.store.get(url) is None
+        # Nor skipped if an earlier version did
+        self.store.add_failure(url, 2)
+        cache = PageCache(failures=self.store,
+                          unstored_failures=[self.url + 'simple'])
+        assert not cache.too_many_failures(url)
+
+    def test_successful_fetch_forgets_failure(self):
+        self.store.add_failure(self.url, 1, 'timed out')
+        cache = PageCache(failures=self.store)
+        assert not cache.too_many_failures(self.url)
+        cache.add_page([self.url], HTMLPage('', self.url))
+        assert self.store.get(self.url) is None
+
+
+class TestArchiveKnowledge(object):
+
+    url = 'http://example.com/foo-1.0.tar.gz'
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.archives = DiskCache(self.tempdir)
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    @patch('pip.index.urlopen')
+    @patch('pip.index.HTMLPage._get_content_type')
+    def test_known_archive_is_not_probed_again(self, mock_content_type,
+                                               mock_urlopen):
+        mock_content_type.return_value = 'application/x-gzip'
+        assert HTMLPage.get_page(Link(self.url), None,
+                                 cache=PageCache(archives=self.archives)) is None
+        assert mock_content_type.call_count == 1
+
+        cache = PageCache(archives=self.archives)
+        assert HTMLPage.get_page(Link(self.url), None, cache=cache) is None
+        assert mock_content_type.call_count == 1
+        assert not mock_urlopen.called
+
+    @patch('pip.index.urlopen')
+    @patch('pip.index.HTMLPage._get_content_type')
+    def test_without_head_probes_get_is_aborted(self, mock_content_type,
+                                                mock_urlopen):
+        response = mock_urlopen.return_value
+        response.geturl.return_value = self.url
+        response.info.return_value = {'Content-Type': 'application/x-gzip'}
+        cache = PageCache(archives=self.archives)
+        assert HTMLPage.get_page(Link(self.url), None, cache=cache,
+                                 head_probes=False) is None
+        assert not mock_content_type.called
+        assert not response.read.called
+        assert response.close.called
+        assert self.archives.get(self.url) is True
+
+
+class TestResolutionStore(object):
+
+    index_url = path_to_url(os.path.join(tests_data, 'indexes', 'simple'))
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def finder(self, ttl=60):
+        return PackageFinder([], [self.index_url], cache_dir=self.tempdir,
+                             resolution_ttl=ttl)
+
+    def test_expired_records_are_missing(self):
+        store = ResolutionStore(self.tempdir, ttl=60)
+        store.store('key', [['1.0', 'http://example.com/a-1.0.tar.gz',
+                             None, True]])
+        assert store.get('key')[0][0] == '1.0'
+        store.set('key', dict(super(ResolutionStore, store).get('key'),
+                              stored=time.time() - 61))
+        assert store.get('key') is None
+
+    def test_later_runs_reuse_versions(self):
+        req = InstallRequirement.from_line('simple', None)
+        assert self.finder().find_requirement(req, False).filename == \
+            'simple-1.0.tar.gz'
+
+        finder = self.finder()
+        with patch.object(finder, '_get_page') as mock_get_page:
+            link = finder.find_requirement(req, False)
+            # Other specifiers of the project are answered too
+            with pytest.raises(DistributionNotFound):
+                finder.find_requirement(
+                    InstallRequirement.from_line('simple>1.0', None), False)
+            assert not mock_get_page.called
+        assert link.filename == 'simple-1.0.tar.gz'
+        assert link.hash_name == 'md5'
+
+    def test_local_answers_are_not_stored(self):
+        find_links = os.path.join(tests_data, 'packages')
+
+        def finder(prefer_local):
+            return PackageFinder([find_links], [self.index_url],
+                                 cache_dir=self.tempdir, resolution_ttl=60,
+                                 prefer_local=prefer_local)
+        link = finder(True).find_requirement(
+            InstallRequirement.from_line('simple==1.0', None), False)
+        assert link.url.startswith(path_to_url(find_links))
+
+        # A later run without --prefer-local searches the index again
+        finder = finder(False)
+        with patch.object(finder, '_get_page',
+                          wraps=finder._get_page) as mock_get_page:
+            finder.find_requirement(
+                InstallRequirement.from_line('simple', None), False)
+            assert mock_get_page.called
+
+    def test_hedging_is_part_of_the_key(self):
+        req = InstallRequirement.from_line('simple', None)
+        finder = self.finder()
+        key = finder._resolution_key(req)
+        finder.hedge = True
+        assert finder._resolution_key(req) != key
+
+    def test_without_ttl_nothing_is_stored(self):
+        finder = self.finder(ttl=0)
+        assert finder.resolutions is None
+        finder.find_requirement(InstallRequirement.from_line('simple', None),
+                                False)
+        assert not os.path.exists(os.path.join(self.tempdir, 'resolutions'))
+
+
+class TestDownloadStore(object):
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.store = DownloadStore(os.path.join(self.tempdir, 'downloads'))
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tempdir, name)
+        fp = open(path, 'wb')
+        fp.write(b(content))
+        fp.close()
+        return path
+
+    def test_identical_files_are_stored_once(self):
+        first = self.store.store('http://a.example.com/simple-1.0.tar.gz',
+                                 self.write('a', 'content'),
+                                 'application/x-gzip',
+                                 name='simple-1.0.tar.gz')
+        second = self.store.store('http://b.example.com/simple-1.0.tar.gz',
+                                  self.write('b', 'content'),
+                                  'application/x-gzip',
+                                  name='simple-1.0.tar.gz')
+        assert first == second == hashlib.sha256(b('content')).hexdigest()
+        (digest, record, last_used), = self.store.items()
+        assert record['names'] == ['simple-1.0.tar.gz']
+        assert record['urls'] == ['http://a.example.com/simple-1.0.tar.gz',
+                                  'http://b.example.com/simple-1.0.tar.gz']
+        assert self.store.lookup(
+            'http://b.example.com/simple-1.0.tar.gz')[0] == digest
+        fp = open(self.store.path(digest), 'rb')
+        try:
+            assert fp.read() == b('content')
+        finally:
+            fp.close()
+
+    def test_lookup_by_advertised_hash(self):
+        digest = self.store.store('http://a.example.com/simple-1.0.tar.gz',
+                                  self.write('a', 'content'), 'application/x-gzip')
+        url = 'http://mirror.example.com/simple-1.0.tar.gz'
+        md5 = hashlib.md5(b('content')).hexdigest()
+        assert self.store.lookup(url, 'md5', md5)[0] == digest
+        assert self.store.lookup(url, 'sha256', digest)[0] == digest
+        assert self.store.lookup(url, 'md5', '0' * 32) is None
+        assert self.store.lookup(url) is None
+
+    def test_least_recently_used_are_evicted(self):
+        self.store.max_size = 250
+        digests = []
+        for i in range(2):
+            digests.append(self.store.store(
+                'http://a.example.com/%s' % i,
+                self.write(str(i), str(i) * 100), 'application/x-gzip'))
+            os.utime(self.store.path(digests[-1]), (1000 * i, 1000 * i))
+        # Using the oldest file makes the second one the least recently used
+        assert self.store.lookup('http://a.example.com/0') is not None
+        self.store.store('http://a.example.com/2', self.write('2', '2' * 100),
+                         'application/x-gzip')
+        assert self.store.lookup('http://a.example.com/0') is not None
+        assert self.store.lookup('http://a.example.com/1') is None
+        assert self.store.lookup('http://a.example.com/2') is not None
+        assert self.store.size() == 200
+
+    def test_remove(self):
+        digest = self.store.store('http://a.example.com/simple-1.0.tar.gz',
+                                  self.write('a', 'content'), 'application/x-gzip')
+        self.store.remove(digest)
+        md5 = hashlib.md5(b('content')).hexdigest()
+        assert self.store.lookup('http://a.example.com/simple-1.0.tar.gz',
+                                 'md5', md5) is None
+        assert list(self.store.urls.items()) == []
+        assert list(self.store.hashes.items()) == []
+        assert not os.path.exists(self.store.path(digest))
+
+    def test_prune_drops_records_of_missing_files(self):
+        digest = self.store.store('http://a.example.com/simple-1.0.tar.gz',
+                                  self.write('a', 'content'), 'application/x-gzip')
+        os.remove(self.store.path(digest))
+        assert self.store.prune() == (0, 0)
+        assert list(self.store.entries.items()) == []
+        assert list(self.store.urls.items()) == []
+
+    def test_temp_files_are_moved_into_place(self):
+        url = 'http://a.example.com/simple-1.0.tar.gz'
+        path = self.store.temp_path()
+        fp = open(path, 'wb')
+        fp.write(b('content'))
+        fp.close()
+        digest = self.store.store(url, path, 'application/x-gzip', move=True)
+        assert not os.path.exists(path)
+        assert self.store.lookup(url)[0] == digest
+        # A second copy is dropped
+        path = self.store.temp_path()
+        self.write(path, 'content')
+        assert self.store.store(url, path, 'application/x-gzip',
+                                move=True) == digest
+        assert not os.path.exists(path)
+
+    def test_prune_keeps_temp_files_in_use(self):
+        current = self.store.temp_path()
+        stale = self.store.temp_path()
+        old = time.time() - self.store.stale_temp_age - 60
+        os.utime(stale, (old, old))
+        self.store.prune()
+        assert os.path.exists(current)
+        assert not os.path.exists(stale)
+
+    def test_files_of_earlier_versions_are_imported(self):
+        url = 'http://a.example.com/simple-1.0.tar.gz'
+        os.makedirs(self.store.directory)
+        legacy = os.path.join(self.store.directory, urllib.quote(url, ''))
+        self.write(legacy, 'content')
+        self.write(legacy + '.content-type', 'application/x-gzip')
+        digest, record = self.store.lookup(url)
+        assert record['content_type'] == 'application/x-gzip'
+        assert record['names'] == ['simple-1.0.tar.gz']
+        assert not os.path.exists(legacy)
+        assert not os.path.exists(legacy + '.content-type')
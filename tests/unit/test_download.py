@@ -3,11 +3,22 @@ import os
 from shutil import rmtree
 from tempfile import mkdtemp
 
+import pytest
+
 from mock import patch
 import pip
-from pip.backwardcompat import urllib, BytesIO, b
+import threading
+from pip.backwardcompat import urllib, urllib2, BytesIO, b
+from pip.cache import DownloadStore
+from pip.exceptions import HashMismatch
 from pip.download import (_get_response_from_url as _get_response_from_url_original,
                           path_to_url2, unpack_http_url, URLOpener)
+from pip.util import start_untar, untar_file
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 from pip.index import Link
 from tests.lib import tests_data
 
@@ -77,7 +88,9 @@ def test_unpack_http_url_bad_cache_checksum(mock_get_response, mock_unpack_file)
         # despite existence of cached file with bad hash, downloaded again
         mock_get_response.assert_called_once_with(base_url, link)
         # cached file is replaced with newly downloaded file
-        with open(cache_file) as fh:
+        assert not os.path.exists(cache_file)
+        digest, record = DownloadStore(cache_dir).lookup(base_url)
+        with open(DownloadStore(cache_dir).path(digest)) as fh:
             assert fh.read() == 'downloaded'
 
     finally:
@@ -113,3 +126,386 @@ def test_unpack_http_url_bad_downloaded_checksum(mock_get_response, mock_unpack_
 
     finally:
         rmtree(download_dir)
+
+
+@patch('pip.download.unpack_file')
+@patch('pip.download._get_response_from_url')
+def test_unpack_http_url_links_download_dir_to_cache(mock_get_response,
+                                                     mock_unpack_file):
+    """
+    The download is moved into the cache, and the file in the download dir
+    is a link to it rather than a copy.
+    """
+    base_url = 'http://www.example.com/somepackage.tgz'
+    response = mock_get_response.return_value = MockResponse(b('downloaded'))
+    response.info = lambda: {'content-type': 'application/x-tar'}
+    response.geturl = lambda: base_url
+
+    cache_dir = mkdtemp()
+    download_dir = mkdtemp()
+    try:
+        unpack_http_url(Link(base_url), 'location', download_cache=cache_dir,
+                        download_dir=download_dir)
+
+        store = DownloadStore(cache_dir)
+        digest, record = store.lookup(base_url)
+        downloaded_file = os.path.join(download_dir, 'somepackage.tgz')
+        assert os.path.samefile(downloaded_file, store.path(digest))
+        # Unpacked from a file with the name of the download
+        assert mock_unpack_file.call_args[0][0].endswith('somepackage.tgz')
+        # No temporary files are left behind
+        for dirpath, dirnames, filenames in os.walk(cache_dir):
+            assert not [f for f in filenames if f.startswith('.tmp-')]
+    finally:
+        rmtree(cache_dir)
+        rmtree(download_dir)
+
+
+@patch('pip.download.unpack_file')
+@patch('pip.download._get_response_from_url')
+def test_unpack_http_url_bad_checksum_is_not_cached(mock_get_response,
+                                                    mock_unpack_file):
+    base_url = 'http://www.example.com/somepackage.tgz'
+    link = Link(base_url + '#sha1=' +
+                hashlib.new('sha1', b('expected')).hexdigest())
+    response = mock_get_response.return_value = MockResponse(b('downloaded'))
+    response.info = lambda: {'content-type': 'application/x-tar'}
+    response.geturl = lambda: base_url
+
+    cache_dir = mkdtemp()
+    try:
+        with pytest.raises(HashMismatch):
+            unpack_http_url(link, 'location', download_cache=cache_dir)
+        assert DownloadStore(cache_dir).lookup(base_url) is None
+        for dirpath, dirnames, filenames in os.walk(cache_dir):
+            assert not [f for f in filenames if f.startswith('.tmp-')]
+    finally:
+        rmtree(cache_dir)
+
+
+class ChunkedMockResponse(MockResponse):
+    def __init__(self, contents):
+        super(ChunkedMockResponse, self).__init__(contents)
+        self.sizes = []
+
+    def read(self, amt=None):
+        self.sizes.append(amt)
+        return super(ChunkedMockResponse, self).read(amt)
+
+    def info(self):
+        return {'content-length': str(len(self._io.getvalue()))}
+
+
+def test_download_reads_grow_with_fast_responses():
+    from pip.download import (_download_url, DOWNLOAD_CHUNK_MIN,
+                              DOWNLOAD_CHUNK_MAX)
+    contents = b('x') * (20 * 1000 * 1000)
+    response = ChunkedMockResponse(contents)
+    link = Link('http://www.example.com/somepackage.tgz#md5=' +
+                hashlib.md5(contents).hexdigest())
+    temp_dir = mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'somepackage.tgz')
+        download_hash = _download_url(response, link, path)
+        assert download_hash.hexdigest() == link.hash
+        assert os.path.getsize(path) == len(contents)
+    finally:
+        rmtree(temp_dir)
+    assert response.sizes[0] == DOWNLOAD_CHUNK_MIN
+    assert max(response.sizes) == DOWNLOAD_CHUNK_MAX
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    body = b('x') * 100
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def do_HEAD(self):
+        self.server.connections.add(self.client_address)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestConnectionPool(object):
+
+    def setup(self):
+        self.server = HTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        self.server.connections = set()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:%s/' % self.server.server_port
+        self.opener = URLOpener()
+
+    def teardown(self):
+        self.opener.pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_reused(self):
+        for i in range(3):
+            response = self.opener(self.url)
+            assert response.read() == KeepAliveHandler.body
+        assert len(self.server.connections) == 1
+
+    def test_head_request_reuses_connection(self):
+        from pip.download import Urllib2HeadRequest
+        response = self.opener(Urllib2HeadRequest(self.url))
+        assert response.info().get('content-type') == 'text/html'
+        response.close()
+        assert self.opener(self.url).read() == KeepAliveHandler.body
+        assert len(self.server.connections) == 1
+
+    def test_partially_read_connection_is_dropped(self):
+        response = self.opener(self.url)
+        response.read(10)
+        response.close()
+        assert self.opener(self.url).read() == KeepAliveHandler.body
+        assert len(self.server.connections) == 2
+
+    def test_expired_connection_is_not_reused(self):
+        self.opener.pool.idle_timeout = 0
+        self.opener(self.url).read()
+        self.opener(self.url).read()
+        assert len(self.server.connections) == 2
+
+
+class AuthHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 'user:pass'
+    credentials = 'Basic dXNlcjpwYXNz'
+
+    def do_GET(self):
+        if self.headers.get('Authorization') != self.credentials:
+            self.send_response(401)
+            self.send_header('WWW-Authenticate', 'Basic realm="index"')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.server.headers.append(self.headers)
+        if self.headers.get('If-None-Match') == '"1"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b('ok'))
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAuthenticatedRequests(object):
+
+    def setup(self):
+        self.server = HTTPServer(('127.0.0.1', 0), AuthHandler)
+        self.server.headers = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.netloc = '127.0.0.1:%s' % self.server.server_port
+        self.opener = URLOpener()
+        self.opener.setup(prompting=False)
+
+    def teardown(self):
+        self.opener.pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, url):
+        return urllib2.Request(url, headers={'If-None-Match': '"1"'})
+
+    def test_request_retried_after_401_keeps_headers(self):
+        self.opener.passman.add_password(None, self.netloc, 'user', 'pass')
+        with pytest.raises(urllib2.HTTPError) as excinfo:
+            self.opener(self.request('http://%s/simple/' % self.netloc))
+        assert excinfo.value.code == 304
+        headers, = self.server.headers
+        assert headers.get('If-None-Match') == '"1"'
+
+    def test_request_with_credentials_keeps_headers(self):
+        with pytest.raises(urllib2.HTTPError) as excinfo:
+            self.opener(self.request('http://user:pass@%s/simple/'
+                                     % self.netloc))
+        assert excinfo.value.code == 304
+        headers, = self.server.headers
+        assert headers.get('If-None-Match') == '"1"'
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    body = b('a') * 30000 + b('b') * 30000
+
+    def do_GET(self):
+        server = self.server
+        requested = self.headers.get('Range')
+        server.ranges.append(requested)
+        start = 0
+        if requested and self.headers.get('If-Range') == server.etag:
+            start = int(requested[len('bytes='):-len('-')])
+        if start:
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %s-%s/%s' % (
+                start, len(self.body) - 1, len(self.body)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/x-gzip')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', server.etag)
+        self.send_header('Content-Length', str(len(self.body) - start))
+        self.end_headers()
+        data = self.body[start:]
+        if server.truncate:
+            # The connection breaks halfway
+            server.truncate = False
+            data = data[:len(data) // 2]
+            self.close_connection = 1
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestResumedDownloads(object):
+
+    def setup(self):
+        self.server = HTTPServer(('127.0.0.1', 0), RangeHandler)
+        self.server.ranges = []
+        self.server.etag = '"1"'
+        self.server.truncate = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:%s/simple-1.0.tar.gz' % (
+            self.server.server_port)
+        self.link = Link(self.url + '#md5=' +
+                         hashlib.md5(RangeHandler.body).hexdigest())
+        self.cache_dir = mkdtemp()
+
+    def teardown(self):
+        pip.download.urlopen.pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+        rmtree(self.cache_dir)
+
+    def cached_content(self):
+        store = DownloadStore(self.cache_dir)
+        assert store.partial(self.url) is None
+        digest, record = store.lookup(self.url)
+        with open(store.path(digest), 'rb') as fh:
+            return fh.read()
+
+    @patch('pip.download.unpack_file')
+    def test_interrupted_download_is_resumed(self, mock_unpack_file):
+        with pytest.raises(IOError):
+            unpack_http_url(self.link, 'location', self.cache_dir)
+        unpack_http_url(self.link, 'location', self.cache_dir)
+        assert self.server.ranges == [None, 'bytes=30000-']
+        # The md5 of the link covers both parts
+        assert self.cached_content() == RangeHandler.body
+
+    @patch('pip.download.unpack_file')
+    def test_changed_file_is_downloaded_again(self, mock_unpack_file):
+        with pytest.raises(IOError):
+            unpack_http_url(self.link, 'location', self.cache_dir)
+        self.server.etag = '"2"'
+        unpack_http_url(self.link, 'location', self.cache_dir)
+        assert self.server.ranges == [None, 'bytes=30000-']
+        assert self.cached_content() == RangeHandler.body
+
+    @patch('pip.download.unpack_file')
+    def test_nothing_is_kept_without_download_cache(self, mock_unpack_file):
+        with pytest.raises(IOError):
+            unpack_http_url(self.link, 'location', None)
+        unpack_http_url(self.link, 'location', None)
+        assert self.server.ranges == [None, None]
+
+
+def _tree(location):
+    """The paths below location, with their modes"""
+    tree = {}
+    for dirpath, dirnames, filenames in os.walk(location):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            tree[os.path.relpath(path, location)] = os.lstat(path).st_mode
+    return tree
+
+
+class TestTarStream(object):
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.location = os.path.join(self.tempdir, 'location')
+        self.archive = os.path.join(tests_data, 'packages', 'simple-1.0.tar.gz')
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def stream(self, chunk_size):
+        stream = start_untar(self.archive, self.location)
+        with open(self.archive, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(chunk_size), b('')):
+                stream.write(chunk)
+        return stream
+
+    def test_unpacks_like_untar_file(self):
+        expected = os.path.join(self.tempdir, 'expected')
+        for archive in ('simple-1.0.tar.gz', 'test_tar.tgz'):
+            self.archive = os.path.join(tests_data, 'packages', archive)
+            untar_file(self.archive, expected)
+            assert self.stream(chunk_size=100).finish()
+            assert _tree(self.location) == _tree(expected)
+            rmtree(self.location)
+            rmtree(expected)
+        # Nothing is left of the staging directory
+        assert os.listdir(self.tempdir) == []
+
+    def test_discard(self):
+        self.stream(chunk_size=10).discard()
+        assert os.listdir(self.tempdir) == []
+
+    def test_other_archives_are_not_streamed(self):
+        assert start_untar('simple-1.0.zip', self.location) is None
+
+    def test_unreadable_archive_is_left_to_unpack_file(self):
+        stream = start_untar(self.archive, self.location)
+        stream.write(b('not a tar file') * 1000)
+        assert not stream.finish()
+        assert os.listdir(self.tempdir) == []
+
+
+@patch('pip.download.unpack_file')
+def test_unpack_http_url_unpacks_while_downloading(mock_unpack_file):
+    path = os.path.join(tests_data, 'packages', 'simple-1.0.tar.gz')
+    with open(path, 'rb') as fp:
+        md5 = hashlib.md5(fp.read()).hexdigest()
+    temp_dir = mkdtemp()
+    try:
+        location = os.path.join(temp_dir, 'location')
+        unpack_http_url(Link(path_to_url2(path) + '#md5=' + md5), location,
+                        download_cache=None)
+        assert not mock_unpack_file.called
+        assert set(os.listdir(location)) == set(
+            ['PKG-INFO', 'setup.cfg', 'setup.py', 'simple', 'simple.egg-info'])
+
+        # A download with the wrong hash leaves nothing unpacked
+        rmtree(location)
+        with pytest.raises(HashMismatch):
+            unpack_http_url(Link(path_to_url2(path) + '#md5=' + '0' * 32),
+                            location, download_cache=None)
+        assert os.listdir(temp_dir) == []
+    finally:
+        rmtree(temp_dir)
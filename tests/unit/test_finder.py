@@ -1,11 +1,15 @@
 import os
+import posixpath
+import shutil
+import tempfile
+import time
 
 import pytest
 
 from pkg_resources import parse_version, Distribution
 from pip.backwardcompat import urllib
 from pip.req import InstallRequirement
-from pip.index import PackageFinder, Link
+from pip.index import PackageFinder, Link, HTMLPage
 from pip.exceptions import BestVersionAlreadyInstalled, DistributionNotFound
 from pip.util import Inf
 from tests.lib.path import Path
@@ -447,3 +451,303 @@ def test_finder_finds_external_links_without_hashes_scraped_all_all_insecure():
             )
     link = finder.find_requirement(req, False)
     assert link.filename == "bar-4.0.tar.gz"
+
+
+def test_finder_find_requirements_prefetches_pages():
+    """
+    Test find_requirements fetches the index pages of all requirements
+    before looking any of them up.
+    """
+    index_url = path_to_url(os.path.join(tests_data, "indexes", "simple"))
+    finder = PackageFinder([], [index_url])
+    reqs = [InstallRequirement.from_line("simple", None),
+            InstallRequirement.from_line("simple==2.0", None)]
+    fetched = []
+    get_page = finder._get_page
+
+    def _get_page(link, req):
+        fetched.append(link.url)
+        return get_page(link, req)
+
+    with patch.object(finder, '_get_page', _get_page):
+        finder.prefetch(reqs)
+    # Both requirements share the same project page
+    assert fetched == [index_url + "/simple/"]
+
+    results = finder.find_requirements(reqs, False)
+    assert results[0].filename == "simple-1.0.tar.gz"
+    assert isinstance(results[1], DistributionNotFound)
+
+
+def test_finder_json_index():
+    """Finder reads the files of a project from a JSON index"""
+    index_url = 'json+' + path_to_url(os.path.join(tests_data, 'indexes', 'json'))
+    finder = PackageFinder([], [index_url])
+    with patch('pip.index.HTMLPage._extract') as mock_extract:
+        link = finder.find_requirement(InstallRequirement.from_line('simple', None), False)
+        assert not mock_extract.called
+    assert link.filename == 'simple-2.0.tar.gz'
+    assert link.hash_name == 'md5'
+
+    link = finder.find_requirement(InstallRequirement.from_line('simple<2.0', None), False)
+    assert link.filename == 'simple-1.0.tar.gz'
+    assert link.hash_name == 'sha256'
+
+
+def test_finder_json_index_missing_project():
+    index_url = 'json+' + path_to_url(os.path.join(tests_data, 'indexes', 'json'))
+    finder = PackageFinder([], [index_url])
+    with pytest.raises(DistributionNotFound):
+        finder.find_requirement(InstallRequirement.from_line('missing', None), False)
+
+
+class TestPreferLocal(object):
+
+    index_url = "http://pypi.python.org/simple"
+
+    def find(self, line, satisfied_by=None, upgrade=False):
+        finder = PackageFinder([find_links], [self.index_url],
+                               prefer_local=True)
+        req = InstallRequirement.from_line(line, None)
+        req.satisfied_by = satisfied_by
+        with patch.object(finder, '_get_page') as mock_get_page:
+            mock_get_page.return_value = None
+            found = finder.find_requirement(req, upgrade)
+        return found, mock_get_page.called
+
+    def test_pinned_file_found_locally(self):
+        found, fetched = self.find('simple==2.0')
+        assert found.filename == 'simple-2.0.tar.gz'
+        assert not fetched
+
+    def test_upper_bound_found_locally(self):
+        found, fetched = self.find('simple>1.0,<=3.0')
+        assert found.filename == 'simple-3.0.tar.gz'
+        assert not fetched
+
+    def test_pinned_version_installed(self):
+        satisfied_by = Mock(location="/path", version="2.0",
+                            parsed_version=parse_version("2.0"))
+        found, fetched = self.find('simple==2.0', satisfied_by)
+        assert found is None
+        assert not fetched
+
+    def test_indexes_searched_without_upper_bound(self):
+        found, fetched = self.find('simple>=2.0')
+        assert found.filename == 'simple-3.0.tar.gz'
+        assert fetched
+
+    def test_indexes_searched_when_pin_missing_locally(self):
+        with pytest.raises(DistributionNotFound):
+            self.find('simple==4.0')
+
+
+class TestHedge(object):
+
+    index_url = path_to_url(os.path.join(tests_data, "indexes", "simple"))
+    slow_url = "http://slow.example.com/simple"
+
+    def finder(self, index_urls, delay):
+        finder = PackageFinder([], index_urls, hedge=True)
+        finder.latency.default = delay
+        fetched = []
+        get_page = finder._get_page
+
+        def _get_page(link, req):
+            fetched.append(link.url)
+            if link.url.startswith(self.slow_url):
+                time.sleep(1)
+                return None
+            return get_page(link, req)
+
+        finder._get_page = _get_page
+        return finder, fetched
+
+    def test_slow_index_is_hedged(self):
+        finder, fetched = self.finder([self.slow_url, self.index_url], 0.05)
+        start = time.time()
+        link = finder.find_requirement(
+            InstallRequirement.from_line('simple', None), False)
+        assert time.time() - start < 1
+        assert link.filename == 'simple-1.0.tar.gz'
+        assert self.index_url + '/simple/' in fetched
+
+    def test_fast_index_is_not_hedged(self):
+        finder, fetched = self.finder([self.index_url, self.slow_url], 5)
+        link = finder.find_requirement(
+            InstallRequirement.from_line('simple', None), False)
+        assert link.filename == 'simple-1.0.tar.gz'
+        assert [url for url in fetched if url.startswith(self.slow_url)] == []
+
+
+class TestOrderedIndexes(object):
+
+    def index_url(self, name):
+        return path_to_url(os.path.join(tests_data, "indexes", name))
+
+    def finder(self, index_urls, **kwargs):
+        finder = PackageFinder([], index_urls, ordered_indexes=True, **kwargs)
+        fetched = []
+        get_page = finder._get_page
+
+        def _get_page(link, req):
+            fetched.append(link.url)
+            return get_page(link, req)
+
+        finder._get_page = _get_page
+        return finder, fetched
+
+    def test_first_index_with_project_wins(self):
+        pre, dev = self.index_url('pre'), self.index_url('dev')
+        finder, fetched = self.finder([pre, dev])
+        link = finder.find_requirement(
+            InstallRequirement.from_line('bar', None), False)
+        assert link.url.startswith(pre)
+        assert [url for url in fetched if url.startswith(dev)] == []
+
+    def test_next_index_is_searched(self):
+        """The first index only has versions the requirement excludes"""
+        pre, dev = self.index_url('pre'), self.index_url('dev')
+        finder, fetched = self.finder([dev, pre])
+        link = finder.find_requirement(
+            InstallRequirement.from_line('bar==2.0b1', None), False)
+        assert link.url == pre + '/bar/bar-2.0b1.tar.gz'
+
+    def test_missing_project_is_searched_on_next_index(self):
+        pre, simple = self.index_url('pre'), self.index_url('simple')
+        finder, fetched = self.finder([pre, simple])
+        link = finder.find_requirement(
+            InstallRequirement.from_line('simple', None), False)
+        assert link.filename == 'simple-1.0.tar.gz'
+
+    def test_prefetch_only_asks_first_index(self):
+        pre, dev = self.index_url('pre'), self.index_url('dev')
+        finder, fetched = self.finder([pre, dev])
+        finder.prefetch([InstallRequirement.from_line('bar', None)])
+        assert fetched == [pre + '/bar/']
+
+    def test_not_hedged(self):
+        pre, dev = self.index_url('pre'), self.index_url('dev')
+        finder, fetched = self.finder([pre, dev], hedge=True)
+        assert finder._mirror_urls('bar') == []
+
+
+class TestProjectNames(object):
+
+    index_url = "http://index.example.com/simple"
+    root = '<a href="Simple/">Simple</a><a href="other/">other</a>'
+
+    def setup(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def finder(self, pages):
+        """A finder whose index serves pages, a dict of url -> (content,
+        real url, headers); the urls it fetched are collected in
+        finder.fetched"""
+        finder = PackageFinder([], [self.index_url], cache_dir=self.cache_dir)
+        finder.fetched = []
+
+        def _get_page(link, req):
+            finder.fetched.append(link.url)
+            if link.url not in pages:
+                return None
+            content, real_url, headers = pages[link.url]
+            return HTMLPage(content, real_url, headers)
+
+        finder._get_page = _get_page
+        return finder
+
+    def test_names_are_looked_up_in_stored_map(self):
+        headers = {'ETag': '"1"'}
+        finder = self.finder({self.index_url + '/': (self.root, self.index_url + '/', headers)})
+        names = finder._index_names(Link(self.index_url + '/'), None)
+        assert names == {'simple': 'Simple', 'other': 'other'}
+
+        # The page is unchanged, so it isn't parsed again
+        finder = self.finder({self.index_url + '/': ('', self.index_url + '/', headers)})
+        req = InstallRequirement.from_line('SIMPLE', None)
+        assert finder._find_url_name(Link(self.index_url), 'SIMPLE', req) == 'Simple'
+
+        # It changed
+        finder = self.finder({self.index_url + '/': ('', self.index_url + '/', {'ETag': '"2"'})})
+        assert finder._find_url_name(Link(self.index_url), 'SIMPLE', req) is None
+
+    def test_corrected_names_are_remembered(self):
+        project_url = self.index_url + '/Simple/'
+        pages = {
+            self.index_url + '/': (self.root, self.index_url + '/', {}),
+            project_url: ('', project_url, {}),
+        }
+        req = InstallRequirement.from_line('simple', None)
+        finder = self.finder(pages)
+        with pytest.raises(DistributionNotFound):
+            finder.find_requirement(req, False)
+        assert self.index_url + '/simple/' in finder.fetched
+
+        finder = self.finder(pages)
+        with pytest.raises(DistributionNotFound):
+            finder.find_requirement(req, False)
+        assert set(finder.fetched) == set([project_url])
+
+    def test_redirects_are_remembered(self):
+        project_url = self.index_url + '/Simple/'
+        pages = {self.index_url + '/simple/': ('', project_url, {})}
+        req = InstallRequirement.from_line('simple', None)
+        with pytest.raises(DistributionNotFound):
+            self.finder(pages).find_requirement(req, False)
+
+        finder = self.finder({project_url: ('', project_url, {})})
+        with pytest.raises(DistributionNotFound):
+            finder.find_requirement(req, False)
+        assert set(finder.fetched) == set([project_url])
+
+
+class TestFindLinksDirectory(object):
+
+    def setup(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.wheelhouse = os.path.join(self.tempdir, 'wheelhouse')
+        os.mkdir(self.wheelhouse)
+        for filename in ['simple-1.0.tar.gz', 'simple-2.0.tar.gz',
+                         'simple2-1.0.tar.gz', 'Upper-1.0.tar.gz']:
+            shutil.copy(os.path.join(tests_data, 'packages', filename),
+                        self.wheelhouse)
+        self.cache_dir = os.path.join(self.tempdir, 'cache')
+
+    def teardown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_directory_is_listed_once(self):
+        finder = PackageFinder([self.wheelhouse], [], cache_dir=self.cache_dir)
+        with patch('os.listdir', wraps=os.listdir) as mock_listdir:
+            found = finder.find_requirement(InstallRequirement.from_line('simple', None), False)
+            assert found.filename == 'simple-2.0.tar.gz'
+            found = finder.find_requirement(InstallRequirement.from_line('upper', None), False)
+            assert found.filename == 'Upper-1.0.tar.gz'
+            assert mock_listdir.call_count == 1
+
+        # A later run uses the listing kept on disk...
+        finder = PackageFinder([self.wheelhouse], [], cache_dir=self.cache_dir)
+        with patch('os.listdir', wraps=os.listdir) as mock_listdir:
+            found = finder.find_requirement(InstallRequirement.from_line('simple2', None), False)
+            assert found.filename == 'simple2-1.0.tar.gz'
+            assert not mock_listdir.called
+
+    def test_changed_directory_is_listed_again(self):
+        PackageFinder([self.wheelhouse], [], cache_dir=self.cache_dir).find_requirement(
+            InstallRequirement.from_line('simple', None), False)
+        shutil.copy(os.path.join(tests_data, 'packages', 'simple-3.0.tar.gz'),
+                    self.wheelhouse)
+        os.utime(self.wheelhouse, (0, time.time() + 10))
+        finder = PackageFinder([self.wheelhouse], [], cache_dir=self.cache_dir)
+        found = finder.find_requirement(InstallRequirement.from_line('simple', None), False)
+        assert found.filename == 'simple-3.0.tar.gz'
+
+    def test_only_the_project_files_are_looked_at(self):
+        finder = PackageFinder([self.wheelhouse], [])
+        files, urls = finder._sort_locations([self.wheelhouse], 'simple')
+        assert sorted([posixpath.basename(url) for url in files]) == [
+            'simple-1.0.tar.gz', 'simple-2.0.tar.gz']
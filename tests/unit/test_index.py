@@ -56,3 +56,58 @@ def test_sort_locations_file_not_find_link():
 def test_inflink_greater():
     """Test InfLink compares greater."""
     assert InfLink > Link("some link")
+
+
+def test_html_page_extracts_links_base_and_api_version():
+    """
+    Test the single pass extractor picks up anchors, <base> and api-version
+    """
+    page = HTMLPage("""
+        <html><head>
+        <meta name="API-Version" value="2">
+        <base href="http://base.example.com/simple/">
+        <base href="http://ignored.example.com/">
+        </head><body>
+        <a href="foo-1.0.tar.gz" rel="internal">foo-1.0</a>
+        <a href="http://other.example.com/foo-2.0.tar.gz">foo-2.0</a>
+        <a name="no-href">anchor</a>
+        <a href="http://foo.example.com/" rel="homepage">home</a>
+        </body></html>""", "http://page.example.com/simple/foo/")
+
+    assert page.api_version == 2
+    assert page.base_url == "http://base.example.com/simple/"
+    assert [(link.url, link.internal) for link in page.links] == [
+        ("http://base.example.com/simple/foo-1.0.tar.gz", True),
+        ("http://other.example.com/foo-2.0.tar.gz", False),
+        ("http://foo.example.com/", False),
+    ]
+    assert [link.url for link in page.explicit_rel_links()] == [
+        "http://foo.example.com/"]
+
+
+@patch('pip.index.LinkExtractor.feed')
+def test_html_page_falls_back_to_html5lib(mock_feed):
+    """
+    Test pages the stdlib parser can't handle are parsed with html5lib
+    """
+    mock_feed.side_effect = AssertionError("unknown status keyword")
+    page = HTMLPage('<base href="http://base.example.com/">'
+                    '<a href="foo-1.0.tar.gz">foo</a>', "http://page.example.com/")
+
+    assert [link.url for link in page.links] == [
+        "http://base.example.com/foo-1.0.tar.gz"]
+
+
+def test_link_attributes_follow_url_changes():
+    link = Link('http://example.com/simple-1.0.tar.gz#egg=simple&md5=abc123')
+    assert link.filename == 'simple-1.0.tar.gz'
+    assert link.hash_name == 'md5'
+    assert link.hash == 'abc123'
+    assert link.egg_fragment == 'simple'
+    assert link.wheel is None
+
+    link.url = 'http://example.com/simple-1.0-py2.py3-none-any.whl'
+    assert link.filename == 'simple-1.0-py2.py3-none-any.whl'
+    assert link.hash is None
+    assert link.egg_fragment is None
+    assert link.wheel.version == '1.0'
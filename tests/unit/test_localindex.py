@@ -0,0 +1,82 @@
+import os
+import shutil
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from mock import patch
+from pip.index import PackageFinder
+from pip.localindex import LocalIndex, build_index, parse_filename
+from pip.req import InstallRequirement
+from tests.lib import packages
+
+
+def test_parse_filename():
+    assert parse_filename('foo-bar-1.0.tar.gz') == ('foo-bar', '1.0', [])
+    assert parse_filename('Foo_Bar-1.0.zip', 'foo-bar') == ('foo-bar', '1.0', [])
+    assert parse_filename('foo-2-1.0.tar.gz', 'foo-2') == ('foo-2', '1.0', [])
+    assert parse_filename('foo-1.0-py2.py3-none-any.whl') == (
+        'foo', '1.0', ['py2-none-any', 'py3-none-any'])
+    assert parse_filename('index.html') is None
+    assert parse_filename('README.txt') is None
+
+
+class TestLocalIndex(object):
+
+    def setup(self):
+        self.tempdir = mkdtemp()
+        self.archives = os.path.join(self.tempdir, 'archives')
+        os.mkdir(self.archives)
+        for filename in ['simple-1.0.tar.gz', 'simple-2.0.tar.gz',
+                         'simple2-1.0.tar.gz', 'Upper-1.0.tar.gz']:
+            shutil.copy(os.path.join(packages, filename), self.archives)
+
+    def teardown(self):
+        rmtree(self.tempdir)
+
+    def test_lookup(self):
+        assert build_index(self.archives) == (4, 0, 4)
+        index = LocalIndex(os.path.join(self.archives, 'pip-index.bin'))
+        try:
+            assert list(index.projects()) == ['simple', 'simple2', 'upper']
+            records = index.lookup('simple')
+            assert [r.version for r in records] == ['1.0', '2.0']
+            assert len(records[0].sha256) == 64
+            assert [r.filename for r in index.lookup('UPPER')] == [
+                'Upper-1.0.tar.gz']
+            assert index.lookup('missing') == []
+            assert index.lookup('aaa') == []
+            assert index.lookup('zzz') == []
+            assert index.url(records[0]).endswith(
+                '/archives/simple-1.0.tar.gz#sha256=' + records[0].sha256)
+        finally:
+            index.close()
+
+    @patch('pip.localindex._hash_file')
+    def test_incremental_update(self, mock_hash_file):
+        mock_hash_file.return_value = '0' * 64
+        output = os.path.join(self.tempdir, 'index.bin')
+        build_index(self.archives, output)
+        assert mock_hash_file.call_count == 4
+
+        shutil.copy(os.path.join(packages, 'simple-3.0.tar.gz'), self.archives)
+        os.remove(os.path.join(self.archives, 'simple2-1.0.tar.gz'))
+        assert build_index(self.archives, output) == (1, 1, 4)
+        assert mock_hash_file.call_count == 5
+
+        index = LocalIndex(output)
+        try:
+            assert index.base == self.archives
+            assert [r.version for r in index.lookup('simple')] == [
+                '1.0', '2.0', '3.0']
+            assert index.lookup('simple2') == []
+        finally:
+            index.close()
+
+    def test_finder_uses_local_index(self):
+        build_index(self.archives)
+        finder = PackageFinder([], [], local_indexes=[self.archives])
+        req = InstallRequirement.from_line('simple<2.0', None)
+        link = finder.find_requirement(req, False)
+        assert link.filename == 'simple-1.0.tar.gz'
+        assert link.hash_name == 'sha256'
+        finder.local_indexes[0].close()
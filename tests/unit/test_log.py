@@ -1,4 +1,5 @@
-from pip.log import should_color, should_warn
+from pip.backwardcompat import b
+from pip.log import Logger, should_color, should_warn
 
 
 def test_should_color_std():
@@ -42,3 +43,46 @@ def test_should_warn_greater():
 
 def test_should_warn_significance():
     assert should_warn("1.4.dev1", "1.6")
+
+
+class Unprintable(object):
+    def __str__(self):
+        raise AssertionError("formatted a message nobody shows")
+
+
+def test_is_enabled_for():
+    logger = Logger()
+    assert not logger.is_enabled_for(Logger.FATAL)
+    messages = []
+    logger.consumers = [(Logger.NOTIFY, messages.append)]
+    assert logger.is_enabled_for(Logger.NOTIFY)
+    assert not logger.is_enabled_for(Logger.INFO)
+    logger.add_consumers((Logger.DEBUG, messages.append))
+    assert logger.is_enabled_for(Logger.DEBUG)
+
+
+def test_messages_are_formatted_when_shown():
+    logger = Logger()
+    messages = []
+    logger.consumers = [(Logger.NOTIFY, messages.append)]
+    logger.debug('Skipping %s', Unprintable())
+    logger.notify('Found %s, version %s', 'simple', '1.0')
+    logger.notify('%(name)s', name='simple')
+    assert messages == ['Found simple, version 1.0', 'simple']
+
+
+def test_each_stream_gets_one_line():
+    class Stream(object):
+        def __init__(self):
+            self.written = []
+            self.buffer = self
+
+        def write(self, text):
+            self.written.append(text)
+
+    logger = Logger()
+    first, second = Stream(), Stream()
+    logger.add_consumers((Logger.INFO, first), (Logger.INFO, second))
+    logger.notify('hello')
+    assert first.written == [b('hello\n')]
+    assert second.written == [b('hello\n')]
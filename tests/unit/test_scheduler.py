@@ -0,0 +1,173 @@
+import time
+
+import pytest
+
+from pip.scheduler import FetchScheduler, HedgedJob, LatencyStats
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+
+class ConcurrencyRecorder(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = {}
+        self.peak = {}
+
+    def fetch(self, host):
+        self.lock.acquire()
+        self.current[host] = self.current.get(host, 0) + 1
+        self.current['*'] = self.current.get('*', 0) + 1
+        for key in (host, '*'):
+            self.peak[key] = max(self.peak.get(key, 0), self.current[key])
+        self.lock.release()
+        time.sleep(0.02)
+        self.lock.acquire()
+        self.current[host] -= 1
+        self.current['*'] -= 1
+        self.lock.release()
+        return host
+
+
+def test_per_host_and_total_limits():
+    scheduler = FetchScheduler(max_workers=5, max_per_host=2)
+    recorder = ConcurrencyRecorder()
+    jobs = []
+    for i in range(8):
+        for host in ('a.example.com', 'b.example.com', 'c.example.com'):
+            jobs.append(scheduler.submit('http://%s/%s' % (host, i),
+                                         recorder.fetch, host))
+    assert [job.wait() for job in jobs][:3] == [
+        'a.example.com', 'b.example.com', 'c.example.com']
+    assert recorder.peak['*'] <= 5
+    for host in ('a.example.com', 'b.example.com', 'c.example.com'):
+        assert recorder.peak[host] <= 2
+    assert recorder.peak['*'] > 2
+
+    stats = scheduler.stats()
+    assert stats['queued'] == 0
+    assert stats['in_flight'] == 0
+    assert stats['in_flight_by_host'] == {}
+    assert stats['completed'] == 24
+
+
+def test_counters_while_busy():
+    scheduler = FetchScheduler(max_workers=1, max_per_host=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocked():
+        started.set()
+        release.wait()
+
+    first = scheduler.submit('http://a.example.com/1', blocked)
+    started.wait()
+    second = scheduler.submit('http://a.example.com/2', lambda: None)
+    assert scheduler.queued == 1
+    assert scheduler.in_flight == 1
+    assert scheduler.in_flight_by_host == {'a.example.com': 1}
+    release.set()
+    first.wait()
+    second.wait()
+    assert scheduler.queued == 0
+
+
+def test_exceptions_are_raised_by_wait():
+    scheduler = FetchScheduler()
+
+    def fail():
+        raise ValueError('no')
+
+    job = scheduler.submit('http://a.example.com/', fail)
+    with pytest.raises(ValueError):
+        job.wait()
+
+
+def test_idle_workers_exit():
+    scheduler = FetchScheduler(idle_timeout=0.05)
+    scheduler.submit('http://a.example.com/', lambda: None).wait()
+    time.sleep(0.3)
+    assert scheduler.stats()['workers'] == 0
+    assert scheduler.submit('http://a.example.com/', lambda: 1).wait() == 1
+
+
+def test_cancel_queued_job():
+    scheduler = FetchScheduler(max_workers=1, max_per_host=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocked():
+        started.set()
+        release.wait()
+
+    first = scheduler.submit('http://a.example.com/1', blocked)
+    started.wait()
+    second = scheduler.submit('http://a.example.com/2', lambda: 2)
+    scheduler.cancel(second)
+    release.set()
+    assert second.done()
+    assert second.wait() is None
+    assert scheduler.queued == 0
+    first.wait()
+
+
+def delayed(seconds, result, calls=None):
+    def fetch():
+        if calls is not None:
+            calls.append(result)
+        time.sleep(seconds)
+        return result
+    return fetch
+
+
+class TestHedgedJob(object):
+
+    def test_fast_primary_is_not_hedged(self):
+        calls = []
+        job = HedgedJob(FetchScheduler(), [
+            ('http://a.example.com/', delayed(0, 'a', calls), ()),
+            ('http://b.example.com/', delayed(0, 'b', calls), ())],
+            lambda host: 1)
+        assert job.wait() == 'a'
+        assert calls == ['a']
+
+    def test_slow_primary_is_hedged(self):
+        scheduler = FetchScheduler()
+        job = HedgedJob(scheduler, [
+            ('http://a.example.com/', delayed(1, 'a'), ()),
+            ('http://b.example.com/', delayed(0, 'b'), ())],
+            lambda host: 0.05)
+        start = time.time()
+        assert job.wait() == 'b'
+        assert time.time() - start < 0.9
+        assert job.jobs[0].cancelled
+
+    def test_failure_is_hedged_at_once(self):
+        job = HedgedJob(FetchScheduler(), [
+            ('http://a.example.com/', delayed(0, None), ()),
+            ('http://b.example.com/', delayed(0, 'b'), ())],
+            lambda host: 10)
+        start = time.time()
+        assert job.wait() == 'b'
+        assert time.time() - start < 5
+
+    def test_all_fail(self):
+        job = HedgedJob(FetchScheduler(), [
+            ('http://a.example.com/', delayed(0, None), ()),
+            ('http://b.example.com/', delayed(0, None), ())],
+            lambda host: 10)
+        assert job.wait() is None
+
+
+def test_latency_thresholds():
+    stats = LatencyStats(window=20, percentile=0.9, min_samples=3, default=2)
+    assert stats.threshold('a.example.com') == 2
+    for i in range(30):
+        stats.record('a.example.com', i / 10.0)
+    # Only the last 20 samples are kept: 1.0 to 2.9
+    assert stats.threshold('a.example.com') == 2.7
+    assert stats.threshold('b.example.com') == 2
+    assert stats.stats()['a.example.com'][0] == 20
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+from tempfile import mkstemp
+
+from pip import timing
+from pip.backwardcompat import b
+from pip.download import urlopen
+from pip.index import HTMLPage, Link, PageCache
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    body = b('<a href="simple-1.0.tar.gz">simple-1.0.tar.gz</a>')
+
+    def do_GET(self):
+        if self.path.startswith('/missing'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-gzip')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTimingReport(object):
+
+    def setup(self):
+        self.server = HTTPServer(('127.0.0.1', 0), PageHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.host = '127.0.0.1:%s' % self.server.server_port
+        self.url = 'http://%s/' % self.host
+        self.report = timing.start_report()
+
+    def teardown(self):
+        timing.stop_report()
+        urlopen.pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_page(self, path):
+        return HTMLPage.get_page(Link(self.url + path), None,
+                                 cache=PageCache())
+
+    def test_pages_are_timed(self):
+        urlopen.pool.clear()
+        assert self.get_page('simple/') is not None
+        assert self.get_page('other/') is not None
+        first, second = self.report.requests
+        assert first.kind == 'page'
+        assert first.host == self.host
+        assert first.status == 200
+        assert first.bytes == len(PageHandler.body)
+        assert first.cache == 'miss'
+        assert first.dns is not None and first.connect is not None
+        assert first.first_byte <= first.total
+        assert not first.reused
+        # The second request reused the connection
+        assert second.reused
+        assert second.connect is None
+        assert timing.current() is None
+
+        summary = self.report.summary()[self.host]
+        assert summary['requests'] == 2
+        assert summary['connections'] == 1
+        assert summary['bytes'] == 2 * len(PageHandler.body)
+        assert summary['cache'] == {'miss': 2}
+        assert summary['total']['max'] >= summary['total']['median']
+
+    def test_errors_are_timed(self):
+        assert self.get_page('missing/') is None
+        request, = self.report.requests
+        assert request.status == 404
+        assert request.error
+        assert self.report.summary()[self.host]['errors'] == 1
+
+    def test_head_requests_are_timed(self):
+        assert HTMLPage._get_content_type(self.url + 'a.tar.gz') == \
+            'application/x-gzip'
+        request, = self.report.requests
+        assert request.kind == 'head'
+        assert request.status == 200
+
+    def test_write(self):
+        self.get_page('simple/')
+        fd, path = mkstemp()
+        os.close(fd)
+        try:
+            self.report.write(path)
+            fp = open(path)
+            try:
+                data = json.load(fp)
+            finally:
+                fp.close()
+        finally:
+            os.remove(path)
+        assert data['requests'][0]['url'] == self.url + 'simple/'
+        assert data['hosts'][self.host]['requests'] == 1
+
+
+def test_nothing_is_timed_without_report():
+    assert timing.begin('http://example.com/', 'page') is None
+    assert timing.current() is None
+    timing.end(None, status=200)
@@ -9,11 +9,15 @@ import shutil
 import tempfile
 
 import pytest
+import pkg_resources
 
 from mock import Mock, patch
+from pip.backwardcompat import b
 from pip.exceptions import BadCommand
 from pip.util import (egg_link_path, Inf, get_installed_distributions,
-                      find_command, untar_file, unzip_file)
+                      find_command, untar_file, unzip_file, LRUCache,
+                      memoize, VersionSpecifier, hash_file,
+                      link_or_copy)
 from tests.lib import reset_env, tests_data
 
 
@@ -353,3 +357,137 @@ class TestUnpackArchives(object):
         test_file =  os.path.join(tests_data, 'packages', 'test_zip.zip')
         unzip_file(test_file, self.tempdir)
         self.confirm_files()
+
+
+def test_lru_cache_forgets_least_recently_used():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_memoize():
+    calls = []
+
+    @memoize(10)
+    def double(x):
+        calls.append(x)
+        return x * 2
+
+    assert double(2) == 4
+    assert double(2) == 4
+    assert calls == [2]
+
+
+def test_hash_file():
+    import hashlib
+    fd, path = tempfile.mkstemp()
+    content = b('0123456789abcdef') * 200
+    os.write(fd, content)
+    os.close(fd)
+    try:
+        # Read in a block, and mapped into memory
+        for block_size in (4096, 1024):
+            md5, sha256 = hashlib.md5(), hashlib.sha256()
+            hash_file(path, [md5, sha256], block_size=block_size)
+            assert md5.hexdigest() == hashlib.md5(content).hexdigest()
+            assert sha256.hexdigest() == hashlib.sha256(content).hexdigest()
+    finally:
+        os.remove(path)
+
+
+class TestLinkOrCopy(object):
+
+    def setup(self):
+        fd, self.source = tempfile.mkstemp()
+        os.write(fd, b('content'))
+        os.close(fd)
+        self.dest = self.source + '.dest'
+
+    def teardown(self):
+        for path in (self.source, self.dest):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def read_dest(self):
+        fp = open(self.dest, 'rb')
+        try:
+            return fp.read()
+        finally:
+            fp.close()
+
+    def test_hard_link(self):
+        link_or_copy(self.source, self.dest)
+        assert os.path.samefile(self.source, self.dest)
+        # Linking again changes nothing
+        link_or_copy(self.source, self.dest)
+        assert os.path.samefile(self.source, self.dest)
+
+    def test_replaces_dest(self):
+        fp = open(self.dest, 'wb')
+        fp.write(b('old content'))
+        fp.close()
+        link_or_copy(self.source, self.dest)
+        assert self.read_dest() == b('content')
+
+    @patch('os.link')
+    def test_copy_without_hard_links(self, mock_link):
+        mock_link.side_effect = OSError(18, 'Invalid cross-device link')
+        link_or_copy(self.source, self.dest)
+        assert not os.path.samefile(self.source, self.dest)
+        assert self.read_dest() == b('content')
+
+
+class Test_VersionSpecifier(object):
+
+    specs = ['foo', 'foo>=1.0', 'foo<2.0,>=1.0', 'foo!=1.5', 'foo==1.0',
+             'foo>1.0,!=1.5,<=2.0', 'foo<1.0', 'foo==1.5,==2.0']
+    versions = ['0.9', '1.0', '1.0.1', '1.5', '1.5a1', '2.0', '2.0.dev1',
+                '3.0']
+
+    def test_matches_like_requirement(self):
+        for spec in self.specs:
+            req = pkg_resources.Requirement.parse(spec)
+            specifier = VersionSpecifier(req)
+            for version in self.versions:
+                assert (version in specifier) == (version in req), (spec, version)
+
+    def test_state_machine(self):
+        """The specs of old pkg_resources Requirements without .specifier"""
+        # Unlike PEP 440, the old rules let <2.0 match 2.0.dev1 and
+        #   ==1.5,==2.0 match both versions
+        for spec in self.specs[:-1]:
+            req = pkg_resources.Requirement.parse(spec)
+            specifier = VersionSpecifier(Mock(specs=req.specs, specifier=None))
+            for version in self.versions:
+                if version == '2.0.dev1':
+                    continue
+                assert (version in specifier) == (version in req), (spec, version)
+        old_style = VersionSpecifier(Mock(specs=[('==', '1.5'), ('==', '2.0')],
+                                          specifier=None))
+        assert '1.5' in old_style and '2.0' in old_style
+        assert '1.0' not in old_style
+
+    def test_upper_bound(self):
+        bounds = {
+            'foo': None,
+            'foo>=1.0': None,
+            'foo==1.0': '1.0',
+            'foo>1.0,!=1.5,<=2.0': '2.0',
+            'foo<=2.0,!=2.0': None,
+            'foo<2.0': None,
+            'foo==1.0.*': None,
+        }
+        for spec, bound in bounds.items():
+            req = pkg_resources.Requirement.parse(spec)
+            assert VersionSpecifier(req).upper_bound() == bound, spec
+        # Under the old rules 3.0 matches <=2.0,!=2.5
+        old_style = VersionSpecifier(Mock(specs=[('<=', '2.0'), ('!=', '2.5')],
+                                          specifier=None))
+        assert '3.0' in old_style
+        assert old_style.upper_bound() is None
@@ -185,3 +185,35 @@ class TestPEP425Tags(object):
         with patch('pip.pep425tags.sysconfig.get_config_var', raises_ioerror):
             assert len(pip.pep425tags.get_supported())
 
+
+    def test_tag_priorities(self):
+        """
+        Test that tags map to their first index in the list of tags
+        """
+        import pip.pep425tags
+        tags = [('py2', 'none', 'TEST'),
+                ('py2', 'none', 'any'),
+                ('py2', 'none', 'TEST')]
+        assert pip.pep425tags.tag_priorities(tags) == {
+            ('py2', 'none', 'TEST'): 0,
+            ('py2', 'none', 'any'): 1,
+        }
+
+    def test_get_priorities_follows_the_list(self):
+        """
+        Test that get_priorities computes the table once per list of tags
+        """
+        import pip.pep425tags
+        tags = [('py2', 'none', 'any')]
+        priorities = pip.pep425tags.get_priorities(tags)
+        assert pip.pep425tags.get_priorities(tags) is priorities
+        other = [('py3', 'none', 'any'), ('py2', 'none', 'any')]
+        assert pip.pep425tags.get_priorities(other) == {
+            ('py3', 'none', 'any'): 0,
+            ('py2', 'none', 'any'): 1,
+        }
+        w = wheel.Wheel('simple-0.1-py2.py3-none-any.whl')
+        assert w.support_index_min(tags=tags) == 0
+        assert w.support_index_min(tags=other) == 0
+        w = wheel.Wheel('simple-0.1-py2-none-any.whl')
+        assert w.support_index_min(tags=other) == 1